@@ -1,68 +1,104 @@
-import multiprocessing
-import subprocess
+import asyncio
+import os
+import signal
 import time
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+# Same .env the backend is started with, loaded before the MCP transport settings are read
+load_dotenv()
+
+from src.rule_onboarding.services.mcp_transport import LOCAL_HOSTS, MCP_SERVER_URL, resolve_mcp_transport
 from src.rule_onboarding.utils.logger import setup_logger
+from src.rule_onboarding.utils.supervisor import ServiceSpec, ServiceStartupError, ServiceSupervisor
 
 # --- CONFIGURATION ---
 MCP_PORT = 8082
 BACKEND_PORT = 8083
 UI_PORT = 8084
+# Uvicorn worker processes for the backend (one per core scales until the LLM is the bottleneck)
+BACKEND_WORKERS = max(1, int(os.getenv("BACKEND_WORKERS", "1")))
 
 logger = setup_logger("DQ_RULE_ONBOARDING_GENIE_LAUNCHER")
 
-# 1. To run MCP Server
-def run_mcp_server():
-    logger.info(f"[MCP] Starting on port {MCP_PORT}...")
-    subprocess.run(["uv", "run", "python", "-m", "src.rule_onboarding.services.mcp_server"])
+MCP_TRANSPORT = resolve_mcp_transport()
+# Only an HTTP transport to this host needs the MCP server process; with "inprocess"
+# the backend serves the MCP tools itself, and a remote URL is someone else's server
+LAUNCH_MCP_SERVER = MCP_TRANSPORT == "http" and urlparse(MCP_SERVER_URL).hostname in LOCAL_HOSTS
 
-# 2. To run the FastAPI Backend
-def run_fastapi():
-    logger.info(f"[API] Starting on port {BACKEND_PORT}...")
-    cmd = [
-        "uv", "run", "python", "-m", "uvicorn", 
-        "src.rule_onboarding.api.backend:app", 
-        "--env-file", ".env", 
-        "--host", "127.0.0.1", 
-        "--port", str(BACKEND_PORT)
-    ]
-    subprocess.run(cmd)
+# 1. MCP Server
+def mcp_server_spec() -> ServiceSpec:
+    return ServiceSpec(
+        name="MCP",
+        cmd=["uv", "run", "python", "-m", "src.rule_onboarding.services.mcp_server"],
+        ready_url=f"http://127.0.0.1:{MCP_PORT}/readyz"
+    )
 
-# 3. To run the Streamlit UI
-def run_streamlit():
-    logger.info(f"[UI] Starting on port {UI_PORT}...")
-    cmd = [
-        "uv", "run", "python", "-m", "streamlit", "run", 
-        "src/rule_onboarding/ui/app.py", 
-        "--server.port", str(UI_PORT)
-    ]
-    subprocess.run(cmd)
+# 2. FastAPI Backend
+def fastapi_spec() -> ServiceSpec:
+    # Connects to MCP lazily on the first tool call, so it boots alongside the MCP server
+    return ServiceSpec(
+        name="API",
+        cmd=[
+            "uv", "run", "python", "-m", "uvicorn",
+            "src.rule_onboarding.api.backend:app",
+            "--env-file", ".env",
+            "--host", "127.0.0.1",
+            "--port", str(BACKEND_PORT),
+            "--workers", str(BACKEND_WORKERS)
+        ],
+        ready_url=f"http://127.0.0.1:{BACKEND_PORT}/readyz"
+    )
 
-if __name__ == "__main__":
-  
-    # Create processes
-    mcp_p = multiprocessing.Process(target=run_mcp_server)
-    api_p = multiprocessing.Process(target=run_fastapi)
-    ui_p = multiprocessing.Process(target=run_streamlit)
+# 3. Streamlit UI
+def streamlit_spec() -> ServiceSpec:
+    # Users reach the backend through the UI, so only expose it once the pipeline can serve
+    return ServiceSpec(
+        name="UI",
+        cmd=[
+            "uv", "run", "python", "-m", "streamlit", "run",
+            "src/rule_onboarding/ui/app.py",
+            "--server.port", str(UI_PORT),
+            "--server.headless", "true"
+        ],
+        ready_url=f"http://127.0.0.1:{UI_PORT}/_stcore/health",
+        depends_on=("MCP", "API") if LAUNCH_MCP_SERVER else ("API",)
+    )
 
-    try:
-        # Sequence: Tools -> Backend -> Frontend
-        mcp_p.start()
-        time.sleep(2) 
-        
-        api_p.start()
-        time.sleep(3)
-        
-        ui_p.start()
+def service_specs() -> list[ServiceSpec]:
+    specs = [fastapi_spec(), streamlit_spec()]
+    if LAUNCH_MCP_SERVER:
+        specs.insert(0, mcp_server_spec())
+    return specs
+
+async def launch() -> None:
+    if MCP_TRANSPORT == "inprocess":
+        logger.info("MCP transport: inprocess (the backend serves the MCP tools; no MCP server process)")
+    else:
+        logger.info(f"MCP transport: http ({MCP_SERVER_URL}{', launching the MCP server' if LAUNCH_MCP_SERVER else ''})")
+    supervisor = ServiceSupervisor(service_specs())
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, supervisor.stop)
 
-        logger.info("\n DQ RULE ONBOARDING GENIE IS FULLY OPERATIONAL")
+    started = time.monotonic()
+
+    async def announce():
+        await supervisor.wait_ready()
+        logger.info(f"DQ RULE ONBOARDING GENIE IS FULLY OPERATIONAL (cold start {time.monotonic() - started:.2f}s)")
         logger.info(f"Access the UI at: http://localhost:{UI_PORT}")
-        
-        # Keep main process alive
-        api_p.join() 
 
-    except KeyboardInterrupt:
-        logger.info("\n Shutting down DQ RULE ONBOARDING GENIE...")
-        ui_p.terminate()
-        api_p.terminate()
-        mcp_p.terminate()
-        logger.info("Shutdown complete.")
\ No newline at end of file
+    announcer = asyncio.create_task(announce())
+    try:
+        # Supervises (and restarts crashed services) until SIGINT/SIGTERM
+        await supervisor.run()
+    finally:
+        announcer.cancel()
+    logger.info("Shutdown complete.")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(launch())
+    except ServiceStartupError as e:
+        logger.error(f"Startup failed: {e}")
+        raise SystemExit(1)
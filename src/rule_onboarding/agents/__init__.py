@@ -1,6 +1,7 @@
 from .rule_extraction import rule_extraction_agent
-from .mock_rule_extraction import rule_extraction_agent
+from .mock_rule_extraction import mocked_rule_extraction_agent
+from .rule_fast_path_extraction import fast_path_rule_extraction_agent
 from .rule_validation import rule_validation_agent
 from .rule_generation import rule_generation_agent
 from .rule_deployment import rule_deployment_agent
-__all__ = ["rule_extraction_agent", "rule_validation_agent", "rule_generation_agent", "rule_deployment_agent"]
\ No newline at end of file
+__all__ = ["rule_extraction_agent", "fast_path_rule_extraction_agent", "rule_validation_agent", "rule_generation_agent", "rule_deployment_agent"]
\ No newline at end of file
@@ -0,0 +1,60 @@
+import math
+import re
+from collections import Counter
+
+TOKEN_REGEX = re.compile(r"[a-z0-9_]+")
+
+# Filler words that say nothing about which example is relevant
+STOP_WORDS = {
+    "a", "an", "and", "the", "of", "on", "for", "with", "to", "in", "is", "if",
+    "rule", "rules", "onboard", "use", "check", "create", "configure", "ensure",
+}
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in TOKEN_REGEX.findall((text or "").lower()) if t not in STOP_WORDS]
+
+def split_examples(examples_text: str) -> list[dict]:
+    """
+    Split the "Example N:" blocks of a few-shot prompt into
+    {"user": ..., "text": ...} entries.
+    """
+    blocks = re.split(r"^Example \d+:\s*$", examples_text, flags=re.MULTILINE)
+    examples = []
+    for block in blocks:
+        block = block.strip()
+        if not block.startswith("User:"):
+            continue
+        user = block.split("Assistant:", 1)[0][len("User:"):].strip()
+        examples.append({"user": user, "text": block})
+    return examples
+
+class FewShotExampleSelector:
+    """
+    Offline TF-IDF selector over a library of few-shot examples.
+    Only the example 'user' side is indexed; the request is scored against
+    it with cosine similarity and the top-k examples are returned.
+    """
+
+    def __init__(self, examples: list[dict]):
+        self.examples = examples
+        documents = [Counter(tokenize(e["user"])) for e in examples]
+        document_frequency = Counter(term for doc in documents for term in doc)
+        total = len(documents)
+        self._idf = {term: math.log((1 + total) / (1 + df)) + 1.0 for term, df in document_frequency.items()}
+        self._vectors = [self._weigh(doc) for doc in documents]
+
+    def _weigh(self, term_counts: Counter) -> dict:
+        vector = {term: count * self._idf.get(term, 0.0) for term, count in term_counts.items()}
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {term: w / norm for term, w in vector.items()}
+
+    def select(self, query: str, k: int) -> list[dict]:
+        query_vector = self._weigh(Counter(tokenize(query)))
+        scored = [
+            (sum(w * vector.get(term, 0.0) for term, w in query_vector.items()), index)
+            for index, vector in enumerate(self._vectors)
+        ]
+        # Highest score first; ties keep library order so results are stable
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        top = sorted(index for _, index in scored[:max(0, k)])
+        return [self.examples[index] for index in top]
@@ -0,0 +1,124 @@
+import math
+from typing import Callable, Optional
+
+# --- CONSTRAINT TABLE ---
+# One entry per supported rule type:
+#   level                   "column" rules need a column_name; "table" rules apply to the whole dataset
+#   baseline_sources        allowed baseline_source values
+#   min_value               lower bound for baseline_value and threshold_value (None: unbounded)
+#   previous_baseline_value required baseline_value when baseline_source is PREVIOUS (None: any)
+#   threshold_gte_baseline  threshold_value may not be below baseline_value
+RULE_CONSTRAINTS = {
+    "RECORD_COUNT": {"level": "table", "baseline_sources": ("CONFIG", "PREVIOUS"), "min_value": 0, "previous_baseline_value": 1.0, "threshold_gte_baseline": True},
+    "STALE_COUNT": {"level": "table", "baseline_sources": ("CONFIG", "PREVIOUS"), "min_value": 0, "previous_baseline_value": 1.0, "threshold_gte_baseline": True},
+    "STALE_CONTEXT": {"level": "table", "baseline_sources": ("CONFIG", "PREVIOUS"), "min_value": 0, "previous_baseline_value": 1.0, "threshold_gte_baseline": True},
+    "NULL_COUNT": {"level": "column", "baseline_sources": ("CONFIG", "PREVIOUS"), "min_value": 0, "previous_baseline_value": None, "threshold_gte_baseline": True},
+    "MEAN": {"level": "column", "baseline_sources": ("CONFIG", "PREVIOUS"), "min_value": None, "previous_baseline_value": None, "threshold_gte_baseline": True},
+    "SUM": {"level": "column", "baseline_sources": ("CONFIG", "PREVIOUS"), "min_value": None, "previous_baseline_value": None, "threshold_gte_baseline": True},
+    "MEAN_VARIANCE": {"level": "column", "baseline_sources": ("CONFIG", "PREVIOUS"), "min_value": 0, "previous_baseline_value": None, "threshold_gte_baseline": True},
+    "MEDIAN_VARIANCE": {"level": "column", "baseline_sources": ("CONFIG", "PREVIOUS"), "min_value": 0, "previous_baseline_value": None, "threshold_gte_baseline": True},
+}
+
+class AttributeViolation:
+    """One failed constraint of one rule attribute."""
+
+    def __init__(self, index: int, rule_type: str, message: str):
+        self.index = index
+        self.rule_type = rule_type
+        self.message = message
+
+    def __str__(self) -> str:
+        return f"attributes[{self.index}] ({self.rule_type or 'unknown'}): {self.message}"
+
+    def __repr__(self) -> str:
+        return f"AttributeViolation({self.index}, {self.rule_type!r}, {self.message!r})"
+
+class NormalizedAttribute:
+    """An attribute's fields, upper-cased and parsed once for all checks."""
+    __slots__ = ("rule_type", "baseline_source", "column_name", "baseline", "threshold", "threshold_given")
+
+    def __init__(self, attr: dict):
+        details = attr.get("rule_details") or {}
+        self.rule_type = str(attr.get("rule_type") or "").upper()
+        # Unspecified baseline source means CONFIG (as the extraction prompt defaults it)
+        self.baseline_source = str(attr.get("baseline_source") or "CONFIG").upper()
+        self.column_name = attr.get("column_name")
+        self.baseline = _number(details.get("baseline_value")) if isinstance(details, dict) else None
+        self.threshold = _number(details.get("threshold_value")) if isinstance(details, dict) else None
+        # The extraction prompt leaves an unstated threshold null; only a non-null one is checked
+        self.threshold_given = isinstance(details, dict) and details.get("threshold_value") is not None
+
+def _number(value) -> Optional[float]:
+    # Numbers and numeric strings; booleans, nulls and NaN/inf are rejected
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    try:
+        value = float(value)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+# A compiled check returns a violation message, or None when the attribute passes
+Check = Callable[[NormalizedAttribute], Optional[str]]
+
+def _compile_checks(rule_type: str, spec: dict) -> tuple:
+    checks: list[Check] = []
+    sources = frozenset(spec["baseline_sources"])
+    sources_text = ", ".join(spec["baseline_sources"])
+    checks.append(lambda a: None if a.baseline_source in sources else f"baseline_source '{a.baseline_source}' is not one of {sources_text}.")
+
+    if spec["level"] == "column":
+        checks.append(lambda a: None if isinstance(a.column_name, str) and a.column_name.strip() else "column_name is required for column level rules.")
+
+    checks.append(lambda a: None if a.baseline is not None else "rule_details.baseline_value must be a number.")
+    checks.append(lambda a: None if a.threshold is not None or not a.threshold_given else "rule_details.threshold_value must be a number or null.")
+
+    min_value = spec["min_value"]
+    if min_value is not None:
+        checks.append(lambda a: f"rule_details.baseline_value must be >= {min_value}." if a.baseline is not None and a.baseline < min_value else None)
+        checks.append(lambda a: f"rule_details.threshold_value must be >= {min_value}." if a.threshold is not None and a.threshold < min_value else None)
+
+    previous_value = spec["previous_baseline_value"]
+    if previous_value is not None:
+        checks.append(lambda a: f"Rule {rule_type} with PREVIOUS baseline must have value {previous_value}." if a.baseline_source == "PREVIOUS" and a.baseline is not None and a.baseline != previous_value else None)
+
+    if spec["threshold_gte_baseline"]:
+        checks.append(lambda a: "rule_details.threshold_value must be >= baseline_value." if a.baseline is not None and a.threshold is not None and a.threshold < a.baseline else None)
+    return tuple(checks)
+
+class RuleAttributeValidator:
+    """
+    The constraint table compiled into one tuple of checks per rule type.
+    'validate' runs every check on every attribute and returns all
+    violations, so a bulk rule file is fixed in one round trip.
+    """
+
+    def __init__(self, constraints: dict = RULE_CONSTRAINTS):
+        self._checks = {rule_type: _compile_checks(rule_type, spec) for rule_type, spec in constraints.items()}
+        self._supported = ", ".join(sorted(self._checks))
+
+    @property
+    def rule_types(self) -> tuple:
+        return tuple(self._checks)
+
+    def validate(self, attributes) -> list[AttributeViolation]:
+        if not isinstance(attributes, list):
+            return [AttributeViolation(0, "", "attributes must be a list.")]
+        violations = []
+        for index, attr in enumerate(attributes):
+            if not isinstance(attr, dict):
+                violations.append(AttributeViolation(index, "", "attribute must be an object."))
+                continue
+            normalized = NormalizedAttribute(attr)
+            checks = self._checks.get(normalized.rule_type)
+            if checks is None:
+                violations.append(AttributeViolation(index, normalized.rule_type, f"Unsupported rule_type; expected one of {self._supported}."))
+                continue
+            for check in checks:
+                message = check(normalized)
+                if message is not None:
+                    violations.append(AttributeViolation(index, normalized.rule_type, message))
+        return violations
+
+# Compiled once at import
+rule_attribute_validator = RuleAttributeValidator()
@@ -1,18 +1,19 @@
+import asyncio
 from typing import AsyncGenerator
 import google.genai.types as types
 from google.adk.agents import BaseAgent
 from google.adk.events import Event
-from google.adk.tools.mcp_tool import McpToolset, StreamableHTTPConnectionParams
-from src.rule_onboarding.utils.logger import setup_logger
+from src.rule_onboarding.services.mcp_toolset_manager import mcp_toolset_manager
+from src.rule_onboarding.utils.logger import LazyPayload, setup_logger
 
-# Define connection params
-mcp_params = StreamableHTTPConnectionParams(url="http://127.0.0.1:8082/mcp")
+# Deployments whose request was abandoned mid-call; referenced until they finish
+_detached_deployments: set = set()
 
 class DQRuleDeploymentCustomAgent(BaseAgent):
     def __init__(self):
         super().__init__(name="rule_deployment_agent")
         self._logger = setup_logger("DQ_RULE_DEPLOYMENT_AGENT")
-        self._mcp_toolset = McpToolset(connection_params=mcp_params)
+        self._mcp_toolset_manager = mcp_toolset_manager
         self._output_key = "deployment_status"
 
     # _run_async_impl is for BaseAgent inheritance
@@ -22,7 +23,7 @@ class DQRuleDeploymentCustomAgent(BaseAgent):
         # Ensure this key matches exactly what the Generation Agent saved!
         payload = context.session.state.get("configure_rule_request_payload", None)
         
-        self._logger.info(f"Deployment Agent retrieved payload: {payload}")
+        self._logger.info("Deployment Agent retrieved payload: %s", LazyPayload(payload))
 
         # 2. Halt if validation failed
         if isinstance(validation_output, str) and "VALIDATION_ERROR" in validation_output:
@@ -31,17 +32,13 @@ class DQRuleDeploymentCustomAgent(BaseAgent):
 
         if payload:
             try:
-                # 3. Access the MCP tool
-                tools = await self._mcp_toolset.get_tools() 
-                tool = next((t for t in tools if t.name == "onboard_rule"), None) 
-                
-                if not tool: 
-                    raise RuntimeError("Tool 'onboard_rule' not found in MCP server") 
+                # 3. Access the MCP tool (resolved once and cached by the manager)
+                tool = await self._mcp_toolset_manager.get_tool("onboard_rule")
 
                 # 4. Execute the tool call
                 # Note: passing 'input=payload' and 'tool_context=context'
-                result = await tool.run_async(args=payload, tool_context=context) 
-                self._logger.info(f"DEBUG: MCP Tool Result: {result}")
+                result = await self._deploy(tool, payload, context)
+                self._logger.info("DEBUG: MCP Tool Result: %s", LazyPayload(result))
                 # Check if the result returned an error from the MCP side
                 if getattr(result, "isError", False):
                     # Extract the error text from the content array
@@ -70,5 +67,30 @@ class DQRuleDeploymentCustomAgent(BaseAgent):
                 content=types.Content(role='assistant', parts=[types.Part(text="⚠️ Deployment skipped: No valid rule payload found.")])
             )
 
+    async def _deploy(self, tool, payload: dict, context):
+        """
+        Call the onboard_rule tool. Once the call has been sent it may already be
+        committed upstream, so cancelling the run (client disconnected) does not
+        abort it: the call finishes in the background and its outcome is logged.
+        """
+        call = asyncio.ensure_future(tool.run_async(args=payload, tool_context=context))
+        try:
+            return await asyncio.shield(call)
+        except asyncio.CancelledError:
+            rule_name = payload.get("rule_name")
+            self._logger.warning(f"Run cancelled while deploying rule '{rule_name}'; letting the deployment finish")
+            _detached_deployments.add(call)
+            call.add_done_callback(lambda done: self._log_detached(done, rule_name))
+            raise
+
+    def _log_detached(self, call: asyncio.Future, rule_name: str) -> None:
+        _detached_deployments.discard(call)
+        if call.cancelled():
+            self._logger.error(f"Detached deployment of rule '{rule_name}' was cancelled")
+        elif call.exception() is not None or getattr(call.result(), "isError", False):
+            self._logger.error(f"Detached deployment of rule '{rule_name}' failed: {call.exception() or call.result()}")
+        else:
+            self._logger.info(f"Detached deployment of rule '{rule_name}' completed")
+
 # Instantiate for use in orchestrator
 rule_deployment_agent = DQRuleDeploymentCustomAgent()
\ No newline at end of file
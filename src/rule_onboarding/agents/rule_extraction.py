@@ -1,9 +1,20 @@
+import os
+from typing import Optional
 from google.adk.agents import Agent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.models import LlmResponse
+from src.rule_onboarding.agents.example_selector import FewShotExampleSelector, split_examples
+from src.rule_onboarding.services.session_store import SUMMARY_STATE_KEY
 from src.rule_onboarding.utils.logger import setup_logger
+from src.rule_onboarding.utils.metrics import LLM_TOKENS_TOTAL
 
 #--- LOGGER SETUP ---
 logger = setup_logger("DQ_RULE_EXTRACTION_AGENT")
 
+# Number of few-shot examples sent per request (0 sends the whole library)
+EXTRACTION_FEW_SHOT_K = int(os.getenv("EXTRACTION_FEW_SHOT_K", "3"))
+
 DQ_EXAMPLES = """
 Example 1:
 User: Onboard Rules for sales table of customer schema with repository name AWSRepo 1) Record count with baseline_source CONFIG baseline_value 10 threshold_value 100 2) Mean on order column with baseline_source CONFIG baseline_value 1 threshold_value 40.
@@ -243,9 +254,49 @@ You are a specialized Data Quality Extraction Assistant. Your goal is to convert
 }
 """
 
+# Example library indexed once for per-request few-shot selection
+DQ_EXAMPLE_LIBRARY = split_examples(DQ_EXAMPLES)
+example_selector = FewShotExampleSelector(DQ_EXAMPLE_LIBRARY)
+
+def build_extraction_instruction(context: ReadonlyContext) -> str:
+    """
+    Build the instruction with only the examples most relevant to the
+    current user message instead of the whole library, plus the summary of
+    earlier turns that history compaction removed from the session.
+    """
+    user_message = ""
+    if context.user_content and context.user_content.parts:
+        user_message = " ".join(p.text for p in context.user_content.parts if p.text)
+
+    k = EXTRACTION_FEW_SHOT_K if EXTRACTION_FEW_SHOT_K > 0 else len(DQ_EXAMPLE_LIBRARY)
+    examples = example_selector.select(user_message, k)
+    rendered = "\n\n".join(f"Example {i}:\n{e['text']}" for i, e in enumerate(examples, start=1))
+    instruction = f"{SYSTEM_INSTRUCTION}\n\n### Examples:\n{rendered}"
+    # Bounded by compaction (SUMMARY_MAX_LINES short lines)
+    summary = context.state.get(SUMMARY_STATE_KEY)
+    if isinstance(summary, str) and summary.strip():
+        instruction += f"\n\n### Earlier conversation (summarized, oldest first):\n{summary}"
+    logger.info(f"Selected {len(examples)} of {len(DQ_EXAMPLE_LIBRARY)} extraction examples (~{len(instruction) // 4} instruction tokens)")
+    return instruction
+
+def record_prompt_token_count(callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+    """Log and store the prompt token count reported by the model, and count tokens."""
+    if llm_response.partial:
+        # Streamed chunks each carry usage metadata; only the final response is counted
+        return None
+    usage = llm_response.usage_metadata
+    if usage and usage.prompt_token_count is not None:
+        logger.info(f"Extraction prompt token count: {usage.prompt_token_count}")
+        callback_context.state["extraction_prompt_token_count"] = usage.prompt_token_count
+        LLM_TOKENS_TOTAL.inc(usage.prompt_token_count, agent=callback_context.agent_name, kind="prompt")
+    if usage and usage.candidates_token_count is not None:
+        LLM_TOKENS_TOTAL.inc(usage.candidates_token_count, agent=callback_context.agent_name, kind="completion")
+    return None
+
 rule_extraction_agent = Agent(
     name="rule_extraction_agent",
     model="gemini-3-flash-preview",
-    instruction=f"{SYSTEM_INSTRUCTION}\n\n### Examples:\n{DQ_EXAMPLES}",
+    instruction=build_extraction_instruction,
+    after_model_callback=record_prompt_token_count,
     output_key="raw_rule_details"
 )
\ No newline at end of file
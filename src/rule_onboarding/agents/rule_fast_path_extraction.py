@@ -0,0 +1,277 @@
+import asyncio
+import json
+import os
+import re
+from typing import AsyncGenerator, Optional
+import google.genai.types as types
+from google.adk.agents import BaseAgent
+from google.adk.events import Event
+from src.rule_onboarding.agents.rule_extraction import rule_extraction_agent
+from src.rule_onboarding.agents.rule_validation import SPECULATIVE_LOOKUP_ENABLED, cancel_speculative_lookup, start_speculative_lookup
+from src.rule_onboarding.services.mcp_toolset_manager import mcp_toolset_manager
+from src.rule_onboarding.services.session_store import SUMMARY_STATE_KEY
+from src.rule_onboarding.utils.extraction_cache import ExtractionCache
+from src.rule_onboarding.utils.logger import setup_logger
+from src.rule_onboarding.utils.metrics import registry
+from src.rule_onboarding.utils.partial_json import PartialJsonScanner
+
+# Set to "false" to always send extraction to the LLM
+EXTRACTION_FAST_PATH_ENABLED = os.getenv("EXTRACTION_FAST_PATH_ENABLED", "true").lower() == "true"
+
+# --- Extraction Cache Settings ---
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+EXTRACTION_CACHE_DB_PATH = os.getenv("EXTRACTION_CACHE_DB_PATH", "extraction_cache.db")
+EXTRACTION_CACHE_TTL_SECONDS = float(os.getenv("EXTRACTION_CACHE_TTL_SECONDS", "86400"))
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "10000"))
+
+_extraction_cache: Optional[ExtractionCache] = None
+
+# Which path answered each extraction: "fast_path", "cache" or "llm"
+EXTRACTION_PATH_TOTAL = registry.counter("dq_extraction_path_total", "Extractions by the path that answered them.", ("path",))
+
+def get_extraction_cache() -> ExtractionCache:
+    """Open the extraction cache lazily so importing the agents creates no files."""
+    global _extraction_cache
+    if _extraction_cache is None:
+        _extraction_cache = ExtractionCache(
+            EXTRACTION_CACHE_DB_PATH,
+            ttl_seconds=EXTRACTION_CACHE_TTL_SECONDS,
+            max_entries=EXTRACTION_CACHE_MAX_ENTRIES
+        )
+    return _extraction_cache
+
+def _reset_extraction_cache_after_fork() -> None:
+    # SQLite connections must not cross a fork; each worker opens its own on first use
+    global _extraction_cache
+    _extraction_cache = None
+
+os.register_at_fork(after_in_child=_reset_extraction_cache_after_fork)
+
+# --- GRAMMAR ---
+# Rule type phrases, longest first so "mean variance" wins over "mean"
+RULE_TYPE_PATTERNS = [
+    (r"mean\s+variance", "MEAN_VARIANCE"),
+    (r"median\s+variance", "MEDIAN_VARIANCE"),
+    (r"(?:record|row)\s+count", "RECORD_COUNT"),
+    (r"stale\s+count", "STALE_COUNT"),
+    (r"stale\s+context", "STALE_CONTEXT"),
+    (r"null\s+count", "NULL_COUNT"),
+    (r"mean", "MEAN"),
+    (r"sum", "SUM"),
+]
+RULE_TYPE_REGEX = re.compile(r"\b(" + "|".join(p for p, _ in RULE_TYPE_PATTERNS) + r")\b", re.IGNORECASE)
+
+# Table level rules use the rule type as the column name
+TABLE_LEVEL_RULE_TYPES = {"RECORD_COUNT", "STALE_COUNT", "STALE_CONTEXT"}
+
+# File based datasets: extension -> db_name (as in DQ_EXAMPLES)
+FILE_DB_NAMES = {"parquet": "parquet", "csv": "CSV", "json": "JSON"}
+
+NUMBER = r"(-?\d+(?:\.\d+)?)"
+TABLE_SCHEMA_REGEX = re.compile(r"\b(\w+)\s+table\s+of\s+(\w+)\s+schema\b", re.IGNORECASE)
+DATASET_PATH_REGEX = re.compile(r"\bdataset\s+(\S+?\.(parquet|csv|json))(?=[\s.,;]|$)", re.IGNORECASE)
+REPOSITORY_REGEX = re.compile(r"\brepository(?:\s+name)?\s+([A-Za-z]\w*)", re.IGNORECASE)
+RULE_NAME_REGEX = re.compile(r"\brule\s+(?:with\s+)?name\s+(\w+)", re.IGNORECASE)
+CLAUSE_SPLIT_REGEX = re.compile(r"(?:^|\s)\d+\)\s*")
+COLUMN_REGEXES = [
+    re.compile(r"\bon\s+column\s+(\w+)", re.IGNORECASE),
+    re.compile(r"\bon\s+(\w+)\s+column\b", re.IGNORECASE),
+]
+BASELINE_SOURCE_REGEX = re.compile(r"\bbaseline[_\s]source\s+(\w+)", re.IGNORECASE)
+BASELINE_VALUE_REGEX = re.compile(r"\bbaseline[_\s]value\s+" + NUMBER, re.IGNORECASE)
+THRESHOLD_VALUE_REGEX = re.compile(r"\bthreshold[_\s]value\s+" + NUMBER, re.IGNORECASE)
+
+def _to_number(value: str):
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+def _single(regex: re.Pattern, text: str) -> Optional[str]:
+    """Return the only match of 'regex' in 'text', or None if absent or ambiguous."""
+    matches = {m.group(1) for m in regex.finditer(text)}
+    return matches.pop() if len(matches) == 1 else None
+
+def _rule_type_for(phrase: str) -> str:
+    for pattern, rule_type in RULE_TYPE_PATTERNS:
+        if re.fullmatch(pattern, phrase, re.IGNORECASE):
+            return rule_type
+    raise ValueError(phrase)
+
+def _parse_attribute(clause: str) -> Optional[dict]:
+    rule_types = {_rule_type_for(m.group(1)) for m in RULE_TYPE_REGEX.finditer(clause)}
+    if len(rule_types) != 1:
+        return None
+    rule_type = rule_types.pop()
+
+    if rule_type in TABLE_LEVEL_RULE_TYPES:
+        column_name = rule_type
+    else:
+        columns = {m.group(1) for regex in COLUMN_REGEXES for m in regex.finditer(clause)}
+        if len(columns) != 1:
+            return None
+        column_name = columns.pop()
+
+    baseline_value = _single(BASELINE_VALUE_REGEX, clause)
+    threshold_value = _single(THRESHOLD_VALUE_REGEX, clause)
+    if baseline_value is None or threshold_value is None:
+        return None
+
+    baseline_sources = {m.group(1).upper() for m in BASELINE_SOURCE_REGEX.finditer(clause)}
+    if len(baseline_sources) > 1 or not baseline_sources <= {"CONFIG", "PREVIOUS"}:
+        return None
+
+    return {
+        "column_name": column_name,
+        "rule_type": rule_type,
+        "baseline_source": baseline_sources.pop() if baseline_sources else "CONFIG",
+        "rule_details": {
+            "baseline_value": _to_number(baseline_value),
+            "threshold_value": _to_number(threshold_value)
+        }
+    }
+
+def parse_rule_request(user_message: str) -> Optional[dict]:
+    """
+    Deterministically parse templated onboarding requests (the phrasing used
+    in DQ_EXAMPLES) into the 'raw_rule_details' schema.
+
+    Returns None whenever any field cannot be read with full confidence, so
+    the caller can fall back to the LLM extraction agent.
+    """
+    text = " ".join((user_message or "").split())
+    if not text:
+        return None
+
+    # 1. Dataset: "<table> table of <schema> schema" or "dataset <path>.<ext>"
+    table_schema = {(m.group(1), m.group(2)) for m in TABLE_SCHEMA_REGEX.finditer(text)}
+    dataset_paths = {(m.group(1), m.group(2).lower()) for m in DATASET_PATH_REGEX.finditer(text)}
+    if len(table_schema) + len(dataset_paths) != 1:
+        return None
+    if table_schema:
+        dataset_name, db_name = table_schema.pop()
+        name_prefix = f"{db_name}_{dataset_name}".upper()
+    else:
+        dataset_name, extension = dataset_paths.pop()
+        db_name = FILE_DB_NAMES[extension]
+        stem = re.sub(r"\W", "_", dataset_name.rsplit("/", 1)[-1].rsplit(".", 1)[0])
+        name_prefix = f"AWS_S3_{stem}".upper() if dataset_name.lower().startswith("s3://") else stem.upper()
+
+    # 2. Repository is required for the fast path
+    repository_name = _single(REPOSITORY_REGEX, text)
+    if not repository_name:
+        return None
+
+    # 3. One attribute per numbered clause ("1) ... 2) ..."), else the whole message
+    clauses = [c for c in CLAUSE_SPLIT_REGEX.split(text)[1:] if c.strip()] or [text]
+    attributes = []
+    for clause in clauses:
+        attribute = _parse_attribute(clause)
+        if attribute is None:
+            return None
+        attributes.append(attribute)
+
+    # 4. Rule name: explicit, else DQ_[DB]_[DATASET]_[TYPE]_RULE
+    rule_name = _single(RULE_NAME_REGEX, text)
+    if not rule_name:
+        type_part = f"_{attributes[0]['rule_type']}" if len(attributes) == 1 else ""
+        rule_name = f"DQ_{name_prefix}{type_part}_RULE"
+
+    return {
+        "rule_name": rule_name,
+        "db_name": db_name,
+        "dataset_name": dataset_name,
+        "repository_name": repository_name,
+        "attributes": attributes
+    }
+
+def _parse_llm_output(raw_output) -> Optional[dict]:
+    """Parse the LLM extraction output (optionally ```json fenced) into a dict."""
+    if isinstance(raw_output, dict):
+        return raw_output
+    if not isinstance(raw_output, str):
+        return None
+    text = raw_output.strip()
+    if text.startswith("```json") and text.endswith("```"):
+        text = text[7:-3].strip()
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+class DQRuleFastPathExtractionAgent(BaseAgent):
+    """
+    Extraction stage that tries the deterministic parser first, then the
+    persistent extraction cache, and only delegates to the LLM extraction
+    agent when neither can answer.
+    """
+
+    def __init__(self, llm_extraction_agent):
+        super().__init__(name="rule_fast_path_extraction_agent", sub_agents=[llm_extraction_agent])
+        self._logger = setup_logger("DQ_RULE_EXTRACTION_AGENT")
+        self._output_key = "raw_rule_details"
+        self._mcp_toolset_manager = mcp_toolset_manager
+
+    async def _run_async_impl(self, ctx) -> AsyncGenerator[Event, None]:
+        user_message = ""
+        if ctx.user_content and ctx.user_content.parts:
+            user_message = " ".join(p.text for p in ctx.user_content.parts if p.text)
+
+        parsed = parse_rule_request(user_message) if EXTRACTION_FAST_PATH_ENABLED else None
+        if parsed:
+            ctx.session.state[self._output_key] = parsed
+            EXTRACTION_PATH_TOTAL.inc(path="fast_path")
+            self._logger.info(f"Fast-path extraction parsed rule: {parsed['rule_name']}")
+            yield Event(
+                author=self.name,
+                content=types.Content(role="assistant", parts=[types.Part(text=f"Fast-path Extraction Complete for Rule: {parsed['rule_name']}")])
+            )
+            return
+
+        # Follow-up turns depend on conversation history, so only the first
+        # user message of a session is served from (or stored in) the cache.
+        # Compaction drops earlier turns' events but leaves their summary in state
+        user_turns = sum(1 for event in ctx.session.events if event.author == "user")
+        first_turn = user_turns <= 1 and not ctx.session.state.get(SUMMARY_STATE_KEY)
+        use_cache = EXTRACTION_CACHE_ENABLED and bool(user_message) and first_turn
+
+        if use_cache:
+            cached = await asyncio.to_thread(get_extraction_cache().get, user_message)
+            if cached:
+                ctx.session.state[self._output_key] = cached
+                EXTRACTION_PATH_TOTAL.inc(path="cache")
+                self._logger.info(f"Extraction cache hit for rule: {cached.get('rule_name')}")
+                yield Event(
+                    author=self.name,
+                    content=types.Content(role="assistant", parts=[types.Part(text=f"Cached Extraction Complete for Rule: {cached.get('rule_name')}")])
+                )
+                return
+
+        # Fall through to the Gemini extraction agent
+        self._logger.info("Fast-path extraction not confident, delegating to LLM extraction agent.")
+        EXTRACTION_PATH_TOTAL.inc(path="llm")
+        # With a streaming run config the model's JSON arrives in partial events;
+        # 'repository_name' is usually among the first fields, so start its lookup early
+        scanner = PartialJsonScanner() if SPECULATIVE_LOOKUP_ENABLED else None
+        try:
+            async for event in self.sub_agents[0].run_async(ctx):
+                if scanner is not None and event.partial and event.content and event.content.parts:
+                    scanner.feed("".join(part.text for part in event.content.parts if part.text))
+                    repo_name = scanner.fields.get("repository_name")
+                    if isinstance(repo_name, str) and repo_name:
+                        start_speculative_lookup(self._mcp_toolset_manager, repo_name, ctx, self._logger)
+                        scanner = None
+                    elif scanner.done:
+                        scanner = None
+                yield event
+        except asyncio.CancelledError:
+            # Nobody will validate this run's output
+            cancel_speculative_lookup(ctx.invocation_id)
+            raise
+
+        if use_cache:
+            extracted = _parse_llm_output(ctx.session.state.get(self._output_key))
+            if extracted:
+                await asyncio.to_thread(get_extraction_cache().set, user_message, extracted)
+
+# Instantiate for use in orchestrator
+fast_path_rule_extraction_agent = DQRuleFastPathExtractionAgent(rule_extraction_agent)
@@ -3,7 +3,7 @@ from google.adk.agents import BaseAgent
 from google.adk.events import Event
 from typing import AsyncGenerator
 from google.genai import types
-from src.rule_onboarding.utils.logger import setup_logger
+from src.rule_onboarding.utils.logger import LazyPayload, setup_logger
 
 class DQRuleGenerationCustomAgent(BaseAgent):
 
@@ -48,7 +48,7 @@ class DQRuleGenerationCustomAgent(BaseAgent):
 
             # Save the final JSON to state so the Deployment Agent can use it
             state[self._output_key] = final_json_payload
-            self._logger.info(f"Final Payload Generated: {json.dumps(final_json_payload)}")
+            self._logger.info("Final Payload Generated: %s", LazyPayload(final_json_payload))
             # Yield Success Event
             yield Event(
                 author=self.name,
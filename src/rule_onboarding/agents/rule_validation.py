@@ -1,112 +1,171 @@
+import asyncio
 import json
+import os
+import time
+from collections import OrderedDict
 from typing import AsyncGenerator
 from unittest import result
 from google.adk.agents import BaseAgent
-from google.adk.events import Event
+from google.adk.events import Event, EventActions
 from google.genai import types
-from google.adk.tools.mcp_tool import McpToolset, StreamableHTTPConnectionParams
-from src.rule_onboarding.utils.logger import setup_logger
+from src.rule_onboarding.agents.rule_constraints import rule_attribute_validator
+from src.rule_onboarding.services.mcp_toolset_manager import mcp_toolset_manager
+from src.rule_onboarding.utils.logger import LazyPayload, setup_logger
+from src.rule_onboarding.utils.metrics import registry
 
-# MCP Connection for repository lookups
-mcp_params = StreamableHTTPConnectionParams(url="http://127.0.0.1:8082/mcp")
+# State key where the repository lookup stage leaves the resolved connectivity id
+CONNECTIVITY_STATE_KEY = "resolved_connectivity_id"
+
+class RuleValidationError(Exception):
+    """Validation failure; the message is the user-facing VALIDATION_ERROR text."""
+
+def parse_rule_details(raw_data) -> dict:
+    """Extraction output (dict, JSON string or fenced JSON block) as a dict."""
+    if isinstance(raw_data, str):
+        if raw_data.startswith("```json") and raw_data.endswith("```"):
+            raw_data = raw_data[7:-3].strip()  # remove ```json and ```
+        return json.loads(raw_data)
+    return raw_data
+
+async def lookup_connectivity_id(toolset_manager, repo_name: str, tool_context, logger) -> str:
+    """Resolve 'repo_name' to a connectivity id via the MCP tool."""
+    if not repo_name:
+        raise RuleValidationError("VALIDATION_ERROR: Please provide the 'repository_name' for connectivity to be used.")
+    try:
+        # Find and call the get_connectivity_id tool
+        tool = await toolset_manager.get_tool("get_connectivity_id_by_repository_name")
+        # Expected return: {"connectivity_id": "1"} or a 404 message
+        tool_result = await tool.run_async(args={"repository_name": repo_name}, tool_context=tool_context)
+    except Exception as e:
+        raise RuleValidationError(f"VALIDATION_ERROR: MCP Connectivity lookup failed: {str(e)}")
+    logger.info("MCP Tool result: %s", LazyPayload(tool_result))
+
+    # Handle Errors (Check isError flag or 404 in content)
+    if getattr(tool_result, "isError", False) or "404" in str(tool_result):
+        raise RuleValidationError(f"VALIDATION_ERROR: Repository '{repo_name}' was not found as part of existing configuration.")
+
+    # Extract connectivity_id from structuredContent (Pydantic mapped)
+    conn_id = None
+    if hasattr(tool_result, 'structuredContent') and tool_result.structuredContent:
+        conn_id = tool_result.structuredContent.get("connectivity_id")
+    if not conn_id:
+        raise RuleValidationError(f"VALIDATION_ERROR: Could not retrieve Connectivity ID missing for repository '{repo_name}'.")
+    logger.info(f"Successfully mapped {repo_name} to {conn_id}")
+    return conn_id
+
+# --- Speculative Repository Lookup ---
+# The extraction stage starts the connectivity lookup as soon as 'repository_name'
+# shows up in the streamed LLM output; validation reuses the result when the final
+# JSON names the same repository, so the MCP round trip overlaps LLM generation.
+SPECULATIVE_LOOKUP_ENABLED = os.getenv("SPECULATIVE_LOOKUP_ENABLED", "true").lower() == "true"
+# Lookups nobody claimed within this window (the run failed before validation) are dropped
+SPECULATIVE_LOOKUP_TTL_SECONDS = float(os.getenv("SPECULATIVE_LOOKUP_TTL_SECONDS", "120"))
+SPECULATIVE_LOOKUP_MAX_PENDING = int(os.getenv("SPECULATIVE_LOOKUP_MAX_PENDING", "1000"))
+
+# "started", "used" (final JSON agreed), "discarded" (it did not), "expired" or "cancelled"
+SPECULATIVE_LOOKUPS_TOTAL = registry.counter("dq_speculative_lookups_total", "Speculative connectivity lookups by outcome.", ("outcome",))
+
+# invocation id -> (repository name, started at, lookup task)
+_speculative_lookups: "OrderedDict[str, tuple[str, float, asyncio.Task]]" = OrderedDict()
+
+def _drop_speculative_lookup(invocation_id: str, outcome: str) -> None:
+    _, _, task = _speculative_lookups.pop(invocation_id)
+    task.cancel()
+    SPECULATIVE_LOOKUPS_TOTAL.inc(outcome=outcome)
+
+def _expire_speculative_lookups() -> None:
+    now = time.monotonic()
+    for invocation_id, (_, started_at, _) in list(_speculative_lookups.items()):
+        if now - started_at < SPECULATIVE_LOOKUP_TTL_SECONDS and len(_speculative_lookups) <= SPECULATIVE_LOOKUP_MAX_PENDING:
+            break
+        _drop_speculative_lookup(invocation_id, "expired")
+
+def start_speculative_lookup(toolset_manager, repo_name: str, ctx, logger) -> None:
+    """Start looking up 'repo_name' for this invocation before extraction has finished."""
+    if not repo_name or ctx.invocation_id in _speculative_lookups:
+        return
+    _expire_speculative_lookups()
+    task = asyncio.create_task(lookup_connectivity_id(toolset_manager, repo_name, ctx, logger))
+    # Failures surface when validation awaits the task; never as "exception was never retrieved"
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    _speculative_lookups[ctx.invocation_id] = (repo_name, time.monotonic(), task)
+    SPECULATIVE_LOOKUPS_TOTAL.inc(outcome="started")
+    logger.info(f"Started speculative connectivity lookup for repository: {repo_name}")
+
+def cancel_speculative_lookup(invocation_id: str) -> None:
+    """Drop this invocation's speculative lookup (the run was cancelled before validation)."""
+    if invocation_id in _speculative_lookups:
+        _drop_speculative_lookup(invocation_id, "cancelled")
+
+async def resolve_connectivity_id(toolset_manager, repo_name: str, ctx, logger) -> str:
+    """
+    Connectivity id for 'repo_name': the speculative lookup's result when it was
+    started for the same repository, otherwise a fresh MCP lookup.
+    """
+    entry = _speculative_lookups.get(ctx.invocation_id)
+    if entry is not None:
+        speculative_repo, _, task = entry
+        if speculative_repo == repo_name:
+            del _speculative_lookups[ctx.invocation_id]
+            SPECULATIVE_LOOKUPS_TOTAL.inc(outcome="used")
+            return await task
+        logger.info(f"Discarding speculative lookup for '{speculative_repo}'; final repository is '{repo_name}'")
+        _drop_speculative_lookup(ctx.invocation_id, "discarded")
+    return await lookup_connectivity_id(toolset_manager, repo_name, ctx, logger)
+
+def check_attributes(attributes: list) -> None:
+    """
+    Rule attribute checks (CPU only) against the compiled constraint table;
+    raises once with every violation of every attribute.
+    """
+    violations = rule_attribute_validator.validate(attributes)
+    if not violations:
+        return
+    if len(violations) == 1:
+        raise RuleValidationError(f"VALIDATION_ERROR: {violations[0].message}")
+    details = "\n".join(f"- {violation}" for violation in violations)
+    raise RuleValidationError(f"VALIDATION_ERROR: Found {len(violations)} rule attribute violations:\n{details}")
 
 class DQRuleValidationCustomAgent(BaseAgent):
     def __init__(self):
         super().__init__(name="rule_validation_agent")
         self._output_key = "validated_rule_details"
         self._logger = setup_logger("DQ_RULE_VALIDATION_AGENT")
-        # Initialize toolset as a private attribute to avoid Pydantic issues
-        self._mcp_toolset = McpToolset(connection_params=mcp_params)
+        # Shared toolset manager as a private attribute to avoid Pydantic issues
+        self._mcp_toolset_manager = mcp_toolset_manager
 
     async def _run_async_impl(self, ctx) -> AsyncGenerator[Event, None]:
         state = ctx.session.state
         raw_data = state.get("raw_rule_details", "")
-        self._logger.info(f"Received raw data for validation: {raw_data}")
+        self._logger.info("Received raw data for validation: %s", LazyPayload(raw_data))
 
         try:
             # Parse Payload
-            if isinstance(raw_data, str):
-                if raw_data.startswith("```json") and raw_data.endswith("```"):
-                    raw_data = raw_data[7:-3].strip()  # remove ```json and ```
-                data = json.loads(raw_data)
-            else:
-                data = raw_data
-            self._logger.info(f"Parsed data: {data}")
-            # Repository Validation via MCP Tool
+            data = parse_rule_details(raw_data)
+            self._logger.info("Parsed data: %s", LazyPayload(data))
+            # 1. Repository Validation via MCP Tool
             repo_name = data.get("repository_name")
             self._logger.info(f"Validating repository: {repo_name}")
-            if not repo_name:
-                 async for event in self._yield_error(ctx, "VALIDATION_ERROR: Please provide the 'repository_name' for connectivity to be used."):
-                    yield event
-                 return
-            # 1. Connectivity Lookup via MCP
-            try:
-                # Find and call the get_connectivity_id tool
-                tool_name = "get_connectivity_id_by_repository_name"
-                tools = await self._mcp_toolset.get_tools()
-                tool = next((t for t in tools if t.name == tool_name), None)
-                
-                if not tool:
-                    available = [t.name for t in tools]
-                    self._logger.error(f"Tool '{tool_name}' not found. Available tools: {available}")
-                    raise RuntimeError(f"Tool '{tool_name}' not found. Available tools: {available}")
-
-                # 2. Call tool (Pass repository_name as a keyword arg in a dict)
-                # Expected return: {"connectivity_id": "1"} or a 404 message
-                
-                tool_result = await tool.run_async(args={"repository_name": repo_name}, tool_context=ctx)
-                self._logger.info(f"MCP Tool result: {tool_result}")
-           
-                # 3. Handle Errors (Check isError flag or 404 in content)
-                if getattr(tool_result, "isError", False) or "404" in str(tool_result):
-                    msg = f"VALIDATION_ERROR: Repository '{repo_name}' was not found as part of existing configuration."
-                    async for event in self._yield_error(ctx, msg):
-                        yield event
-                    return
-
-                # 4. Extract connectivity_id from structuredContent (Pydantic mapped)
-                conn_id = None
-                if hasattr(tool_result, 'structuredContent') and tool_result.structuredContent:
-                    conn_id = tool_result.structuredContent.get("connectivity_id")
-                if not conn_id:
-                    msg = f"VALIDATION_ERROR: Could not retrieve Connectivity ID missing for repository '{repo_name}'."
-                    async for event in self._yield_error(ctx, msg):
-                        yield event
-                    return
-
-                # Update payload: Remove repo_name, Add connectivity_id
-                data.pop("repository_name")
-                data["connectivity_id"] = conn_id
-                self._logger.info(f"Successfully mapped {repo_name} to {conn_id}")
-
-            except Exception as e:
-                 async for event in self._yield_error(ctx, f"VALIDATION_ERROR: MCP Connectivity lookup failed: {str(e)}"):
-                    yield event
-                 return
-
-            # 3. Rule Attributes Validation
-            attributes = data.get("attributes", [])
-            for attr in attributes:
-                rule_type = attr.get("rule_type", "").upper()
-                baseline_source = attr.get("baseline_source", "").upper()
-                details = attr.get("rule_details", {})
-                baseline_val = float(details.get("baseline_value", 0))
-
-                # Logic for STALE_COUNT / STALE_CONTEXT / RECORD_COUNT
-                if rule_type in ["STALE_COUNT", "STALE_CONTEXT","RECORD_COUNT"]:
-                    if baseline_source == "PREVIOUS" and baseline_val != 1.0:
-                        msg = f"VALIDATION_ERROR: Rule {rule_type} with PREVIOUS baseline must have value 1.0."
-                        async for event in self._yield_error(ctx, msg):
-                            yield event
-                        return
-
-            # 4. Success - Save updated data (with connectivity_id)
+            conn_id = await resolve_connectivity_id(self._mcp_toolset_manager, repo_name, ctx, self._logger)
+
+            # Update payload: Remove repo_name, Add connectivity_id
+            data.pop("repository_name")
+            data["connectivity_id"] = conn_id
+
+            # 2. Rule Attributes Validation
+            check_attributes(data.get("attributes", []))
+
+            # 3. Success - Save updated data (with connectivity_id)
             state[self._output_key] = data
             yield Event(
                 author=self.name, 
                 content=types.Content(role='assistant', parts=[types.Part(text="VALIDATION_SUCCESS")])
             )
 
+        except RuleValidationError as e:
+            async for event in self._yield_error(ctx, str(e)):
+                yield event
+            return
         except Exception as e:
             msg = f"VALIDATION_ERROR: {str(e)}"
             async for event in self._yield_error(ctx, msg):
@@ -121,4 +180,101 @@ class DQRuleValidationCustomAgent(BaseAgent):
         content=types.Content(role='assistant', parts=[types.Part(text=msg)])
     )
 
+# --- Validation split into DAG stages ---
+# The repository lookup (network) and the attribute checks (CPU) do not depend on
+# each other, so a DagAgent runs them concurrently and joins them in
+# DQRuleValidationJoinAgent before generation.
+
+class _ValidationStageAgent(BaseAgent):
+    def __init__(self, name: str):
+        super().__init__(name=name)
+        self._output_key = "validated_rule_details"
+        self._logger = setup_logger("DQ_RULE_VALIDATION_AGENT")
+
+    async def _yield_error(self, ctx, msg: str) -> AsyncGenerator[Event, None]:
+        self._logger.error(msg)
+        ctx.session.state[self._output_key] = msg
+        # Escalate so the DAG cancels the sibling stages and starts no new ones
+        yield Event(
+            author=self.name,
+            content=types.Content(role='assistant', parts=[types.Part(text=msg)]),
+            actions=EventActions(escalate=True)
+        )
+
+class DQRepositoryLookupAgent(_ValidationStageAgent):
+    """Resolves 'repository_name' to a connectivity id."""
+
+    def __init__(self):
+        super().__init__(name="repository_lookup_agent")
+        self._mcp_toolset_manager = mcp_toolset_manager
+
+    async def _run_async_impl(self, ctx) -> AsyncGenerator[Event, None]:
+        try:
+            data = parse_rule_details(ctx.session.state.get("raw_rule_details", ""))
+            repo_name = data.get("repository_name")
+            self._logger.info(f"Validating repository: {repo_name}")
+            conn_id = await resolve_connectivity_id(self._mcp_toolset_manager, repo_name, ctx, self._logger)
+        except RuleValidationError as e:
+            async for event in self._yield_error(ctx, str(e)):
+                yield event
+            return
+        except Exception as e:
+            async for event in self._yield_error(ctx, f"VALIDATION_ERROR: {str(e)}"):
+                yield event
+            return
+        ctx.session.state[CONNECTIVITY_STATE_KEY] = conn_id
+        yield Event(
+            author=self.name,
+            content=types.Content(role='assistant', parts=[types.Part(text="CONNECTIVITY_LOOKUP_SUCCESS")])
+        )
+
+class DQAttributeValidationAgent(_ValidationStageAgent):
+    """Checks every rule attribute."""
+
+    def __init__(self):
+        super().__init__(name="attribute_validation_agent")
+
+    async def _run_async_impl(self, ctx) -> AsyncGenerator[Event, None]:
+        try:
+            data = parse_rule_details(ctx.session.state.get("raw_rule_details", ""))
+            check_attributes(data.get("attributes", []))
+        except RuleValidationError as e:
+            async for event in self._yield_error(ctx, str(e)):
+                yield event
+            return
+        except Exception as e:
+            async for event in self._yield_error(ctx, f"VALIDATION_ERROR: {str(e)}"):
+                yield event
+            return
+        yield Event(
+            author=self.name,
+            content=types.Content(role='assistant', parts=[types.Part(text="ATTRIBUTE_VALIDATION_SUCCESS")])
+        )
+
+class DQRuleValidationJoinAgent(_ValidationStageAgent):
+    """Joins the validation branches into 'validated_rule_details'."""
+
+    def __init__(self):
+        # Same name as the single-stage validator: downstream stages and the API treat it alike
+        super().__init__(name="rule_validation_agent")
+
+    async def _run_async_impl(self, ctx) -> AsyncGenerator[Event, None]:
+        state = ctx.session.state
+        try:
+            data = dict(parse_rule_details(state.get("raw_rule_details", "")))
+        except Exception as e:
+            async for event in self._yield_error(ctx, f"VALIDATION_ERROR: {str(e)}"):
+                yield event
+            return
+        data.pop("repository_name", None)
+        data["connectivity_id"] = state.get(CONNECTIVITY_STATE_KEY)
+        state[self._output_key] = data
+        yield Event(
+            author=self.name,
+            content=types.Content(role='assistant', parts=[types.Part(text="VALIDATION_SUCCESS")])
+        )
+
+# Authors whose events can carry a VALIDATION_ERROR
+VALIDATION_AGENT_NAMES = ("rule_validation_agent", "repository_lookup_agent", "attribute_validation_agent")
+
 rule_validation_agent = DQRuleValidationCustomAgent()
\ No newline at end of file
@@ -1,98 +1,591 @@
 import os
+import json
+import time
+import uuid
+import weakref
 from dotenv import load_dotenv
 import asyncio
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.runners import Runner
-from google.adk.sessions import DatabaseSessionService
+from google.adk.utils.context_utils import Aclosing
 from google.genai import types
 from pydantic import BaseModel
-from src.rule_onboarding.core import dq_rule_onboarding_orchestrator
+from typing import Literal, Optional
+from src.rule_onboarding.agents.rule_fast_path_extraction import get_extraction_cache
+from src.rule_onboarding.agents.rule_validation import VALIDATION_AGENT_NAMES
+from src.rule_onboarding.core import dq_mock_rule_onboarding_orchestrator, dq_rule_onboarding_orchestrator, dq_structured_rule_onboarding_orchestrator
+from src.rule_onboarding.core.progress import ProgressReporter, StageProgressPlugin, current_progress
+from src.rule_onboarding.services.mcp_toolset_manager import mcp_toolset_manager
+from src.rule_onboarding.services.mcp_transport import MCP_SERVER_URL
+from src.rule_onboarding.services.session_store import HotSessionCache, SqliteSessionService
 import uvicorn
 from src.rule_onboarding.utils.logger import setup_logger
+from src.rule_onboarding.utils.metrics import CONTENT_TYPE, cache_collector, registry
+from src.rule_onboarding.utils.tracing import get_tracer, init_tracing, request_context, span_buffer, stage_breakdown
 
 #--- LOGGER SETUP ---
 logger = setup_logger("DQ_RULE_ONBOARDING_API_SERVER")
 
+#--- TRACING SETUP ---
+init_tracing("dq-rule-onboarding-api")
+
 # This looks for a .env file in the current directory or parents
 load_dotenv() 
 
 # ADK can find the key
 api_key = os.getenv("GOOGLE_API_KEY")
 
-app = FastAPI()
+APP_NAME = "dq_rule_onboarding_app"
+USER_ID = "2323ad05035"
 
 # This will create a 'sessions.db' file in project root
-DB_URL = "sqlite:///sessions.db"
+DB_URL = os.getenv("SESSION_DB_URL", "sqlite:///sessions.db")
+
+# Uvicorn worker processes serving the API; every worker shares sessions.db
+# (uvicorn's own --workers default is WEB_CONCURRENCY)
+BACKEND_WORKERS = max(1, int(os.getenv("BACKEND_WORKERS") or os.getenv("WEB_CONCURRENCY") or "1"))
+# Check a cached session against the database before serving it. On by default:
+# a plain 'uvicorn --workers N' launch is invisible here, and the check is one
+# indexed query. Set to false only when a single process owns sessions.db.
+SESSION_SHARED_STORE = os.getenv("SESSION_SHARED_STORE", "true").lower() == "true"
+
+# Initialize the persistent service (WAL mode, pooled, off the event loop)
+session_store = SqliteSessionService(
+    db_url = DB_URL,
+    pool_size = int(os.getenv("SESSION_DB_POOL_SIZE", "5")),
+    max_overflow = int(os.getenv("SESSION_DB_MAX_OVERFLOW", "10")),
+    busy_timeout_ms = int(os.getenv("SESSION_DB_BUSY_TIMEOUT_MS", "5000")),
+    history_window_events = int(os.getenv("SESSION_HISTORY_MAX_EVENTS", "40"))
+)
+
+# Active sessions are served from memory; events are written behind in batches
+session_service = HotSessionCache(
+    session_store,
+    max_sessions = int(os.getenv("SESSION_CACHE_MAX_SESSIONS", "1000")),
+    flush_interval_seconds = float(os.getenv("SESSION_FLUSH_INTERVAL_SECONDS", "0.05")),
+    flush_batch_size = int(os.getenv("SESSION_FLUSH_BATCH_SIZE", "100")),
+    # Another worker may have advanced a cached session
+    shared_store = SESSION_SHARED_STORE
+)
+
+# --- Session History Compaction ---
+# Sessions holding more than SESSION_HISTORY_MAX_EVENTS events are compacted down to the
+# SESSION_HISTORY_KEEP_EVENTS most recent ones; older turns collapse into a summary entry.
+SESSION_HISTORY_MAX_EVENTS = session_service.history_window_events
+SESSION_HISTORY_KEEP_EVENTS = int(os.getenv("SESSION_HISTORY_KEEP_EVENTS", "20"))
+# Per-stage state that is no longer needed once a rule has been deployed
+INTERMEDIATE_STATE_KEYS = ("raw_rule_details", "validated_rule_details", "configure_rule_request_payload")
+
+# Keep references to fire-and-forget tasks so they are not garbage collected
+_background_tasks: set = set()
+
+# One turn (or compaction) at a time per session: the cache hands every caller the
+# same Session object, and write-behind persistence skips ADK's stale-session check.
+# Weak values: a lock lives only while some turn holds or waits for it.
+_session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+def session_lock(session_id: str) -> asyncio.Lock:
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _session_locks[session_id] = lock
+    return lock
+
+async def _compact_session(session_id: str, trim_state_keys: tuple):
+    try:
+        async with session_lock(session_id):
+            await session_service.compact_session(
+                app_name=APP_NAME,
+                user_id=USER_ID,
+                session_id=session_id,
+                keep_events=SESSION_HISTORY_KEEP_EVENTS,
+                trim_state_keys=trim_state_keys
+            )
+    except Exception as e:
+        logger.warning(f"Session compaction failed for {session_id}: {e}")
+
+def schedule_session_compaction(session_id: str, event_count: int, deployed: bool):
+    """Compact the session in the background once the turn has finished streaming."""
+    if event_count <= SESSION_HISTORY_MAX_EVENTS and not deployed:
+        return
+    trim_state_keys = INTERMEDIATE_STATE_KEYS if deployed else ()
+    task = asyncio.create_task(_compact_session(session_id, trim_state_keys))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+# One Runner per pipeline for the lifetime of the app
+_runners: dict[str, Runner] = {}
+
+def get_runner(agent) -> Runner:
+    runner = _runners.get(agent.name)
+    if runner is None:
+        runner = Runner(
+          agent = agent,
+          app_name = APP_NAME,
+          session_service = session_service,
+          # Stage start/finish events for the structured /onboard-rule streams
+          plugins = [StageProgressPlugin()]
+        )
+        _runners[agent.name] = runner
+    return runner
+
+# --- Session Retention ---
+SESSION_RETENTION_SECONDS = float(os.getenv("SESSION_RETENTION_SECONDS", str(7 * 24 * 3600)))
+SESSION_RETENTION_INTERVAL_SECONDS = float(os.getenv("SESSION_RETENTION_INTERVAL_SECONDS", "3600"))
+SESSION_RETENTION_BATCH_SIZE = int(os.getenv("SESSION_RETENTION_BATCH_SIZE", "500"))
+
+# Outcome of the most recent retention run
+last_retention_report: dict = {}
+
+# Only the worker holding this lock runs the janitor
+SESSION_JANITOR_LOCK_PATH = os.getenv("SESSION_JANITOR_LOCK_PATH", "sessions.db.janitor.lock")
+
+def acquire_janitor_lease(path: str = SESSION_JANITOR_LOCK_PATH):
+    """
+    Non-blocking exclusive lock on 'path'. Returns the open lock file (keep
+    it open to hold the lease) or None if another worker holds it.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        # No flock (Windows): every worker runs its own janitor
+        return open(path, "a")
+    lock_file = open(path, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+async def session_retention_janitor():
+    """Periodically expire idle sessions and reclaim their space."""
+    # Runs under the janitor lease, so only one worker ever rewrites the database file
+    try:
+        await session_service.enable_incremental_vacuum()
+    except Exception as e:
+        logger.error(f"Enabling incremental auto_vacuum failed, retrying on next start: {e}")
+    while True:
+        try:
+            report = await session_service.expire_sessions(
+                max_age_seconds=SESSION_RETENTION_SECONDS,
+                batch_size=SESSION_RETENTION_BATCH_SIZE
+            )
+            last_retention_report.clear()
+            last_retention_report.update(report)
+        except Exception as e:
+            logger.error(f"Session retention run failed: {e}")
+        await asyncio.sleep(SESSION_RETENTION_INTERVAL_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Always leased: however many workers were started, only one runs the janitor
+    janitor_lease = acquire_janitor_lease()
+    janitor = None
+    if janitor_lease is not None:
+        janitor = asyncio.create_task(session_retention_janitor())
+    if mcp_toolset_manager.transport == "inprocess":
+        # Register the MCP server's metrics (connectivity cache, config API) in this process now,
+        # rather than on the first tool call, so /metrics reports them from the start
+        import src.rule_onboarding.services.mcp_server  # noqa: F401
+        logger.info("MCP transport: inprocess (MCP tools, connectivity cache, metrics and traces live in this process)")
+    else:
+        logger.info(f"MCP transport: http ({MCP_SERVER_URL})")
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    if janitor:
+        janitor.cancel()
+    if janitor_lease:
+        janitor_lease.close()
+    await session_service.aclose()
+
+app = FastAPI(lifespan=lifespan)
+
+# --- Metrics ---
+HTTP_REQUESTS_TOTAL = registry.counter("dq_http_requests_total", "HTTP requests served.", ("method", "route", "status"))
+HTTP_REQUEST_SECONDS = registry.histogram("dq_http_request_seconds", "Time until the response headers are sent.", ("method", "route"))
+INFLIGHT_STREAMS = registry.gauge("dq_inflight_streams", "Onboarding streams currently open.")
+INFLIGHT_STREAMS.set(0)
+ABANDONED_REQUESTS_TOTAL = registry.counter("dq_abandoned_requests_total", "Onboarding turns cancelled because the client went away.")
+
+registry.add_collector(cache_collector("extraction", lambda: get_extraction_cache().stats()))
+registry.add_collector(cache_collector("session", session_service.stats))
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware (no per-request task or body buffering) counting requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                route = scope.get("route")
+                HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope["method"], route=getattr(route, "path", "unmatched"))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS_TOTAL.inc(method=scope["method"], route=route, status=status["code"])
+
+app.add_middleware(RequestMetricsMiddleware)
+
+# Pipeline behind /onboard-rule: "llm" (Gemini extraction) or "mock" (HardcodedExtractionAgent, for benchmarks)
+ONBOARDING_PIPELINE = os.getenv("ONBOARDING_PIPELINE", "llm").lower()
+default_orchestrator = dq_mock_rule_onboarding_orchestrator if ONBOARDING_PIPELINE == "mock" else dq_rule_onboarding_orchestrator
+
+# Stream model output as partial events; extraction reads 'repository_name' from the
+# partial JSON to start the connectivity lookup before the model has finished
+LLM_STREAMING_ENABLED = os.getenv("LLM_STREAMING_ENABLED", "true").lower() == "true"
+run_config = RunConfig(streaming_mode=StreamingMode.SSE if LLM_STREAMING_ENABLED else StreamingMode.NONE)
+
+# How often an open /onboard-rule stream checks whether its client is still connected
+CLIENT_DISCONNECT_POLL_SECONDS = float(os.getenv("CLIENT_DISCONNECT_POLL_SECONDS", "0.25"))
 
-# Initialize the persistent service
-session_service = DatabaseSessionService(db_url = DB_URL)
+# Upper bound on pipelines run concurrently for a single batch request
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
 
 class ChatRequest(BaseModel):
     message: str
     session_id: str
 
-async def dq_rule_onboarding_agent_streamer(user_message: str, session_id: str):
+class BatchOnboardRequest(BaseModel):
+    # Natural-language onboarding messages (run through the full pipeline)
+    messages: list[str] = []
+    # Structured rule specs in the 'raw_rule_details' schema (extraction is skipped)
+    rules: list[dict] = []
+    batch_id: Optional[str] = None
+    max_concurrency: Optional[int] = None
+
+async def dq_rule_onboarding_event_streamer(user_message: str, session_id: str, agent = default_orchestrator, initial_state: Optional[dict] = None, request_id: Optional[str] = None, is_disconnected = None):
+    """
+    Run one onboarding turn under a root span, yielding typed progress events
+    as they happen: 'accepted', 'stage_started', 'stage_finished',
+    'rule_preview', 'message' and a final 'result'. Every span below the root
+    (ADK agent stages, MCP tool calls, config API requests) carries the same
+    request ID.
+
+    'is_disconnected' (an async callable) is polled while the turn runs; once
+    it reports True the turn is cancelled. Closing the stream early cancels
+    it as well.
+    """
+    request_id = request_id or str(uuid.uuid4())
+    reporter = ProgressReporter()
+    watcher = None
+    INFLIGHT_STREAMS.inc()
+    try:
+        with request_context(request_id), get_tracer().start_as_current_span(
+            "onboard_rule_request", attributes={"dq.session_id": session_id, "dq.agent": agent.name}
+        ):
+            reporter.emit("accepted", request_id=request_id, session_id=session_id)
+            # The turn runs in its own task (inheriting the request context) so that
+            # progress from concurrent stages is streamed while the runner is busy
+            token = current_progress.set(reporter)
+            try:
+                turn = asyncio.create_task(_run_agent_turn(user_message, session_id, agent, initial_state, reporter))
+            finally:
+                current_progress.reset(token)
+            # A turn cancelled before it got to run still ends the stream
+            turn.add_done_callback(lambda _: reporter.finished or reporter.emit("result", status="cancelled", message="", stage_timings_ms={}))
+            if is_disconnected is not None:
+                watcher = asyncio.create_task(_cancel_on_disconnect(turn, is_disconnected, request_id))
+            try:
+                while True:
+                    event = await reporter.events.get()
+                    yield event
+                    if event["type"] == "result":
+                        break
+            finally:
+                if watcher is not None:
+                    watcher.cancel()
+                if not turn.done():
+                    _abandon_turn(turn, request_id)
+                await asyncio.gather(turn, return_exceptions=True)
+    finally:
+        INFLIGHT_STREAMS.dec()
+
+def _abandon_turn(turn: asyncio.Task, request_id: str) -> None:
+    # Cancellation reaches the running stages (LLM and MCP calls included); the
+    # DAG starts no further stage. A deployment already sent upstream still completes.
+    logger.warning(f"Client went away; cancelling onboarding request {request_id}")
+    ABANDONED_REQUESTS_TOTAL.inc()
+    turn.cancel()
+
+async def _cancel_on_disconnect(turn: asyncio.Task, is_disconnected, request_id: str) -> None:
+    while not turn.done():
+        await asyncio.sleep(CLIENT_DISCONNECT_POLL_SECONDS)
+        if not turn.done() and await is_disconnected():
+            _abandon_turn(turn, request_id)
+            return
+
+async def dq_rule_onboarding_agent_streamer(user_message: str, session_id: str, agent = default_orchestrator, initial_state: Optional[dict] = None, request_id: Optional[str] = None, is_disconnected = None):
+    """Plain-text view of the turn: the deployment output or the validation error."""
+    async for event in dq_rule_onboarding_event_streamer(user_message, session_id, agent, initial_state, request_id, is_disconnected):
+        if event["type"] == "message":
+            yield event["text"]
+        elif event["type"] == "result" and event["status"] == "error":
+            raise RuntimeError(event["error"])
+
+async def _run_agent_turn(user_message: str, session_id: str, agent, initial_state: Optional[dict], reporter: ProgressReporter):
+    """Run the pipeline for one turn; always finishes with a 'result' event."""
+    output = []
+    try:
+        lock = session_lock(session_id)
+        if lock.locked():
+            logger.info(f"Waiting for the running turn of session {session_id}")
+        async with lock:
+            status = await _run_agent_turn_events(user_message, session_id, agent, initial_state, reporter, output)
+    except asyncio.CancelledError:
+        # Ends the stream if it is still being read
+        reporter.emit("result", status="cancelled", message="".join(output), stage_timings_ms=dict(reporter.stage_timings_ms))
+        raise
+    except Exception as e:
+        logger.error(f"Onboarding turn failed for {session_id}: {e}")
+        reporter.emit("result", status="error", error=str(e), message="".join(output), stage_timings_ms=dict(reporter.stage_timings_ms))
+        return
+    reporter.emit("result", status=status, message="".join(output), stage_timings_ms=dict(reporter.stage_timings_ms))
+
+async def _run_agent_turn_events(user_message: str, session_id: str, agent, initial_state: Optional[dict], reporter: ProgressReporter, output: list) -> str:
 
     # Check if session exists; if not, create it
     try:
-        session = await session_service.get_session(session_id=session_id)
+        session = await session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
     except Exception:
         # If get_session fails or session doesn't exist, ONLY THEN create it
         session = None
     if not session:
         try:
             await session_service.create_session(
-                app_name="dq_rule_onboarding_app",
-                user_id="2323ad05035",
-                session_id=session_id
+                app_name=APP_NAME,
+                user_id=USER_ID,
+                session_id=session_id,
+                state=initial_state
             )
             logger.info(f"Created new session: {session_id}")
         except Exception as e:
             # Handle the case where it might have been created by a parallel request
             logger.warning(f"Session creation skipped or failed: {e}")
        
-    # Initialize the Runner
-    runner = Runner(
-      agent = dq_rule_onboarding_orchestrator,
-      app_name="dq_rule_onboarding_app",
-      session_service = session_service
-    )
+    # Reuse the app-lifetime Runner for this pipeline
+    runner = get_runner(agent)
     
     # Format message for ADK
     content = types.Content(role='user', parts=[types.Part(text=user_message)])
     
-    # The run_async is used for real-time output
+    # Events already stored for this session (bounded by the history window) plus this turn's
+    event_count = (len(session.events) if session else 0) + 1
+    deployed = False
+
     # The Runner fetches history for 'session_id' and appends the new message
     # The run_async is the core of the multi-turn memory logic
-    async for event in runner.run_async(session_id = session_id, user_id="2323ad05035", new_message = content):
-        
-        # Check for Validation Errors from RuleValidation Custom Agent
-        if event.author == "rule_validation_agent":
-            text_output = event.content.parts[0].text
-            if "VALIDATION_ERROR" in text_output:
-                yield text_output.replace("VALIDATION_ERROR: ", "❌ ")
-                return  # Stop the stream and the pipeline here
-        # Handle Text Chunks
-        # We only stream 'partial' text chunks or the final text
-        # Only yield text if it belongs to the deployment agent.
-        if event.author == "rule_deployment_agent":
-            if event.content and event.content.parts:
-                for part in event.content.parts:
-                    if part.text:
-                        # In a streaming setup, yielding raw text is fine for st.write_stream
-                        yield part.text
-        
-        # Tool Calls
-        if event.get_function_calls():
-            logger.info(f"Agent calling tools: {event.get_function_calls()}")
-            
-        await asyncio.sleep(0.01)
-        
+    try:
+        # 'initial_state' rides on this turn's message too: create_session only seeds it
+        # for a new session, and a reused session id must not run on stale state
+        async with Aclosing(runner.run_async(session_id = session_id, user_id=USER_ID, new_message = content, state_delta = initial_state, run_config = run_config)) as events:
+            async for event in events:
+                if event.partial:
+                    # Streamed model chunks are not stored; the aggregated event follows
+                    continue
+                event_count += 1
+
+                # Check for Validation Errors from the validation stages
+                if event.author in VALIDATION_AGENT_NAMES:
+                    text_output = event.content.parts[0].text
+                    if "VALIDATION_ERROR" in text_output:
+                        message = text_output.replace("VALIDATION_ERROR: ", "❌ ")
+                        output.append(message)
+                        reporter.emit("message", stage=event.author, text=message)
+                        return "failed"  # Stop the pipeline here
+                # Only the deployment agent's text is user-facing
+                if event.author == "rule_deployment_agent":
+                    if event.content and event.content.parts:
+                        for part in event.content.parts:
+                            if part.text:
+                                deployed = deployed or part.text.startswith("✅")
+                                output.append(part.text)
+                                reporter.emit("message", stage=event.author, text=part.text)
+
+                # Tool Calls
+                if event.get_function_calls():
+                    logger.info(f"Agent calling tools: {event.get_function_calls()}")
+    finally:
+        # Turn-end durability: this turn's events are on disk before the stream closes
+        try:
+            await session_service.flush_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+        except Exception as e:
+            logger.error(f"Session flush failed for {session_id}: {e}")
+        # Keep per-turn latency flat: bound the stored history once the turn is over
+        schedule_session_compaction(session_id, event_count, deployed)
+    return "success" if deployed else "failed"
+
+async def _run_batch_item(index: int, session_id: str, semaphore: asyncio.Semaphore, message: Optional[str] = None, rule: Optional[dict] = None) -> dict:
+    """
+    Run one batch item through the onboarding pipeline and collect its output.
+    Structured rules are seeded into 'raw_rule_details' and skip extraction.
+    """
+    async with semaphore:
+        try:
+            if rule is not None:
+                streamer = dq_rule_onboarding_agent_streamer(
+                    f"Onboard structured rule {rule.get('rule_name')}",
+                    session_id,
+                    agent=dq_structured_rule_onboarding_orchestrator,
+                    initial_state={"raw_rule_details": rule},
+                    request_id=session_id
+                )
+            else:
+                streamer = dq_rule_onboarding_agent_streamer(message, session_id, request_id=session_id)
+            output = "".join([chunk async for chunk in streamer])
+            status = "success" if output.startswith("✅") else "failed"
+        except Exception as e:
+            logger.error(f"Batch item {index} failed: {e}")
+            output, status = f"❌ {str(e)}", "error"
+    return {"index": index, "session_id": session_id, "status": status, "output": output}
+
+async def dq_rule_onboarding_batch_streamer(request: BatchOnboardRequest):
+    batch_id = request.batch_id or str(uuid.uuid4())
+    concurrency = max(1, min(request.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    items = [{"message": m} for m in request.messages] + [{"rule": r} for r in request.rules]
+    tasks = [
+        asyncio.create_task(_run_batch_item(index, f"{batch_id}-{index}", semaphore, **item))
+        for index, item in enumerate(items)
+    ]
+    logger.info(f"Batch {batch_id}: running {len(tasks)} items with concurrency {concurrency}")
+
+    summary = {"batch_id": batch_id, "total": len(tasks), "success": 0, "failed": 0, "error": 0}
+    try:
+        # Stream each result as one NDJSON line as soon as it completes
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            summary[result["status"]] += 1
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"summary": summary}) + "\n"
+    finally:
+        # Client went away: stop the items that have not finished yet
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+# --- Streaming Formats ---
+# /onboard-rule streams plain text by default; "ndjson" (one JSON event per line) and
+# "sse" (Server-Sent Events) stream typed progress events from the first millisecond
+STREAM_MEDIA_TYPES = {"text": "text/plain", "ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def negotiate_stream_format(stream: Optional[str], accept: Optional[str]) -> str:
+    """Explicit '?stream=' wins; otherwise the Accept header picks a structured format."""
+    if stream:
+        return stream
+    accept = (accept or "").lower()
+    if "text/event-stream" in accept:
+        return "sse"
+    if "application/x-ndjson" in accept:
+        return "ndjson"
+    return "text"
+
+async def _encode_events(events, stream_format: str):
+    async for event in events:
+        data = json.dumps(event, default=str)
+        if stream_format == "sse":
+            yield f"event: {event['type']}\ndata: {data}\n\n"
+        else:
+            yield data + "\n"
+
 @app.post("/onboard-rule")
-async def onboard_rule(request: ChatRequest):
-    logger.info(f"Received onboarding request for session: {request.session_id}")
-    return StreamingResponse(dq_rule_onboarding_agent_streamer(request.message, request.session_id), media_type="text/plain")
+async def onboard_rule(request: ChatRequest, http_request: Request, stream: Optional[Literal["text", "ndjson", "sse"]] = None, accept: Optional[str] = Header(None), x_request_id: Optional[str] = Header(None)):
+    request_id = x_request_id or str(uuid.uuid4())
+    stream_format = negotiate_stream_format(stream, accept)
+    logger.info(f"Received onboarding request {request_id} for session: {request.session_id} ({stream_format} stream)")
+    headers = {"X-Request-ID": request_id}
+    if stream_format == "text":
+        body = dq_rule_onboarding_agent_streamer(request.message, request.session_id, request_id=request_id, is_disconnected=http_request.is_disconnected)
+    else:
+        body = _encode_events(dq_rule_onboarding_event_streamer(request.message, request.session_id, request_id=request_id, is_disconnected=http_request.is_disconnected), stream_format)
+        # Keep proxies from buffering progress events
+        headers.update({"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    return StreamingResponse(body, media_type=STREAM_MEDIA_TYPES[stream_format], headers=headers)
+
+@app.post("/onboard-rules/batch")
+async def onboard_rules_batch(request: BatchOnboardRequest):
+    logger.info(f"Received batch onboarding request: {len(request.messages)} messages, {len(request.rules)} rules")
+    return StreamingResponse(dq_rule_onboarding_batch_streamer(request), media_type="application/x-ndjson")
+
+@app.get("/sessions/retention")
+async def session_retention_stats():
+    return last_retention_report
+
+@app.get("/extraction-cache/stats")
+async def extraction_cache_stats():
+    return await asyncio.to_thread(get_extraction_cache().stats)
+
+# --- Connectivity Cache Admin ---
+# Called through the MCP admin tools, so they reach the cache the pipeline actually
+# uses: the in-process server's with MCP_TRANSPORT=inprocess, the remote one over HTTP
+async def _call_admin_tool(tool_name: str, args: dict):
+    tool = await mcp_toolset_manager.get_tool(tool_name)
+    result = await tool.run_async(args=args, tool_context=None)
+    if result.isError:
+        detail = result.content[0].text if result.content else f"{tool_name} failed"
+        return JSONResponse({"error": detail}, status_code=502)
+    return result.structuredContent
+
+@app.get("/connectivity-cache/stats")
+async def connectivity_cache_stats():
+    return await _call_admin_tool("get_connectivity_cache_stats", {})
+
+@app.delete("/connectivity-cache/{repository_name}")
+async def invalidate_connectivity_cache(repository_name: str):
+    return await _call_admin_tool("invalidate_connectivity_cache", {"repository_name": repository_name})
+
+@app.delete("/connectivity-cache")
+async def flush_connectivity_cache():
+    return await _call_admin_tool("flush_connectivity_cache", {})
+
+# --- Health Probes ---
+# Longest a readiness probe waits on the session database
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: startup has finished and the session database answers."""
+    checks = {"startup": getattr(app.state, "ready", False)}
+    try:
+        await asyncio.wait_for(session_service.ping(), READINESS_TIMEOUT_SECONDS)
+        checks["session_store"] = True
+    except Exception as e:
+        logger.warning(f"Readiness check failed for session store: {e}")
+        checks["session_store"] = False
+    ready = all(checks.values())
+    return JSONResponse({"status": "ready" if ready else "not_ready", "checks": checks}, status_code=200 if ready else 503)
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+@app.get("/traces/{request_id}")
+async def request_trace(request_id: str):
+    """Spans recorded in this process for one request, plus time per stage."""
+    spans = span_buffer.spans(request_id)
+    return {"request_id": request_id, "stages_ms": stage_breakdown(spans), "spans": spans}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8083)
+    # Workers need the import string; each one imports this module and builds its own state
+    uvicorn.run("src.rule_onboarding.api.backend:app", host="127.0.0.1", port=8083, workers=BACKEND_WORKERS)
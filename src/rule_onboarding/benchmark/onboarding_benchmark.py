@@ -0,0 +1,278 @@
+"""
+Offline load test for the full onboarding pipeline.
+
+Runs the config API stub (8081), the MCP server (8082, only for the "http"
+MCP transport) and the backend (8083) on localhost in this process, with HardcodedExtractionAgent in place of
+Gemini, drives /onboard-rule at a fixed concurrency and writes a JSON report
+(throughput, end-to-end and per-stage p50/p95/p99).
+
+    uv run python -m src.rule_onboarding.benchmark.onboarding_benchmark \\
+        --requests 200 --concurrency 20 --latency-ms 20 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+import httpx
+
+# Fixed by the MCP client and config API URLs in the services
+CONFIG_API_PORT = 8081
+MCP_PORT = 8082
+BACKEND_PORT = 8083
+
+ONBOARD_MESSAGE = "Onboard stale count rule on sales table of customer schema using repository AWSRepo"
+
+def percentile(values: list[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))  # ceil
+    return ordered[int(rank) - 1]
+
+def summarize(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values), 3),
+    }
+
+def stage_latencies(spans: list[dict], request_ids: set) -> dict[str, list[float]]:
+    """Per span name, the time (ms) each request spent in it."""
+    per_request: dict[tuple, float] = {}
+    for span in spans:
+        request_id = span["attributes"].get("dq.request_id")
+        if request_id not in request_ids or not span.get("endTimeUnixNano"):
+            continue
+        key = (span["name"], request_id)
+        per_request[key] = per_request.get(key, 0.0) + (span["endTimeUnixNano"] - span["startTimeUnixNano"]) / 1e6
+    stages: dict[str, list[float]] = {}
+    for (name, _), duration_ms in per_request.items():
+        stages.setdefault(name, []).append(duration_ms)
+    return stages
+
+def build_report(config: dict, results: list[dict], wall_seconds: float, spans: list[dict]) -> dict:
+    succeeded = [r for r in results if r["status"] == "success"]
+    request_ids = {r["request_id"] for r in results}
+    return {
+        "started_at": config.pop("started_at"),
+        "config": config,
+        "requests": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(results) / wall_seconds, 3) if wall_seconds else 0.0,
+        "latency_ms": summarize([r["latency_ms"] for r in results]),
+        "time_to_first_byte_ms": summarize([r["ttfb_ms"] for r in results if r["ttfb_ms"] is not None]),
+        "stages_ms": {name: summarize(values) for name, values in sorted(stage_latencies(spans, request_ids).items())},
+    }
+
+def compare_reports(baseline: dict, current: dict) -> dict:
+    """Relative change of throughput and end-to-end/stage percentiles vs. a baseline report."""
+    def change(old, new):
+        return round((new - old) / old * 100, 2) if old else None
+
+    diff = {"throughput_rps_pct": change(baseline.get("throughput_rps"), current.get("throughput_rps"))}
+    for pct in ("p50", "p95", "p99"):
+        diff[f"latency_{pct}_pct"] = change(baseline["latency_ms"].get(pct), current["latency_ms"].get(pct))
+    diff["stages_p95_pct"] = {
+        name: change(baseline["stages_ms"][name].get("p95"), stats.get("p95"))
+        for name, stats in current["stages_ms"].items() if name in baseline.get("stages_ms", {})
+    }
+    return diff
+
+# --- Servers ---
+async def _start_server(app, port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            # uvicorn exits via SystemExit when it cannot bind
+            raise RuntimeError(f"Server on port {port} failed to start (port already in use?)")
+        await asyncio.sleep(0.05)
+    return server, task
+
+async def _start_backend_workers(workers: int):
+    """Backend as 'uvicorn --workers N' in a child process (spans stay in the workers)."""
+    from src.rule_onboarding.utils.supervisor import wait_until_ready
+    env = dict(os.environ, BACKEND_WORKERS=str(workers))
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "uvicorn", "src.rule_onboarding.api.backend:app",
+        "--host", "127.0.0.1", "--port", str(BACKEND_PORT), "--workers", str(workers), "--log-level", "warning",
+        env=env
+    )
+    if not await wait_until_ready(f"http://127.0.0.1:{BACKEND_PORT}/readyz", 120, process):
+        process.terminate()
+        await process.wait()
+        raise RuntimeError(f"Backend with {workers} workers failed to start")
+    return process
+
+# --- Driver ---
+async def _onboard_once(client: httpx.AsyncClient, index: int, stream_format: str = "text") -> dict:
+    request_id = f"bench-{uuid.uuid4().hex[:12]}"
+    started = time.perf_counter()
+    ttfb_ms, body = None, []
+    try:
+        async with client.stream(
+            "POST", "/onboard-rule",
+            params={"stream": stream_format},
+            json={"message": ONBOARD_MESSAGE, "session_id": f"bench-session-{index}-{request_id}"},
+            headers={"X-Request-ID": request_id}
+        ) as response:
+            async for chunk in response.aiter_text():
+                if ttfb_ms is None:
+                    ttfb_ms = (time.perf_counter() - started) * 1000
+                body.append(chunk)
+        text = "".join(body)
+        if stream_format == "ndjson":
+            # The last event is the turn's result
+            result = json.loads(text.strip().splitlines()[-1]) if text.strip() else {}
+            text = result.get("message", "")
+            status = "success" if response.status_code == 200 and result.get("status") == "success" else "failed"
+        else:
+            status = "success" if response.status_code == 200 and text.startswith("✅") else "failed"
+    except (httpx.HTTPError, ValueError) as e:
+        text, status = str(e), "error"
+    return {
+        "request_id": request_id,
+        "status": status,
+        "latency_ms": (time.perf_counter() - started) * 1000,
+        "ttfb_ms": ttfb_ms,
+        "output": text[:200],
+    }
+
+async def drive_load(base_url: str, total: int, concurrency: int, stream_format: str = "text") -> tuple[list[dict], float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def bounded(index: int):
+            async with semaphore:
+                return await _onboard_once(client, index, stream_format)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(bounded(i) for i in range(total)))
+        return list(results), time.perf_counter() - started
+
+async def run_benchmark(args) -> dict:
+    # Settings are read at import time, so configure the services before importing them
+    workdir = tempfile.mkdtemp(prefix="dq_benchmark_")
+    os.environ["ONBOARDING_PIPELINE"] = "mock"
+    os.environ["MCP_TRANSPORT"] = args.mcp_transport
+    os.environ.setdefault("SESSION_DB_URL", f"sqlite:///{os.path.join(workdir, 'sessions.db')}")
+    os.environ.setdefault("EXTRACTION_CACHE_DB_PATH", os.path.join(workdir, "extraction_cache.db"))
+    os.environ.setdefault("TRACE_RING_BUFFER_SIZE", str(max(5000, (args.requests + args.warmup) * 50)))
+    # The connectivity cache would hide the MCP -> config API path after the first request
+    if args.no_connectivity_cache:
+        os.environ["CONNECTIVITY_CACHE_TTL_SECONDS"] = "0"
+
+    from src.rule_onboarding.api import backend
+    from src.rule_onboarding.services import mcp_server
+    from src.rule_onboarding.services.config_api_stub import create_config_api_stub
+    from src.rule_onboarding.services.mcp_toolset_manager import mcp_toolset_manager
+    from src.rule_onboarding.services.mcp_transport import resolve_mcp_transport
+    from src.rule_onboarding.utils.tracing import span_buffer
+
+    for name in logging.root.manager.loggerDict:
+        if name.startswith("DQ_"):
+            logging.getLogger(name).setLevel(args.log_level)
+
+    config = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "warmup": args.warmup,
+        "stub_latency_ms": args.latency_ms,
+        "stub_jitter_ms": args.jitter_ms,
+        "stub_error_rate": args.error_rate,
+        "connectivity_cache": not args.no_connectivity_cache,
+        "backend_workers": args.backend_workers,
+        "mcp_transport": args.mcp_transport,
+        "stream_format": args.stream_format,
+        "label": args.label,
+    }
+
+    stub = create_config_api_stub(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, seed=args.seed)
+    servers = [await _start_server(stub, CONFIG_API_PORT)]
+    if resolve_mcp_transport(args.mcp_transport) == "http":
+        # In-process, the backend serves the MCP tools itself
+        servers.append(await _start_server(mcp_server.mcp.http_app(path="/mcp"), MCP_PORT))
+    backend_process = None
+    if args.backend_workers > 1:
+        # Per-stage spans are recorded in the worker processes, so 'stages_ms' stays empty
+        backend_process = await _start_backend_workers(args.backend_workers)
+    else:
+        servers.append(await _start_server(backend.app, BACKEND_PORT))
+    try:
+        base_url = f"http://127.0.0.1:{BACKEND_PORT}"
+        if args.warmup:
+            await drive_load(base_url, args.warmup, min(args.warmup, args.concurrency), args.stream_format)
+        span_buffer.clear()
+        results, wall_seconds = await drive_load(base_url, args.requests, args.concurrency, args.stream_format)
+        # Let the last spans and write-behind flushes land
+        await asyncio.sleep(0.2)
+        report = build_report(config, results, wall_seconds, span_buffer.spans())
+        report["config_api_stub"] = dict(stub.state.stats)
+    finally:
+        try:
+            await mcp_toolset_manager.close()
+        except Exception:
+            pass
+        if backend_process is not None:
+            backend_process.terminate()
+            await backend_process.wait()
+        for server, task in reversed(servers):
+            server.should_exit = True
+            await task
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the DQ rule onboarding pipeline offline.")
+    parser.add_argument("--requests", type=int, default=100, help="Measured /onboard-rule requests")
+    parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight at once")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests sent first")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Config API stub latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Config API stub latency jitter (+/-)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of config API requests failing with 503")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for injected latency/errors")
+    parser.add_argument("--backend-workers", type=int, default=1, help="Run the backend as 'uvicorn --workers N' in a child process")
+    parser.add_argument("--mcp-transport", choices=("auto", "inprocess", "http"), default="auto", help="How the agents reach the MCP tools")
+    parser.add_argument("--stream-format", choices=("text", "ndjson"), default="text", help="/onboard-rule response format (ndjson streams progress events)")
+    parser.add_argument("--no-connectivity-cache", action="store_true", help="Disable the MCP connectivity cache")
+    parser.add_argument("--label", default="", help="Free-form label stored in the report")
+    parser.add_argument("--output", default=None, help="Report path (default: benchmark_results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Baseline report to compare against")
+    parser.add_argument("--log-level", default="WARNING", help="Level for the DQ_* loggers during the run")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> dict:
+    args = parse_args(argv)
+    report = asyncio.run(run_benchmark(args))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["comparison"] = {"baseline": args.compare, **compare_reports(json.load(f), report)}
+
+    output = args.output or os.path.join("benchmark_results", f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps({k: report[k] for k in ("requests", "succeeded", "failed", "throughput_rps", "latency_ms")}, indent=2))
+    print(f"Report written to {output}")
+    return report
+
+if __name__ == "__main__":
+    main()
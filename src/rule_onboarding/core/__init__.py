@@ -1,2 +1,3 @@
-from .dq_rule_onboarding_orchestrator import dq_rule_onboarding_orchestrator
-__all__ = ["dq_rule_onboarding_orchestrator"]
\ No newline at end of file
+from .dag_agent import DagAgent
+from .dq_rule_onboarding_orchestrator import build_onboarding_pipeline, dq_rule_onboarding_orchestrator, dq_structured_rule_onboarding_orchestrator, dq_mock_rule_onboarding_orchestrator
+__all__ = ["DagAgent", "build_onboarding_pipeline", "dq_rule_onboarding_orchestrator", "dq_structured_rule_onboarding_orchestrator", "dq_mock_rule_onboarding_orchestrator"]
\ No newline at end of file
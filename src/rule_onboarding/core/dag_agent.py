@@ -0,0 +1,131 @@
+import asyncio
+from typing import AsyncGenerator
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.events import Event
+from google.adk.utils.context_utils import Aclosing
+from src.rule_onboarding.utils.logger import setup_logger
+
+# Queue marker for a stage that has run to completion
+_STAGE_DONE = object()
+
+def topological_order(dependencies: dict[str, tuple]) -> list[str]:
+    """Stage names in an order that respects 'dependencies'; rejects unknown stages and cycles."""
+    for name, deps in dependencies.items():
+        unknown = [d for d in deps if d not in dependencies]
+        if unknown:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {unknown}")
+    order, visiting, visited = [], set(), set()
+
+    def visit(name: str):
+        if name in visited:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependency cycle through stage '{name}'")
+        visiting.add(name)
+        for dep in dependencies[name]:
+            visit(dep)
+        visiting.discard(name)
+        visited.add(name)
+        order.append(name)
+
+    for name in dependencies:
+        visit(name)
+    return order
+
+def _reads_history(agent: BaseAgent) -> bool:
+    """Whether the agent (or one it delegates to) builds an LLM prompt from session events."""
+    return isinstance(agent, LlmAgent) or any(_reads_history(sub_agent) for sub_agent in agent.sub_agents)
+
+class DagAgent(BaseAgent):
+    """
+    Runs its sub-agents as a dependency graph instead of a fixed sequence.
+
+    Each stage starts as soon as every stage it depends on has finished, so
+    independent stages run concurrently and the critical path is the slowest
+    chain rather than the sum of all stages. Events from concurrent stages
+    are yielded as they happen; a stage does not continue until the runner
+    has processed its event (the same contract as ADK's ParallelAgent).
+
+    A stage reports failure by yielding an event with 'actions.escalate'
+    set: that event is passed on, in-flight stages are cancelled and no
+    further stage starts.
+
+    Only LLM stages that can run alongside another stage get their own
+    branch (as in ParallelAgent), so their prompt history never interleaves
+    with a concurrent sibling's events. Every other stage keeps the caller's
+    branch and sees the full history, exactly as under SequentialAgent.
+    """
+
+    def __init__(self, name: str, stages: list[tuple[BaseAgent, tuple]]):
+        super().__init__(name=name, sub_agents=[agent for agent, _ in stages])
+        self._dependencies = {agent.name: tuple(depends_on) for agent, depends_on in stages}
+        self._order = topological_order(self._dependencies)
+        concurrent = self._stages_with_concurrent_peers()
+        self._branched = {agent.name for agent, _ in stages if agent.name in concurrent and _reads_history(agent)}
+        self._logger = setup_logger("DQ_DAG_AGENT")
+
+    @property
+    def dependencies(self) -> dict[str, tuple]:
+        return dict(self._dependencies)
+
+    def _stages_with_concurrent_peers(self) -> set[str]:
+        # Two stages may overlap unless one (transitively) depends on the other
+        ancestors: dict[str, set[str]] = {}
+        for name in self._order:
+            ancestors[name] = set(self._dependencies[name]).union(*(ancestors[dep] for dep in self._dependencies[name]))
+        return {
+            a for a in self._order
+            if any(b != a and a not in ancestors[b] and b not in ancestors[a] for b in self._order)
+        }
+
+    def _branch_context(self, agent: BaseAgent, ctx):
+        if agent.name not in self._branched:
+            return ctx
+        # The session is shared; only the history the LLM stage is shown is narrowed
+        ctx = ctx.model_copy()
+        suffix = f"{self.name}.{agent.name}"
+        ctx.branch = f"{ctx.branch}.{suffix}" if ctx.branch else suffix
+        return ctx
+
+    async def _run_stage(self, agent: BaseAgent, ctx, queue: asyncio.Queue) -> None:
+        error = None
+        try:
+            async with Aclosing(agent.run_async(self._branch_context(agent, ctx))) as events:
+                async for event in events:
+                    resume = asyncio.Event()
+                    await queue.put((agent.name, event, resume))
+                    await resume.wait()
+        except Exception as e:
+            error = e
+        await queue.put((agent.name, _STAGE_DONE, error))
+
+    async def _run_async_impl(self, ctx) -> AsyncGenerator[Event, None]:
+        agents = {agent.name: agent for agent in self.sub_agents}
+        queue: asyncio.Queue = asyncio.Queue()
+        finished: set[str] = set()
+        tasks: dict[str, asyncio.Task] = {}
+
+        def start_ready_stages():
+            for name in self._order:
+                if name not in tasks and all(dep in finished for dep in self._dependencies[name]):
+                    tasks[name] = asyncio.create_task(self._run_stage(agents[name], ctx, queue))
+
+        try:
+            start_ready_stages()
+            while len(finished) < len(agents):
+                name, event, payload = await queue.get()
+                if event is _STAGE_DONE:
+                    if payload is not None:
+                        raise payload
+                    finished.add(name)
+                    start_ready_stages()
+                    continue
+                yield event
+                if event.actions and event.actions.escalate:
+                    self._logger.info(f"{self.name}: stage '{name}' failed, skipping the remaining stages")
+                    return
+                payload.set()
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
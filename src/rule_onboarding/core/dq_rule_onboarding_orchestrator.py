@@ -1,12 +1,40 @@
-from google.adk.agents import SequentialAgent
-from src.rule_onboarding.agents import (rule_extraction_agent,rule_validation_agent,rule_generation_agent,rule_deployment_agent)
-
-dq_rule_onboarding_orchestrator = SequentialAgent(
-    name="dq_rule_onboarding_orchestrator",
-    sub_agents=[
-        rule_extraction_agent,
-        rule_validation_agent,
-        rule_generation_agent,
-        rule_deployment_agent
+from typing import Optional
+from google.adk.agents import BaseAgent
+from src.rule_onboarding.agents import fast_path_rule_extraction_agent
+from src.rule_onboarding.agents.mock_rule_extraction import mocked_rule_extraction_agent
+from src.rule_onboarding.agents.rule_validation import DQAttributeValidationAgent, DQRepositoryLookupAgent, DQRuleValidationJoinAgent
+from src.rule_onboarding.agents.rule_generation import DQRuleGenerationCustomAgent
+from src.rule_onboarding.agents.rule_deployment import DQRuleDeploymentCustomAgent
+from src.rule_onboarding.core.dag_agent import DagAgent
+
+def build_onboarding_pipeline(name: str, extraction_agent: Optional[BaseAgent] = None) -> DagAgent:
+    """
+    Onboarding pipeline as a dependency graph:
+
+        extraction -> repository lookup (MCP)  --\\
+                   -> attribute checks (CPU)   ---> validation join -> generation -> deployment
+
+    The lookup and the attribute checks run concurrently; a failure in
+    either stops the run before generation. ADK agents can only have one
+    parent, so every pipeline gets its own stage instances.
+    """
+    after_extraction = (extraction_agent.name,) if extraction_agent else ()
+    stages = [(extraction_agent, ())] if extraction_agent else []
+    stages += [
+        (DQRepositoryLookupAgent(), after_extraction),
+        (DQAttributeValidationAgent(), after_extraction),
+        (DQRuleValidationJoinAgent(), ("repository_lookup_agent", "attribute_validation_agent")),
+        (DQRuleGenerationCustomAgent(), ("rule_validation_agent",)),
+        (DQRuleDeploymentCustomAgent(), ("rule_generation_agent",)),
     ]
-)
\ No newline at end of file
+    return DagAgent(name=name, stages=stages)
+
+# Deterministic parser first; delegates to the LLM rule_extraction_agent when unsure
+dq_rule_onboarding_orchestrator = build_onboarding_pipeline("dq_rule_onboarding_orchestrator", fast_path_rule_extraction_agent)
+
+# Pipeline for structured rule specs that are already in the 'raw_rule_details' schema.
+dq_structured_rule_onboarding_orchestrator = build_onboarding_pipeline("dq_structured_rule_onboarding_orchestrator")
+
+# Same pipeline with the static HardcodedExtractionAgent in place of Gemini
+# (benchmarks and offline runs)
+dq_mock_rule_onboarding_orchestrator = build_onboarding_pipeline("dq_mock_rule_onboarding_orchestrator", mocked_rule_extraction_agent)
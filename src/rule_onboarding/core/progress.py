@@ -0,0 +1,82 @@
+import asyncio
+import contextvars
+import time
+from typing import Optional
+from google.adk.agents import BaseAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.plugins.base_plugin import BasePlugin
+from src.rule_onboarding.agents.rule_validation import parse_rule_details
+
+class ProgressReporter:
+    """
+    Typed progress events for one onboarding request, in the order they
+    happened. Every event carries 'type' and 'elapsed_ms' (since the
+    request was accepted); the HTTP stream drains 'events'.
+    """
+
+    def __init__(self):
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.stage_timings_ms: dict[str, float] = {}
+        self._started_at = time.perf_counter()
+        self._stage_started_at: dict[str, float] = {}
+        self._previewed = False
+        # Set once the final 'result' event has been emitted
+        self.finished = False
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._started_at) * 1000, 3)
+
+    def emit(self, event_type: str, **fields) -> None:
+        self.events.put_nowait({"type": event_type, "elapsed_ms": self.elapsed_ms(), **fields})
+        self.finished = self.finished or event_type == "result"
+
+    def stage_started(self, stage: str) -> None:
+        self._stage_started_at[stage] = time.perf_counter()
+        self.emit("stage_started", stage=stage)
+
+    def stage_finished(self, stage: str, state) -> None:
+        started_at = self._stage_started_at.pop(stage, None)
+        duration_ms = round((time.perf_counter() - started_at) * 1000, 3) if started_at is not None else None
+        if duration_ms is not None:
+            self.stage_timings_ms[stage] = duration_ms
+        self.emit("stage_finished", stage=stage, duration_ms=duration_ms)
+        if not self._previewed:
+            self._preview_rule(state)
+
+    def _preview_rule(self, state) -> None:
+        # The extracted rule, as soon as a finished stage has left it in state
+        raw = state.get("raw_rule_details")
+        if not raw:
+            return
+        try:
+            rule = parse_rule_details(raw)
+        except ValueError:
+            return
+        if isinstance(rule, dict):
+            self._previewed = True
+            self.emit("rule_preview", rule=rule)
+
+# Reporter of the onboarding request currently being served (None outside a request)
+current_progress: contextvars.ContextVar[Optional[ProgressReporter]] = contextvars.ContextVar("dq_progress", default=None)
+
+class StageProgressPlugin(BasePlugin):
+    """
+    Runner plugin reporting every agent stage's start and finish to the
+    request's ProgressReporter. Concurrent DAG stages run in tasks that
+    inherit the request's context, so their events reach the same reporter.
+    """
+
+    def __init__(self):
+        super().__init__(name="dq_stage_progress")
+
+    async def before_agent_callback(self, *, agent: BaseAgent, callback_context: CallbackContext):
+        reporter = current_progress.get()
+        if reporter is not None:
+            reporter.stage_started(agent.name)
+        return None
+
+    async def after_agent_callback(self, *, agent: BaseAgent, callback_context: CallbackContext):
+        reporter = current_progress.get()
+        if reporter is not None:
+            reporter.stage_finished(agent.name, callback_context.state)
+        return None
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import random
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+import uvicorn
+from src.rule_onboarding.utils.logger import setup_logger
+
+#--- LOGGER SETUP ---
+logger = setup_logger("DQ_CONFIG_API_STUB")
+
+# --- Stub Settings ---
+# Local stand-in for the DQ config API (port 8081) used by benchmarks and demos
+CONFIG_API_STUB_PORT = int(os.getenv("CONFIG_API_STUB_PORT", "8081"))
+CONFIG_API_STUB_LATENCY_MS = float(os.getenv("CONFIG_API_STUB_LATENCY_MS", "0"))
+CONFIG_API_STUB_JITTER_MS = float(os.getenv("CONFIG_API_STUB_JITTER_MS", "0"))
+# Fraction of requests answered with a 503
+CONFIG_API_STUB_ERROR_RATE = float(os.getenv("CONFIG_API_STUB_ERROR_RATE", "0"))
+# Repositories the stub knows about: repository name -> connectivity id
+CONFIG_API_STUB_REPOSITORIES = {"AWSRepo": "1", "GCPRepo": "2", "AzureRepo": "3"}
+
+def create_config_api_stub(
+    latency_ms: float = CONFIG_API_STUB_LATENCY_MS,
+    jitter_ms: float = CONFIG_API_STUB_JITTER_MS,
+    error_rate: float = CONFIG_API_STUB_ERROR_RATE,
+    repositories: Optional[dict] = None,
+    seed: Optional[int] = None
+) -> FastAPI:
+    """
+    Build the stub app. Every request waits 'latency_ms' (+/- 'jitter_ms')
+    and fails with 503 with probability 'error_rate'. Counters are exposed
+    on 'app.state.stats'.
+    """
+    app = FastAPI(title="DQ Config API Stub")
+    rng = random.Random(seed)
+    known = dict(CONFIG_API_STUB_REPOSITORIES if repositories is None else repositories)
+    app.state.stats = {"requests": 0, "injected_errors": 0, "rules_onboarded": 0}
+
+    @app.middleware("http")
+    async def inject_latency_and_errors(request: Request, call_next):
+        app.state.stats["requests"] += 1
+        delay_ms = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms))
+        if delay_ms:
+            await asyncio.sleep(delay_ms / 1000)
+        if error_rate and rng.random() < error_rate:
+            app.state.stats["injected_errors"] += 1
+            return JSONResponse(status_code=503, content={"detail": "Injected failure"})
+        return await call_next(request)
+
+    @app.get("/api/dq/config/v1/repositories/{repository_name}/connectivity")
+    async def get_connectivity(repository_name: str):
+        if repository_name not in known:
+            raise HTTPException(status_code=404, detail=f"Repository '{repository_name}' not found")
+        return {"connectivity_id": known[repository_name]}
+
+    @app.post("/api/dq/config/v1/rules")
+    async def onboard_rule(rule: dict):
+        app.state.stats["rules_onboarded"] += 1
+        return {"message": f"Rule '{rule.get('rule_name')}' onboarded successfully"}
+
+    @app.get("/stub/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+app = create_config_api_stub()
+
+if __name__ == "__main__":
+    logger.info(f"[CONFIG API STUB] Starting on port {CONFIG_API_STUB_PORT}...")
+    uvicorn.run(app, host="127.0.0.1", port=CONFIG_API_STUB_PORT)
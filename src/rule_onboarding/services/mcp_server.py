@@ -1,19 +1,120 @@
+import asyncio
+import importlib.util
+import os
+from contextlib import asynccontextmanager
 from fastmcp import FastMCP
-from pydantic import BaseModel
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from pydantic import BaseModel, ValidationError
+from typing import Optional
 import httpx
-from src.rule_onboarding.utils.logger import setup_logger
+from src.rule_onboarding.utils.cache import TTLCache
+from src.rule_onboarding.utils.logger import LazyPayload, setup_logger
+from src.rule_onboarding.utils.metrics import CONTENT_TYPE, cache_collector, registry
+from src.rule_onboarding.utils.tracing import TracingTransport, init_tracing, remote_span, span_buffer, stage_breakdown
 from fastapi import HTTPException
+from starlette.responses import JSONResponse, PlainTextResponse
 
 #--- LOGGER SETUP ---
 logger = setup_logger("DQ_RULE_ONBOARDING_MCP_SERVER")
 
-#--- MCP SERVER SETUP ---
-mcp = FastMCP("Rule Onboarding MCP Server")
+#--- TRACING SETUP ---
+init_tracing("dq-rule-onboarding-mcp-server")
 
 # --- API URLs ---
 RULE_ONBOARDING_API_URL = "http://127.0.0.1:8081/api/dq/config/v1/rules"
 CONNECTIVITY_API_BASE_URL = "http://127.0.0.1:8081/api/dq/config/v1/repositories"
 
+# --- Config API Client Settings ---
+CONFIG_API_MAX_CONNECTIONS = int(os.getenv("CONFIG_API_MAX_CONNECTIONS", "100"))
+CONFIG_API_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("CONFIG_API_MAX_KEEPALIVE_CONNECTIONS", "20"))
+CONFIG_API_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("CONFIG_API_KEEPALIVE_EXPIRY_SECONDS", "30"))
+CONFIG_API_HTTP2 = os.getenv("CONFIG_API_HTTP2", "false").lower() == "true"
+CONFIG_API_CONNECT_TIMEOUT_SECONDS = float(os.getenv("CONFIG_API_CONNECT_TIMEOUT_SECONDS", "2"))
+CONNECTIVITY_LOOKUP_TIMEOUT_SECONDS = float(os.getenv("CONNECTIVITY_LOOKUP_TIMEOUT_SECONDS", "5"))
+RULE_ONBOARDING_TIMEOUT_SECONDS = float(os.getenv("RULE_ONBOARDING_TIMEOUT_SECONDS", "30"))
+
+CONNECTIVITY_LOOKUP_TIMEOUT = httpx.Timeout(CONNECTIVITY_LOOKUP_TIMEOUT_SECONDS, connect=CONFIG_API_CONNECT_TIMEOUT_SECONDS)
+RULE_ONBOARDING_TIMEOUT = httpx.Timeout(RULE_ONBOARDING_TIMEOUT_SECONDS, connect=CONFIG_API_CONNECT_TIMEOUT_SECONDS)
+
+# --- Bulk Onboarding Settings ---
+ONBOARD_RULES_CHUNK_SIZE = int(os.getenv("ONBOARD_RULES_CHUNK_SIZE", "50"))
+ONBOARD_RULES_MAX_PARALLEL = int(os.getenv("ONBOARD_RULES_MAX_PARALLEL", "10"))
+
+# Shared, long-lived client for the config API (opened/closed with the server)
+_http_client: httpx.AsyncClient | None = None
+
+def _create_http_client() -> httpx.AsyncClient:
+    http2 = CONFIG_API_HTTP2
+    if http2 and importlib.util.find_spec("h2") is None:
+        # HTTP/2 support needs the optional 'h2' package (httpx[http2])
+        logger.warning("CONFIG_API_HTTP2 is enabled but 'h2' is not installed. Falling back to HTTP/1.1.")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=CONFIG_API_MAX_CONNECTIONS,
+        max_keepalive_connections=CONFIG_API_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=CONFIG_API_KEEPALIVE_EXPIRY_SECONDS
+    )
+    # Every config API call gets a client span and a traceparent header
+    transport = TracingTransport(httpx.AsyncHTTPTransport(limits=limits, http2=http2))
+    return httpx.AsyncClient(transport=transport, timeout=CONNECTIVITY_LOOKUP_TIMEOUT)
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared config API client, creating it lazily when the
+    tools are invoked outside the server lifespan (e.g. tests).
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _create_http_client()
+    return _http_client
+
+@asynccontextmanager
+async def lifespan(server):
+    global _http_client
+    _http_client = _create_http_client()
+    logger.info("Config API client started")
+    try:
+        yield {}
+    finally:
+        await _http_client.aclose()
+        _http_client = None
+        logger.info("Config API client closed")
+
+class TracingMiddleware(Middleware):
+    """
+    Continue the caller's trace for every tool call. The client sends the
+    W3C trace context and request ID in the MCP request '_meta'.
+    """
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        carrier = {}
+        request_context = context.fastmcp_context.request_context if context.fastmcp_context else None
+        if request_context and request_context.meta:
+            carrier = dict(request_context.meta.model_extra or {})
+        with remote_span(f"mcp.tool {context.message.name}", carrier, **{"mcp.tool.name": context.message.name}):
+            return await call_next(context)
+
+#--- MCP SERVER SETUP ---
+mcp = FastMCP("Rule Onboarding MCP Server", lifespan=lifespan)
+mcp.add_middleware(TracingMiddleware())
+
+# --- Connectivity Cache Settings ---
+# Repositories rarely change, so lookups are cached in-process.
+# Unknown repositories (404) are cached for a shorter period.
+CONNECTIVITY_CACHE_TTL_SECONDS = float(os.getenv("CONNECTIVITY_CACHE_TTL_SECONDS", "300"))
+CONNECTIVITY_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("CONNECTIVITY_CACHE_NEGATIVE_TTL_SECONDS", "30"))
+CONNECTIVITY_CACHE_MAX_SIZE = int(os.getenv("CONNECTIVITY_CACHE_MAX_SIZE", "256"))
+
+connectivity_cache = TTLCache(
+    max_size=CONNECTIVITY_CACHE_MAX_SIZE,
+    ttl_seconds=CONNECTIVITY_CACHE_TTL_SECONDS
+)
+
+registry.add_collector(cache_collector("connectivity", connectivity_cache.stats))
+
+# In-flight upstream lookups keyed by repository name (single-flight)
+_inflight_lookups: dict[str, asyncio.Task] = {}
+
 # -------------------------
 # Models
 # -------------------------
@@ -38,6 +139,22 @@ class OnboardRuleRequest(BaseModel):
 class ConnectivityResponse(BaseModel):
     connectivity_id: str
 
+class RepositoryNotFound(BaseModel):
+    """Negative cache entry for a repository the config API does not know."""
+    detail: str
+
+class OnboardRuleResult(BaseModel):
+    index: int
+    rule_name: Optional[str] = None
+    status: str
+    message: str
+
+class BulkOnboardResponse(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    results: list[OnboardRuleResult]
+
 # -------------------------
 # MCP Tool: Rule Onboarding
 # -------------------------
@@ -59,16 +176,64 @@ async def onboard_rule(
         connectivity_id=connectivity_id,
         attributes=attributes
     )
-    logger.info(f"Attempting to onboard rule: {request}")
+    logger.info("Attempting to onboard rule: %s", LazyPayload(request))
+    return await _post_rule(request)
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(RULE_ONBOARDING_API_URL, json=request.dict())
-        response.raise_for_status()
-        result = response.json()
-    logger.info(f"Rule onboarded successfully: {result}")
+async def _post_rule(request: OnboardRuleRequest) -> str:
+    client = get_http_client()
+    response = await client.post(RULE_ONBOARDING_API_URL, json=request.model_dump(), timeout=RULE_ONBOARDING_TIMEOUT)
+    response.raise_for_status()
+    result = response.json()
+    logger.info("Rule onboarded successfully: %s", LazyPayload(result))
     return result["message"]
 
 
+# ------------------------------
+# MCP Tool: Bulk Rule Onboarding
+# ------------------------------
+@mcp.tool()
+async def onboard_rules(rules: list[dict]) -> BulkOnboardResponse:
+    """
+    Deploy many data quality rules in one call.
+    Each rule is validated and submitted independently, so one bad rule
+    does not fail the batch.
+    """
+    results: list[OnboardRuleResult] = []
+    valid: list[tuple[int, OnboardRuleRequest]] = []
+
+    # 1. Validate every payload with the same models as 'onboard_rule'
+    for index, rule in enumerate(rules):
+        try:
+            valid.append((index, OnboardRuleRequest(**rule)))
+        except (ValidationError, TypeError) as e:
+            rule_name = rule.get("rule_name") if isinstance(rule, dict) else None
+            results.append(OnboardRuleResult(index=index, rule_name=rule_name, status="error", message=str(e)))
+    logger.info(f"Bulk onboarding {len(valid)} valid rules out of {len(rules)}")
+
+    # 2. Submit in chunks, bounding how many POSTs are in flight at once.
+    # The config API only accepts single-rule POSTs, so each chunk is fanned
+    # out over the pooled client.
+    semaphore = asyncio.Semaphore(max(1, ONBOARD_RULES_MAX_PARALLEL))
+
+    async def submit(index: int, request: OnboardRuleRequest) -> OnboardRuleResult:
+        async with semaphore:
+            try:
+                message = await _post_rule(request)
+                return OnboardRuleResult(index=index, rule_name=request.rule_name, status="success", message=message)
+            except Exception as e:
+                logger.error(f"Bulk onboarding failed for rule {request.rule_name}: {e}")
+                return OnboardRuleResult(index=index, rule_name=request.rule_name, status="error", message=str(e))
+
+    chunk_size = max(1, ONBOARD_RULES_CHUNK_SIZE)
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        results.extend(await asyncio.gather(*(submit(index, request) for index, request in chunk)))
+
+    results.sort(key=lambda r: r.index)
+    succeeded = sum(1 for r in results if r.status == "success")
+    return BulkOnboardResponse(total=len(rules), succeeded=succeeded, failed=len(rules) - succeeded, results=results)
+
+
 # ----------------------------------------
 # MCP Tool: Repository Connectivity Lookup
 # ----------------------------------------
@@ -78,32 +243,133 @@ async def get_connectivity_id_by_repository_name(repository_name: str) -> Connec
     Get connectivity id for a given repository name.
     """
 
+    cached = connectivity_cache.get(repository_name)
+    if isinstance(cached, ConnectivityResponse):
+        logger.info(f"Connectivity cache hit for repo: {repository_name}")
+        return cached
+    if isinstance(cached, RepositoryNotFound):
+        logger.error(f"Repository not found (cached): {repository_name}")
+        raise HTTPException(status_code=404, detail=cached.detail)
+
+    # Concurrent lookups for the same repository share one upstream call
+    task = _inflight_lookups.get(repository_name)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_connectivity(repository_name))
+        _inflight_lookups[repository_name] = task
+        task.add_done_callback(lambda t: _finish_inflight_lookup(repository_name, t))
+    else:
+        logger.info(f"Joining in-flight connectivity lookup for repo: {repository_name}")
+
+    # Shield so one cancelled caller does not cancel the lookup for the others
+    return await asyncio.shield(task)
+
+def _finish_inflight_lookup(repository_name: str, task: asyncio.Task) -> None:
+    if _inflight_lookups.get(repository_name) is task:
+        del _inflight_lookups[repository_name]
+    # Mark the exception as retrieved in case every waiter was cancelled
+    if not task.cancelled():
+        task.exception()
+
+async def _fetch_connectivity(repository_name: str) -> ConnectivityResponse:
+    """
+    Perform the upstream connectivity lookup and populate the cache.
+    Unexpected errors are raised to every waiter and never cached.
+    """
     url = f"{CONNECTIVITY_API_BASE_URL}/{repository_name}/connectivity"
     logger.info(f"Fetching connectivity for repo: {repository_name}")
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-
-        # Success Scenario
-        if response.status_code == 200:
-            data = response.json()
-            logger.info(f"Connectivity found: {data}")
-            return ConnectivityResponse(**data)
-
-        # Repo not found
-        if response.status_code == 404:
-            error = response.json()
-            logger.error(f"Repository not found: {repository_name}")
-            raise HTTPException(
-                status_code=404,
-                detail=error.get("detail", "Repository not found")
-            )
-
-        # Unexpected error
-        logger.error(
-            f"Unexpected error {response.status_code}: {response.text}"
+    client = get_http_client()
+    response = await client.get(url, timeout=CONNECTIVITY_LOOKUP_TIMEOUT)
+
+    # Success Scenario
+    if response.status_code == 200:
+        data = response.json()
+        logger.info("Connectivity found: %s", LazyPayload(data))
+        connectivity = ConnectivityResponse(**data)
+        connectivity_cache.set(repository_name, connectivity)
+        return connectivity
+
+    # Repo not found
+    if response.status_code == 404:
+        error = response.json()
+        logger.error(f"Repository not found: {repository_name}")
+        detail = error.get("detail", "Repository not found")
+        connectivity_cache.set(
+            repository_name,
+            RepositoryNotFound(detail=detail),
+            ttl_seconds=CONNECTIVITY_CACHE_NEGATIVE_TTL_SECONDS
+        )
+        raise HTTPException(
+            status_code=404,
+            detail=detail
         )
-        response.raise_for_status()
-        
+
+    # Unexpected error
+    logger.error(
+        f"Unexpected error {response.status_code}: {response.text}"
+    )
+    response.raise_for_status()
+
+
+# ----------------------------------------
+# MCP Admin Tools: Connectivity Cache
+# ----------------------------------------
+@mcp.tool()
+async def invalidate_connectivity_cache(repository_name: str) -> dict:
+    """
+    Drop the cached connectivity lookup for a single repository.
+    """
+    removed = connectivity_cache.invalidate(repository_name)
+    logger.info(f"Connectivity cache invalidated for repo: {repository_name} (removed={removed})")
+    return {"repository_name": repository_name, "invalidated": removed}
+
+@mcp.tool()
+async def flush_connectivity_cache() -> dict:
+    """
+    Drop every cached connectivity lookup.
+    """
+    removed = connectivity_cache.clear()
+    logger.info(f"Connectivity cache flushed ({removed} entries)")
+    return {"flushed_entries": removed}
+
+@mcp.tool()
+async def get_connectivity_cache_stats() -> dict:
+    """
+    Report connectivity cache size and hit/miss counters.
+    """
+    return connectivity_cache.stats()
+
+# ----------------------------------------
+# HTTP Route: Request Traces
+# ----------------------------------------
+@mcp.custom_route("/traces/{request_id}", methods=["GET"])
+async def request_trace(request):
+    """Spans recorded in the MCP server for one request, plus time per stage."""
+    request_id = request.path_params["request_id"]
+    spans = span_buffer.spans(request_id)
+    return JSONResponse({"request_id": request_id, "stages_ms": stage_breakdown(spans), "spans": spans})
+
+# ----------------------------------------
+# HTTP Routes: Health Probes
+# ----------------------------------------
+@mcp.custom_route("/healthz", methods=["GET"])
+async def healthz(request):
+    """Liveness: the process is up and serving HTTP."""
+    return JSONResponse({"status": "ok"})
+
+@mcp.custom_route("/readyz", methods=["GET"])
+async def readyz(request):
+    """Readiness: the server lifespan has opened the config API client."""
+    ready = _http_client is not None and not _http_client.is_closed
+    return JSONResponse({"status": "ready" if ready else "not_ready", "checks": {"config_api_client": ready}}, status_code=200 if ready else 503)
+
+# ----------------------------------------
+# HTTP Route: Metrics
+# ----------------------------------------
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request):
+    """Prometheus text exposition of tool latency, cache and config API metrics."""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     mcp.run(transport="http", port=8082, host="127.0.0.1")
\ No newline at end of file
@@ -0,0 +1,183 @@
+import asyncio
+import contextvars
+import os
+from typing import Awaitable, Callable, Optional
+from mcp import types as mcp_types
+from google.adk.tools.mcp_tool import McpTool, StreamableHTTPConnectionParams
+from google.adk.tools.mcp_tool.mcp_session_manager import MCPSessionManager, retry_on_closed_resource
+from src.rule_onboarding.services.mcp_transport import MCP_SERVER_URL, resolve_mcp_transport
+from src.rule_onboarding.utils.logger import setup_logger
+from src.rule_onboarding.utils.tracing import get_tracer, inject_trace_context
+
+# Tools whose server-side work must finish once the call is sent (the upstream POST may be committed)
+UNCANCELLABLE_TOOLS = ("onboard_rule",)
+
+class TracedMcpTool(McpTool):
+    """
+    McpTool that records a client span per call and forwards the trace
+    context and request ID to the server in the MCP request '_meta'.
+    A cancelled call sends 'notifications/cancelled' so the server stops
+    its handler too (the MCP client only stops waiting for the response).
+    The session comes from the toolset manager so that it is never opened
+    (or torn down) inside a request task.
+    """
+
+    def __init__(self, *, session_provider: Callable[[], Awaitable], **kwargs):
+        super().__init__(**kwargs)
+        self._session_provider = session_provider
+
+    @retry_on_closed_resource
+    async def _run_async_impl(self, *, args, tool_context, credential):
+        with get_tracer().start_as_current_span(f"mcp.call {self.name}", attributes={"mcp.tool.name": self.name}):
+            session = await self._session_provider()
+            # send_request takes the next id before its first await. The attribute is
+            # private: mcp is pinned in pyproject.toml and a test guards the contract
+            request_id = session._request_id
+            try:
+                return await session.call_tool(self.name, arguments=args, meta=inject_trace_context())
+            except asyncio.CancelledError:
+                if self.name not in UNCANCELLABLE_TOOLS:
+                    await self._notify_cancelled(session, request_id)
+                raise
+
+    async def _notify_cancelled(self, session, request_id) -> None:
+        notification = mcp_types.ClientNotification(mcp_types.CancelledNotification(
+            params=mcp_types.CancelledNotificationParams(requestId=request_id, reason="Client cancelled the request")
+        ))
+        try:
+            # Shielded: the caller is being cancelled and may be cancelled again
+            await asyncio.shield(session.send_notification(notification))
+        except (Exception, asyncio.CancelledError):
+            # Best effort: the server finishes the call and its response is dropped
+            pass
+
+class McpToolsetManager:
+    """
+    Shared MCP tool registry for the custom agents.
+
+    Tools are listed once and kept in a name -> tool dict. The underlying
+    MCP session is reused across requests; when the session manager hands
+    back a new session (reconnect) or a tool is missing, the tool list is
+    refreshed automatically.
+
+    The streamable HTTP transport runs in an anyio task group bound to the
+    task that opened it, so sessions are opened, reconnected and closed by
+    one long-lived owner task. Opening it from a request task breaks the
+    session for everyone once that request finishes.
+
+    With transport "inprocess" the owner instead opens one in-memory client
+    session on the local FastMCP server; tools, middleware and results are
+    the same as over HTTP.
+    """
+
+    def __init__(self, connection_params, transport: str = "http"):
+        self._logger = setup_logger("DQ_MCP_TOOLSET_MANAGER")
+        self._connection_params = connection_params
+        self.transport = transport
+        self._reset()
+
+    def _reset(self) -> None:
+        # Everything here is bound to one process and its event loop; built lazily per worker
+        self._session_manager = MCPSessionManager(connection_params=self._connection_params)
+        self._tools: dict[str, TracedMcpTool] = {}
+        self._session = None
+        self._refresh_lock = asyncio.Lock()
+        self._session_requests: Optional[asyncio.Queue] = None
+        self._owner: Optional[asyncio.Task] = None
+
+    async def session(self):
+        """Pooled MCP session, (re)opened by the owner task when needed."""
+        if self._owner is None or self._owner.done():
+            self._session_requests = asyncio.Queue()
+            # Empty context: the owner must not inherit the first request's trace/request ID
+            self._owner = contextvars.Context().run(asyncio.create_task, self._own_sessions(self._session_requests))
+        owner = self._owner
+        future = asyncio.get_running_loop().create_future()
+        await self._session_requests.put(future)
+        await asyncio.wait((future, owner), return_when=asyncio.FIRST_COMPLETED)
+        if future.done():
+            return future.result()
+        # The owner died (e.g. the in-process server failed to start) before answering
+        future.cancel()
+        owner.result()
+        raise RuntimeError("MCP session owner stopped")
+
+    async def _own_sessions(self, requests: asyncio.Queue) -> None:
+        if self.transport == "inprocess":
+            await self._own_in_process_session(requests)
+            return
+        try:
+            while True:
+                future = await requests.get()
+                if future is None:
+                    break
+                try:
+                    session = await self._session_manager.create_session()
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                if not future.done():
+                    future.set_result(session)
+        finally:
+            await self._session_manager.close()
+
+    async def _own_in_process_session(self, requests: asyncio.Queue) -> None:
+        # Imported on first use so the backend's tracing setup runs before the MCP server module's
+        from fastmcp import Client
+        from src.rule_onboarding.services.mcp_server import mcp
+
+        # Runs the server lifespan (config API client) for as long as the session is open
+        async with Client(mcp) as client:
+            self._logger.info("Opened in-process MCP session")
+            while True:
+                future = await requests.get()
+                if future is None:
+                    break
+                if not future.done():
+                    future.set_result(client.session)
+
+    async def get_tool(self, tool_name: str) -> TracedMcpTool:
+        # Returns the pooled session; a different object means we reconnected
+        session = await self.session()
+        if session is not self._session or tool_name not in self._tools:
+            await self._refresh(session, tool_name)
+
+        tool = self._tools.get(tool_name)
+        if not tool:
+            available = list(self._tools)
+            raise RuntimeError(f"Tool '{tool_name}' not found in MCP server. Available tools: {available}")
+        return tool
+
+    async def _refresh(self, session, tool_name: str) -> None:
+        async with self._refresh_lock:
+            # Another request may have refreshed while we waited for the lock
+            if session is self._session and tool_name in self._tools:
+                return
+            tools_response = await session.list_tools()
+            self._tools = {
+                tool.name: TracedMcpTool(mcp_tool=tool, mcp_session_manager=self._session_manager, session_provider=self.session)
+                for tool in tools_response.tools
+            }
+            self._session = session
+            self._logger.info(f"Resolved MCP tools: {list(self._tools)}")
+
+    def invalidate(self) -> None:
+        """Forget resolved tools so the next lookup lists them again."""
+        self._tools = {}
+        self._session = None
+
+    async def close(self) -> None:
+        self.invalidate()
+        owner, self._owner = self._owner, None
+        if owner is None or owner.done():
+            await self._session_manager.close()
+            return
+        # The owner closes the sessions from the task that opened them
+        await self._session_requests.put(None)
+        await owner
+
+# Shared instance used by the validation and deployment agents
+mcp_toolset_manager = McpToolsetManager(StreamableHTTPConnectionParams(url=MCP_SERVER_URL), transport=resolve_mcp_transport())
+# A forked backend worker opens its own MCP session instead of sharing the parent's
+os.register_at_fork(after_in_child=mcp_toolset_manager._reset)
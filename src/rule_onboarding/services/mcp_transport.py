@@ -0,0 +1,20 @@
+import os
+from urllib.parse import urlparse
+
+# --- MCP Server URL ---
+MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://127.0.0.1:8082/mcp")
+
+# --- MCP Transport ---
+# "inprocess": in-memory client on the FastMCP instance from services/mcp_server.py (no HTTP hop)
+# "http": streamable HTTP to MCP_SERVER_URL
+# "auto": in-process when MCP_SERVER_URL is on this host, HTTP otherwise
+# Kept free of heavy imports: the launcher reads it to decide whether to start the MCP server
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "auto").lower()
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+def resolve_mcp_transport(transport: str = MCP_TRANSPORT, url: str = MCP_SERVER_URL) -> str:
+    if transport == "auto":
+        return "inprocess" if urlparse(url).hostname in LOCAL_HOSTS else "http"
+    if transport not in ("inprocess", "http"):
+        raise ValueError(f"Unknown MCP_TRANSPORT '{transport}' (expected 'inprocess', 'http' or 'auto')")
+    return transport
@@ -0,0 +1,621 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, DatabaseSessionService, Session, State
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.database_session_service import StorageAppState, StorageEvent, StorageSession, StorageUserState
+from sqlalchemy import event as sqlalchemy_event
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from src.rule_onboarding.utils.logger import setup_logger
+from src.rule_onboarding.utils.metrics import registry
+
+logger = setup_logger("DQ_RULE_ONBOARDING_SESSION_STORE")
+
+SESSION_STORE_SECONDS = registry.histogram("dq_session_store_seconds", "Latency of SQLite session store operations.", ("operation",))
+
+# State key holding the collapsed summary of compacted turns (shown to the extraction LLM)
+SUMMARY_STATE_KEY = "conversation_summary"
+# Upper bound on the summary so compaction itself stays O(1) per turn
+SUMMARY_MAX_LINES = 50
+SUMMARY_LINE_MAX_CHARS = 200
+
+# Indexes for windowed event loads and the retention expiry query
+RETENTION_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_events_session_timestamp ON events (app_name, user_id, session_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_update_time ON sessions (update_time)",
+)
+
+def _split_state_delta(state_delta: dict) -> tuple[dict, dict, dict]:
+    """Split a state delta into app, user and session parts (temp keys are dropped)."""
+    app_delta, user_delta, session_delta = {}, {}, {}
+    for key, value in state_delta.items():
+        if key.startswith(State.APP_PREFIX):
+            app_delta[key[len(State.APP_PREFIX):]] = value
+        elif key.startswith(State.USER_PREFIX):
+            user_delta[key[len(State.USER_PREFIX):]] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            session_delta[key] = value
+    return app_delta, user_delta, session_delta
+
+def _reset_after_fork(service_ref: weakref.ref) -> None:
+    # Forked workers must not reuse the parent's pooled connections or worker threads
+    service = service_ref()
+    if service is not None:
+        service._reset_after_fork()
+
+def _summary_line(event: Event) -> Optional[str]:
+    if not event.content or not event.content.parts:
+        return None
+    text = " ".join(p.text for p in event.content.parts if p.text).strip()
+    if not text:
+        return None
+    text = " ".join(text.split())[:SUMMARY_LINE_MAX_CHARS]
+    return f"{event.author}: {text}"
+
+class SqliteSessionService(DatabaseSessionService):
+    """
+    DatabaseSessionService tuned for SQLite and kept off the event loop.
+
+    The pinned ADK DatabaseSessionService only supports a synchronous
+    SQLAlchemy engine, so every call blocks on SQLite I/O. This subclass:
+      - enables WAL journaling and tuned pragmas on every pooled connection,
+      - sizes the SQLAlchemy connection pool,
+      - runs each session operation on a bounded worker pool (the same model
+        an async SQLite driver uses), so the event loop never blocks on disk.
+    """
+
+    def __init__(self, db_url: str, pool_size: int = 5, max_overflow: int = 10, busy_timeout_ms: int = 5000, history_window_events: int = 0):
+        self._busy_timeout_ms = busy_timeout_ms
+        # When > 0, get_session loads only this many recent events by default
+        self.history_window_events = history_window_events
+        engine_kwargs: dict[str, Any] = {}
+        if db_url.startswith("sqlite") and ":memory:" not in db_url:
+            engine_kwargs = {
+                "pool_size": pool_size,
+                "max_overflow": max_overflow,
+                "pool_pre_ping": False,
+                "connect_args": {"check_same_thread": False, "timeout": busy_timeout_ms / 1000},
+            }
+        try:
+            super().__init__(db_url=db_url, **engine_kwargs)
+        except OperationalError as e:
+            # Backend workers booting together race to create the tables on a fresh database
+            if "already exists" not in str(e):
+                raise
+            # The failed attempt already built an engine (and its pool); close it before building another
+            failed_engine = getattr(self, "db_engine", None)
+            if failed_engine is not None:
+                failed_engine.dispose()
+            super().__init__(db_url=db_url, **engine_kwargs)
+
+        if self.db_engine.dialect.name == "sqlite":
+            sqlalchemy_event.listen(self.db_engine, "connect", self._set_sqlite_pragmas)
+            # Drop connections opened during table creation so every pooled connection gets the pragmas
+            self.db_engine.dispose()
+            self._ensure_retention_schema()
+
+        self._max_workers = pool_size + max_overflow
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="session-store")
+        self._thread_state = threading.local()
+        os.register_at_fork(after_in_child=lambda ref=weakref.ref(self): _reset_after_fork(ref))
+        logger.info(f"Session store ready: {db_url} (pool_size={pool_size}, max_overflow={max_overflow})")
+
+    def _reset_after_fork(self) -> None:
+        # Pooled connections belong to the parent; a fresh pool and executor are created lazily on first use
+        self.db_engine.dispose(close=False)
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="session-store")
+        self._thread_state = threading.local()
+
+    def _set_sqlite_pragmas(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(self._busy_timeout_ms)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-20000")
+        cursor.execute("PRAGMA mmap_size=134217728")
+        cursor.close()
+
+    def _ensure_retention_schema(self) -> None:
+        with self.db_engine.connect() as connection:
+            for statement in RETENTION_INDEXES:
+                connection.exec_driver_sql(statement)
+            connection.commit()
+
+    async def enable_incremental_vacuum(self) -> bool:
+        """
+        One-off migration to auto_vacuum=INCREMENTAL, which 'expire_sessions'
+        needs to hand freed pages back. Switching an existing file takes a full
+        VACUUM that rewrites it under an exclusive lock, so only the worker
+        holding the janitor lease runs this, off the startup path. Returns
+        True if the file was converted.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._enable_incremental_vacuum_sync)
+
+    def _enable_incremental_vacuum_sync(self) -> bool:
+        if self.db_engine.dialect.name != "sqlite":
+            return False
+        with self.db_engine.connect() as connection:
+            if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+                return False
+            started = time.perf_counter()
+            connection.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            connection.commit()
+            connection.execution_options(isolation_level="AUTOCOMMIT").exec_driver_sql("VACUUM")
+            logger.info(f"Enabled incremental auto_vacuum on session store ({time.perf_counter() - started:.2f}s)")
+            return True
+
+    def _run_in_worker(self, coroutine_fn, kwargs: dict):
+        # The parent coroutines only do blocking SQLAlchemy work, so each worker
+        # thread drives them on its own private event loop
+        loop = getattr(self._thread_state, "loop", None)
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            self._thread_state.loop = loop
+        return loop.run_until_complete(coroutine_fn(**kwargs))
+
+    async def _offload(self, coroutine_fn, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._run_in_worker, coroutine_fn, kwargs)
+        finally:
+            SESSION_STORE_SECONDS.observe(time.perf_counter() - started, operation=coroutine_fn.__name__)
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[dict[str, Any]] = None, session_id: Optional[str] = None) -> Session:
+        try:
+            return await self._offload(super().create_session, app_name=app_name, user_id=user_id, state=state, session_id=session_id)
+        except IntegrityError:
+            # Concurrent first sessions race to insert the shared app/user state rows;
+            # the retry finds them. A duplicate session id fails again and propagates.
+            return await self._offload(super().create_session, app_name=app_name, user_id=user_id, state=state, session_id=session_id)
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str, config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        if config is None and self.history_window_events > 0:
+            config = GetSessionConfig(num_recent_events=self.history_window_events)
+        return await self._offload(super().get_session, app_name=app_name, user_id=user_id, session_id=session_id, config=config)
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        return await self._offload(super().list_sessions, app_name=app_name, user_id=user_id)
+
+    async def delete_session(self, app_name: str, user_id: str, session_id: str) -> None:
+        return await self._offload(super().delete_session, app_name=app_name, user_id=user_id, session_id=session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        return await self._offload(super().append_event, session=session, event=event)
+
+    async def persist_events(self, session: Session, events: list[Event]) -> None:
+        """
+        Write already-applied events and their state deltas to the database in
+        one transaction, without touching the in-memory session (write-behind).
+        """
+        started = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._persist_events_sync, session, list(events))
+        finally:
+            SESSION_STORE_SECONDS.observe(time.perf_counter() - started, operation="persist_events")
+
+    def _persist_events_sync(self, session: Session, events: list[Event]) -> None:
+        with self.database_session_factory() as sql_session:
+            storage_session = sql_session.get(StorageSession, (session.app_name, session.user_id, session.id))
+            if storage_session is None:
+                logger.warning(f"Dropping {len(events)} events for missing session {session.id}")
+                return
+            storage_app_state = sql_session.get(StorageAppState, (session.app_name))
+            storage_user_state = sql_session.get(StorageUserState, (session.app_name, session.user_id))
+            app_state = dict(storage_app_state.state) if storage_app_state else {}
+            user_state = dict(storage_user_state.state) if storage_user_state else {}
+            session_state = dict(storage_session.state or {})
+
+            for event in events:
+                if event.actions and event.actions.state_delta:
+                    app_delta, user_delta, session_delta = _split_state_delta(event.actions.state_delta)
+                    app_state.update(app_delta)
+                    user_state.update(user_delta)
+                    session_state.update(session_delta)
+                sql_session.add(StorageEvent.from_event(session, event))
+
+            if storage_app_state:
+                storage_app_state.state = app_state
+            if storage_user_state:
+                storage_user_state.state = user_state
+            storage_session.state = session_state
+            sql_session.commit()
+
+    async def compact_session(self, *, app_name: str, user_id: str, session_id: str, keep_events: int, trim_state_keys: tuple = ()) -> int:
+        """
+        Collapse all but the 'keep_events' most recent events into the
+        SUMMARY_STATE_KEY state entry and drop 'trim_state_keys' from the
+        session state. Returns the number of events removed.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._compact_session_sync, app_name, user_id, session_id, keep_events, tuple(trim_state_keys)
+        )
+
+    def _compact_session_sync(self, app_name: str, user_id: str, session_id: str, keep_events: int, trim_state_keys: tuple) -> int:
+        with self.database_session_factory() as sql_session:
+            storage_session = sql_session.get(StorageSession, (app_name, user_id, session_id))
+            if storage_session is None:
+                return 0
+
+            old_events = (
+                sql_session.query(StorageEvent)
+                .filter(StorageEvent.app_name == app_name)
+                .filter(StorageEvent.user_id == user_id)
+                .filter(StorageEvent.session_id == session_id)
+                .order_by(StorageEvent.timestamp.desc())
+                .offset(max(0, keep_events))
+                .all()
+            )
+            state = dict(storage_session.state or {})
+            trimmed = [key for key in trim_state_keys if key in state]
+            if not old_events and not trimmed:
+                return 0
+
+            if old_events:
+                lines = [line for line in (_summary_line(e.to_event()) for e in reversed(old_events)) if line]
+                summary = (state.get(SUMMARY_STATE_KEY) or "").splitlines() + lines
+                state[SUMMARY_STATE_KEY] = "\n".join(summary[-SUMMARY_MAX_LINES:])
+                for storage_event in old_events:
+                    sql_session.delete(storage_event)
+            for key in trimmed:
+                state.pop(key, None)
+
+            storage_session.state = state
+            sql_session.commit()
+
+        logger.info(f"Compacted session {session_id}: removed {len(old_events)} events, trimmed state keys {trimmed}")
+        return len(old_events)
+
+    async def expire_sessions(self, *, max_age_seconds: float, batch_size: int = 500, vacuum_pages: int = 1000) -> dict:
+        """
+        Delete sessions not updated for 'max_age_seconds', removing their events
+        in batches of 'batch_size' rows so write locks stay short, then run an
+        incremental vacuum. Returns the rows and bytes reclaimed.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._expire_sessions_sync, max_age_seconds, batch_size, vacuum_pages
+        )
+
+    def _database_bytes(self, connection) -> int:
+        page_count = connection.exec_driver_sql("PRAGMA page_count").scalar()
+        page_size = connection.exec_driver_sql("PRAGMA page_size").scalar()
+        return page_count * page_size
+
+    def _expire_sessions_sync(self, max_age_seconds: float, batch_size: int, vacuum_pages: int) -> dict:
+        # SQLite stores update_time as naive UTC
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=max_age_seconds)
+        report = {"sessions_deleted": 0, "events_deleted": 0, "bytes_reclaimed": 0}
+
+        with self.db_engine.connect() as connection:
+            bytes_before = self._database_bytes(connection)
+
+        while True:
+            with self.database_session_factory() as sql_session:
+                expired = (
+                    sql_session.query(StorageSession.app_name, StorageSession.user_id, StorageSession.id)
+                    .filter(StorageSession.update_time < cutoff)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not expired:
+                    break
+                for app_name, user_id, session_id in expired:
+                    # Bounded event deletes so one huge session does not hold the write lock
+                    while True:
+                        deleted = sql_session.execute(
+                            text(
+                                "DELETE FROM events WHERE rowid IN ("
+                                " SELECT rowid FROM events"
+                                " WHERE app_name = :app_name AND user_id = :user_id AND session_id = :session_id"
+                                " LIMIT :limit)"
+                            ),
+                            {"app_name": app_name, "user_id": user_id, "session_id": session_id, "limit": batch_size}
+                        ).rowcount
+                        sql_session.commit()
+                        report["events_deleted"] += deleted
+                        if deleted < batch_size:
+                            break
+                    sql_session.execute(
+                        text("DELETE FROM sessions WHERE app_name = :app_name AND user_id = :user_id AND id = :session_id"),
+                        {"app_name": app_name, "user_id": user_id, "session_id": session_id}
+                    )
+                    sql_session.commit()
+                    report["sessions_deleted"] += 1
+
+        if self.db_engine.dialect.name == "sqlite":
+            with self.db_engine.connect() as connection:
+                connection.exec_driver_sql(f"PRAGMA incremental_vacuum({int(vacuum_pages)})")
+                connection.commit()
+                report["bytes_reclaimed"] = max(0, bytes_before - self._database_bytes(connection))
+
+        if report["sessions_deleted"]:
+            logger.info(f"Session retention reclaimed {report}")
+        return report
+
+    async def latest_event_id(self, *, app_name: str, user_id: str, session_id: str) -> Optional[str]:
+        """Id of the most recently persisted event (cheap freshness check for cached sessions)."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._latest_event_id_sync, app_name, user_id, session_id)
+
+    def _latest_event_id_sync(self, app_name: str, user_id: str, session_id: str) -> Optional[str]:
+        # Last written, not newest timestamp: another worker's late flush can carry older timestamps
+        order = "rowid" if self.db_engine.dialect.name == "sqlite" else "timestamp"
+        with self.db_engine.connect() as connection:
+            return connection.execute(
+                text(
+                    "SELECT id FROM events WHERE app_name = :app_name AND user_id = :user_id AND session_id = :session_id "
+                    f"ORDER BY {order} DESC LIMIT 1"
+                ),
+                {"app_name": app_name, "user_id": user_id, "session_id": session_id}
+            ).scalar()
+
+    async def ping(self) -> None:
+        """Round-trip a trivial query through the worker pool (readiness probe)."""
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._ping_sync)
+
+    def _ping_sync(self) -> None:
+        with self.db_engine.connect() as connection:
+            connection.exec_driver_sql("SELECT 1")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.db_engine.dispose()
+
+
+class HotSessionCache(BaseSessionService):
+    """
+    Write-behind, in-memory cache of active sessions in front of SqliteSessionService.
+
+    Reads of cached sessions are served from memory (LRU, 'max_sessions').
+    Appended events are applied to the cached session immediately and queued;
+    a background flusher writes them to the database in batches. Call
+    'flush' at the end of a turn for durability.
+
+    With 'shared_store' (several backend workers on one database) a cached
+    session is only served after checking that the database's latest event
+    is still the last one this worker loaded or flushed, i.e. that no other
+    worker has appended to it since; otherwise it is reloaded (after
+    flushing this worker's own pending events).
+    """
+
+    def __init__(self, store: SqliteSessionService, max_sessions: int = 1000, flush_interval_seconds: float = 0.05, flush_batch_size: int = 100, shared_store: bool = False):
+        self._store = store
+        self.shared_store = shared_store
+        self.max_sessions = max_sessions
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush_batch_size = flush_batch_size
+        self._sessions: "OrderedDict[tuple, Session]" = OrderedDict()
+        # Pending (session, [events]) per session key, in append order
+        self._pending: "OrderedDict[tuple, tuple[Session, list[Event]]]" = OrderedDict()
+        self._pending_count = 0
+        # Latest event id of each cached session known to be in the database
+        self._persisted_event_ids: dict[tuple, Optional[str]] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.stale_reads = 0
+        os.register_at_fork(after_in_child=lambda ref=weakref.ref(self): _reset_after_fork(ref))
+
+    def _reset_after_fork(self) -> None:
+        # The parent flushes its own pending events; the worker starts empty
+        self._sessions.clear()
+        self._pending.clear()
+        self._pending_count = 0
+        self._persisted_event_ids.clear()
+        self._flush_lock = self._flush_wakeup = self._flusher = None
+
+    # --- Pass-through to the underlying store ---
+    @property
+    def history_window_events(self) -> int:
+        return self._store.history_window_events
+
+    @property
+    def db_engine(self):
+        return self._store.db_engine
+
+    async def ping(self) -> None:
+        await self._store.ping()
+
+    @staticmethod
+    def _key(app_name: str, user_id: str, session_id: str) -> tuple:
+        return (app_name, user_id, session_id)
+
+    def _remember(self, session: Session, persisted: bool = False) -> None:
+        key = self._key(session.app_name, session.user_id, session.id)
+        self._sessions[key] = session
+        self._sessions.move_to_end(key)
+        if persisted:
+            # Freshly loaded from (or created in) the database
+            self._persisted_event_ids[key] = session.events[-1].id if session.events else None
+        while len(self._sessions) > self.max_sessions:
+            # Pending writes live in '_pending', so eviction only drops the read copy
+            evicted, _ = self._sessions.popitem(last=False)
+            self._persisted_event_ids.pop(evicted, None)
+
+    def _forget(self, key: tuple) -> None:
+        self._sessions.pop(key, None)
+        self._persisted_event_ids.pop(key, None)
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flush_lock = self._flush_lock or asyncio.Lock()
+            self._flush_wakeup = self._flush_wakeup or asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Session write-behind flush failed, will retry: {e}")
+
+    async def flush(self, session_key: Optional[tuple] = None) -> int:
+        """Persist pending events (for one session key, or all). Returns events written."""
+        if not self._pending:
+            return 0
+        self._flush_lock = self._flush_lock or asyncio.Lock()
+        async with self._flush_lock:
+            keys = [session_key] if session_key is not None else list(self._pending)
+            written = 0
+            for key in keys:
+                entry = self._pending.pop(key, None)
+                if entry is None:
+                    continue
+                session, events = entry
+                self._pending_count -= len(events)
+                try:
+                    if self.shared_store and key in self._persisted_event_ids:
+                        # Another worker appended since our last load/flush: write ours, then reload on next read
+                        latest = await self._store.latest_event_id(app_name=key[0], user_id=key[1], session_id=key[2])
+                        diverged = latest != self._persisted_event_ids[key]
+                    else:
+                        diverged = False
+                    await self._store.persist_events(session, events)
+                except Exception:
+                    # Re-queue ahead of anything appended meanwhile
+                    _, newer = self._pending.pop(key, (session, []))
+                    self._pending[key] = (session, events + newer)
+                    self._pending.move_to_end(key, last=False)
+                    self._pending_count += len(events)
+                    raise
+                written += len(events)
+                if diverged:
+                    self.stale_reads += 1
+                    self._forget(key)
+                elif key in self._sessions:
+                    self._persisted_event_ids[key] = events[-1].id
+            return written
+
+    async def flush_session(self, *, app_name: str, user_id: str, session_id: str) -> int:
+        return await self.flush(self._key(app_name, user_id, session_id))
+
+    def invalidate(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        self._forget(self._key(app_name, user_id, session_id))
+
+    # --- BaseSessionService ---
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[dict[str, Any]] = None, session_id: Optional[str] = None) -> Session:
+        session = await self._store.create_session(app_name=app_name, user_id=user_id, state=state, session_id=session_id)
+        self._remember(session, persisted=True)
+        return session
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str, config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        key = self._key(app_name, user_id, session_id)
+        if config is None and key in self._sessions and await self._is_fresh(key):
+            # Compaction may have invalidated the entry while the freshness check ran
+            session = self._sessions.get(key)
+            if session is not None:
+                self._sessions.move_to_end(key)
+                self.hits += 1
+                return session
+
+        self.misses += 1
+        # Make sure the database reflects queued writes before reading from it
+        await self.flush(key)
+        session = await self._store.get_session(app_name=app_name, user_id=user_id, session_id=session_id, config=config)
+        if session is not None and config is None:
+            self._remember(session, persisted=True)
+        return session
+
+    async def _is_fresh(self, key: tuple) -> bool:
+        if not self.shared_store:
+            return True
+        # Our own pending events are not in the database yet, so compare with
+        # the last event this worker loaded or flushed, not the cached copy's
+        if key in self._persisted_event_ids:
+            expected = self._persisted_event_ids[key]
+        else:
+            session = self._sessions[key]
+            expected = session.events[-1].id if session.events else None
+        latest = await self._store.latest_event_id(app_name=key[0], user_id=key[1], session_id=key[2])
+        if latest == expected:
+            return True
+        # Another worker appended to this session since we cached it
+        self.stale_reads += 1
+        self._forget(key)
+        return False
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        await self.flush()
+        return await self._store.list_sessions(app_name=app_name, user_id=user_id)
+
+    async def delete_session(self, app_name: str, user_id: str, session_id: str) -> None:
+        key = self._key(app_name, user_id, session_id)
+        self._forget(key)
+        entry = self._pending.pop(key, None)
+        if entry:
+            self._pending_count -= len(entry[1])
+        await self._store.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        # Apply to the in-memory session now; the database write happens behind
+        await super().append_event(session=session, event=event)
+        session.last_update_time = time.time()
+
+        window = self._store.history_window_events
+        if window > 0 and len(session.events) > window:
+            del session.events[:-window]
+
+        key = self._key(session.app_name, session.user_id, session.id)
+        _, events = self._pending.setdefault(key, (session, []))
+        events.append(event)
+        self._pending_count += 1
+        self._remember(session)
+
+        self._ensure_flusher()
+        if self._pending_count >= self.flush_batch_size:
+            self._flush_wakeup.set()
+        return event
+
+    # --- Maintenance, kept consistent with the cache ---
+    async def compact_session(self, *, app_name: str, user_id: str, session_id: str, keep_events: int, trim_state_keys: tuple = ()) -> int:
+        await self.flush(self._key(app_name, user_id, session_id))
+        removed = await self._store.compact_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, keep_events=keep_events, trim_state_keys=trim_state_keys
+        )
+        self.invalidate(app_name=app_name, user_id=user_id, session_id=session_id)
+        return removed
+
+    async def enable_incremental_vacuum(self) -> bool:
+        return await self._store.enable_incremental_vacuum()
+
+    async def expire_sessions(self, *, max_age_seconds: float, batch_size: int = 500, vacuum_pages: int = 1000) -> dict:
+        await self.flush()
+        cutoff = time.time() - max_age_seconds
+        for key in [k for k, s in self._sessions.items() if s.last_update_time < cutoff and k not in self._pending]:
+            self._forget(key)
+        return await self._store.expire_sessions(max_age_seconds=max_age_seconds, batch_size=batch_size, vacuum_pages=vacuum_pages)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "cached_sessions": len(self._sessions),
+            "pending_events": self._pending_count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stale_reads": self.stale_reads,
+        }
+
+    async def aclose(self) -> None:
+        if self._flusher:
+            self._flusher.cancel()
+        await self.flush()
+        self._store.close()
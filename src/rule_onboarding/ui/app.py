@@ -1,3 +1,4 @@
+import json
 import streamlit as st
 import uuid
 import requests
@@ -5,6 +6,17 @@ import requests
 # --- API URLs ---
 RULE_ONBOARDING_BACKEND_API_URL = "http://localhost:8083/onboard-rule"
 
+# Progress shown while a stage runs
+STAGE_LABELS = {
+    "rule_fast_path_extraction_agent": "Extracting rule details",
+    "rule_extraction_agent": "Extracting rule details",
+    "repository_lookup_agent": "Looking up repository",
+    "attribute_validation_agent": "Validating rule attributes",
+    "rule_validation_agent": "Validating rule",
+    "rule_generation_agent": "Generating rule payload",
+    "rule_deployment_agent": "Deploying rule",
+}
+
 st.set_page_config(page_title="DQ Rule Onboarding Genie", page_icon="🤖")
 st.title("DQ Rule Onboarding Genie 🤖")
 
@@ -41,14 +53,20 @@ if prompt := st.chat_input("Ex: Onboard a mean check for column 'revenue' in 'sa
         full_response = ""
         
         try:
-            # Use requests with stream=True to get streaming response
-            with requests.post(RULE_ONBOARDING_BACKEND_API_URL, json={"message": prompt, "session_id": st.session_state.adk_session_id}, stream=True, timeout=60) as response:
+            # NDJSON progress stream: one typed event per line, from the first millisecond
+            with requests.post(RULE_ONBOARDING_BACKEND_API_URL, params={"stream": "ndjson"}, json={"message": prompt, "session_id": st.session_state.adk_session_id}, stream=True, timeout=60) as response:
                 if response.status_code == 200:
-                    for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
-                        if chunk:
-                            # If using SSE, chunk = chunk.replace("data: ", "")
-                            full_response += chunk
+                    for line in response.iter_lines(decode_unicode=True):
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        if event["type"] == "stage_started" and not full_response:
+                            response_placeholder.markdown(f"⏳ {STAGE_LABELS.get(event['stage'], event['stage'])}...")
+                        elif event["type"] == "message":
+                            full_response += event["text"]
                             response_placeholder.markdown(full_response + " ")
+                        elif event["type"] == "result" and event["status"] == "error":
+                            full_response = full_response or f"❌ {event['error']}"
                     #Final clean render
                     response_placeholder.markdown(full_response)
                     # Add assistant response to history
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+NUMBER_REGEX = re.compile(r"-?\d{1,3}(?:,\d{3})+(?:\.\d+)?|-?\d+(?:\.\d+)?")
+
+def _canonical_number(match: re.Match) -> str:
+    token = match.group(0)
+    try:
+        number = float(token.replace(",", ""))
+    except ValueError:
+        return token
+    return str(int(number)) if number.is_integer() else repr(number)
+
+def normalize_prompt(user_message: str) -> str:
+    """
+    Case-fold, collapse whitespace and canonicalize numbers
+    ("10.0" -> "10", "1,000" -> "1000").
+    """
+    text = " ".join((user_message or "").casefold().split())
+    return NUMBER_REGEX.sub(_canonical_number, text)
+
+class ExtractionCache:
+    """
+    SQLite-backed cache of extraction results keyed by normalized prompt.
+    Entries expire after 'ttl_seconds'; the least recently used entries are
+    dropped once the table exceeds 'max_entries'.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 86400.0, max_entries: int = 10000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extraction_cache (
+                prompt_key TEXT PRIMARY KEY,
+                normalized_prompt TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_used ON extraction_cache (last_used_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def key_for(user_message: str) -> str:
+        return hashlib.sha256(normalize_prompt(user_message).encode("utf-8")).hexdigest()
+
+    def get(self, user_message: str) -> Optional[dict]:
+        key = self.key_for(user_message)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM extraction_cache WHERE prompt_key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] + self.ttl_seconds <= now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM extraction_cache WHERE prompt_key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE extraction_cache SET last_used_at = ?, hit_count = hit_count + 1 WHERE prompt_key = ?",
+                (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, user_message: str, result: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO extraction_cache
+                    (prompt_key, normalized_prompt, result, created_at, last_used_at, hit_count)
+                VALUES (?, ?, ?, ?, ?, 0)
+                """,
+                (self.key_for(user_message), normalize_prompt(user_message), json.dumps(result), now, now)
+            )
+            # Enforce the size cap, evicting least recently used entries
+            self._conn.execute(
+                """
+                DELETE FROM extraction_cache WHERE prompt_key IN (
+                    SELECT prompt_key FROM extraction_cache
+                    ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM extraction_cache").rowcount
+            self._conn.commit()
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
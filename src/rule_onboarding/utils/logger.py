@@ -1,25 +1,147 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
 import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
 
-def setup_logger(name):
-    logger = logging.getLogger(name)
-    
-    # Only configure if the logger doesn't have handlers already
-    if not logger.handlers:
-        logger.setLevel(logging.INFO)
-        
-        # Format: Time - Service Name - Level - Message
-        formatter = logging.Formatter('%(asctime)s | %(name)-20s | %(levelname)-8s | %(message)s')
+# --- Logging Settings ---
+# Shared by every process (launcher, MCP server, each backend worker). Rotate it
+# externally (e.g. logrotate): each process reopens the file once it has been moved
+LOG_FILE_PATH = os.getenv("LOG_FILE_PATH", "dq_rule_onboarding_audit.log")
+# Longest rendering of a payload written to the log; the rest is elided
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+# Records are dropped (and counted) rather than blocking once the queue is full
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Format: Time - Service Name - Level - Message
+LOG_FORMAT = '%(asctime)s | %(name)-20s | %(levelname)-8s | %(message)s'
+
+class LazyPayload:
+    """
+    Defers rendering a payload until a handler actually formats the record,
+    which happens on the listener thread, and caps the rendered length.
+    Dict/list payloads are snapshotted when the record is queued, so later
+    mutations by the caller don't leak into the audit line.
+
+    Usage: logger.info("Final payload: %s", LazyPayload(payload))
+    """
+
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value, max_chars: int = None):
+        self.value = value
+        self.max_chars = LOG_PAYLOAD_MAX_CHARS if max_chars is None else max_chars
+
+    def __str__(self) -> str:
+        if isinstance(self.value, (dict, list)):
+            try:
+                text = json.dumps(self.value, default=str)
+            except (TypeError, ValueError):
+                text = repr(self.value)
+        else:
+            text = str(self.value)
+        if self.max_chars > 0 and len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}... [{len(text) - self.max_chars} chars truncated]"
+        return text
+
+    __repr__ = __str__
+
+    def snapshot(self) -> "LazyPayload":
+        """A copy detached from the caller's (possibly mutated later) value."""
+        if not isinstance(self.value, (dict, list)):
+            return self
+        try:
+            return LazyPayload(copy.deepcopy(self.value), self.max_chars)
+        except Exception:
+            # Uncopyable contents: render now, on the caller's thread
+            return LazyPayload(str(self), 0)
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Enqueues records without formatting them; the listener thread does the
+    formatting and the disk/console I/O. A full queue drops the record
+    instead of stalling the event loop.
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The base class formats the message here, on the caller's thread;
+        # keep msg/args as they are so LazyPayload is rendered by the listener,
+        # but snapshot it now (the level check has passed) so the caller can
+        # keep mutating its payload
+        if isinstance(record.args, tuple) and any(isinstance(arg, LazyPayload) for arg in record.args):
+            record.args = tuple(arg.snapshot() if isinstance(arg, LazyPayload) else arg for arg in record.args)
+        return record
 
-        # 1. File Handler (The Audit Trail)
-        file_handler = logging.FileHandler("dq_rule_onboarding_audit.log", mode='a')
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_queue_handler = NonBlockingQueueHandler(_log_queue)
+_listener: QueueListener = None
+_listener_lock = threading.Lock()
+
+def _start_listener() -> None:
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+        formatter = logging.Formatter(LOG_FORMAT)
+
+        # 1. File Handler (The Audit Trail). In-process rotation is not safe with several
+        # writers; appends from all processes land in whichever file is current
+        file_handler = WatchedFileHandler(LOG_FILE_PATH, mode='a', encoding="utf-8")
         file_handler.setFormatter(formatter)
-        
+
         # 2. Console Handler (For terminal)
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setFormatter(formatter)
 
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-        
-    return logger
\ No newline at end of file
+        _listener = QueueListener(_log_queue, file_handler, console_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+
+def stop_logging() -> None:
+    """Drain the queue and close the handlers (called at interpreter exit)."""
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+def _restart_after_fork() -> None:
+    # Only the forking thread survives: the listener thread is gone and the lock
+    # or queue may be mid-use, so the child starts over with its own
+    global _log_queue, _listener, _listener_lock
+    running = _listener is not None
+    _listener_lock = threading.Lock()
+    _listener = None
+    _log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _queue_handler.queue = _log_queue
+    if running:
+        _start_listener()
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+def setup_logger(name):
+    logger = logging.getLogger(name)
+
+    # Only configure if the logger doesn't have handlers already
+    if not logger.handlers:
+        logger.setLevel(logging.INFO)
+        _start_listener()
+        # Callers only pay for a queue put; the listener thread writes to disk
+        logger.addHandler(_queue_handler)
+
+    return logger
@@ -0,0 +1,227 @@
+import bisect
+import re
+import threading
+from typing import Callable, Iterable
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds: sub-millisecond cache hits up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    """Monotonic counter, one series per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+class Gauge(Counter):
+    """Value that can go up and down (e.g. in-flight streams)."""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with '_bucket', '_sum' and '_count' series."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(k, list(s[0]), s[1], s[2]) for k, s in self._series.items()]
+        lines = self.header()
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+# A collector returns (name, type, help, [(labels dict, value), ...]) tuples at scrape time
+Collector = Callable[[], Iterable[tuple]]
+
+class MetricsRegistry:
+    """
+    In-process metrics registry rendered in the Prometheus text format.
+    Hot paths only touch a dict under a lock; derived values such as cache
+    hit ratios are computed by collectors when '/metrics' is scraped.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Collector] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: tuple, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        # Collector samples are merged by name so each family has one HELP/TYPE
+        families: dict[str, tuple] = {}
+        for collector in self._collectors:
+            try:
+                samples = list(collector())
+            except Exception:
+                # A failing collector must not break the whole scrape
+                continue
+            for name, kind, documentation, series in samples:
+                families.setdefault(name, (kind, documentation, []))[2].extend(series)
+        for name, (kind, documentation, series) in families.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in series:
+                names = tuple(labels)
+                lines.append(f"{name}{_format_labels(names, tuple(labels[n] for n in names))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+# Shared registry (one per process)
+registry = MetricsRegistry()
+
+# --- Metrics shared by the backend and the MCP server ---
+AGENT_STAGE_SECONDS = registry.histogram("dq_agent_stage_seconds", "Duration of each agent stage run.", ("agent",))
+LLM_CALL_SECONDS = registry.histogram("dq_llm_call_seconds", "Duration of LLM calls.")
+LLM_TOKENS_TOTAL = registry.counter("dq_llm_tokens_total", "Tokens reported by the model.", ("agent", "kind"))
+MCP_TOOL_SECONDS = registry.histogram("dq_mcp_tool_seconds", "Duration of MCP tool calls.", ("tool", "side"))
+MCP_TOOL_ERRORS_TOTAL = registry.counter("dq_mcp_tool_errors_total", "MCP tool calls that raised.", ("tool", "side"))
+CONFIG_API_SECONDS = registry.histogram("dq_config_api_request_seconds", "Duration of config API requests.", ("method",))
+CONFIG_API_REQUESTS_TOTAL = registry.counter("dq_config_api_requests_total", "Config API requests by status class.", ("method", "status"))
+
+# Maps span names (ADK and ours) to the metric they feed
+_AGENT_SPAN_REGEX = re.compile(r"^agent_run \[(.+)\]$")
+_MCP_SPAN_REGEX = re.compile(r"^mcp\.(call|tool) (.+)$")
+_HTTP_SPAN_REGEX = re.compile(r"^HTTP (\w+)$")
+
+def observe_span(name: str, duration_seconds: float, attributes: dict, is_error: bool) -> None:
+    """Feed one finished span into the latency metrics it corresponds to."""
+    match = _AGENT_SPAN_REGEX.match(name)
+    if match:
+        AGENT_STAGE_SECONDS.observe(duration_seconds, agent=match.group(1))
+        return
+    if name == "call_llm":
+        LLM_CALL_SECONDS.observe(duration_seconds)
+        return
+    match = _MCP_SPAN_REGEX.match(name)
+    if match:
+        side = "client" if match.group(1) == "call" else "server"
+        MCP_TOOL_SECONDS.observe(duration_seconds, tool=match.group(2), side=side)
+        if is_error:
+            MCP_TOOL_ERRORS_TOTAL.inc(tool=match.group(2), side=side)
+        return
+    match = _HTTP_SPAN_REGEX.match(name)
+    if match:
+        status = attributes.get("http.response.status_code")
+        status_class = f"{status // 100}xx" if isinstance(status, int) else "error"
+        CONFIG_API_SECONDS.observe(duration_seconds, method=match.group(1))
+        CONFIG_API_REQUESTS_TOTAL.inc(method=match.group(1), status=status_class)
+
+def cache_collector(cache_name: str, stats_fn: Callable[[], dict]) -> Collector:
+    """Collector exposing hits, misses, hit ratio and size of a cache with a 'stats()' dict."""
+    families = (
+        ("hits", "dq_cache_hits_total", "counter", "Cache lookups that hit."),
+        ("misses", "dq_cache_misses_total", "counter", "Cache lookups that missed."),
+        ("hit_ratio", "dq_cache_hit_ratio", "gauge", "Cache hits over lookups."),
+        ("size", "dq_cache_entries", "gauge", "Entries currently cached."),
+    )
+
+    def collect():
+        stats = stats_fn()
+        labels = {"cache": cache_name}
+        return [(name, kind, documentation, [(labels, stats[key])]) for key, name, kind, documentation in families if key in stats]
+    return collect
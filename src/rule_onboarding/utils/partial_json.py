@@ -0,0 +1,114 @@
+import json
+
+class PartialJsonScanner:
+    """
+    Incremental scanner over a JSON object that arrives in chunks (a streamed
+    LLM response). Each top-level field is reported as soon as its value is
+    complete, without waiting for the closing brace.
+
+    Only scalar values (strings, numbers, true/false/null) are reported;
+    nested objects and arrays are skipped. Text before the first '{' (such
+    as a ```json fence) is ignored. Work is linear in the total input: each
+    character is looked at once, whatever the chunking.
+    """
+
+    def __init__(self):
+        self.fields: dict = {}
+        self._started = False
+        self._done = False
+        self._depth = 0
+        # What the top-level object expects next: "key", "colon", "value" or "comma"
+        self._expect = "key"
+        self._key = None
+        self._in_string = False
+        self._escape = False
+        self._token: list[str] = []
+        self._scalar: list[str] = []
+
+    @property
+    def done(self) -> bool:
+        """True once the top-level object has been closed."""
+        return self._done
+
+    def feed(self, text: str) -> dict:
+        """Consume the next chunk; returns the top-level fields it completed."""
+        completed = {}
+        for char in text:
+            if self._done:
+                break
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                self._scan_string(char, completed)
+                continue
+
+            if self._scalar:
+                if char in ",}] \t\r\n":
+                    self._finish_scalar(completed)
+                else:
+                    self._scalar.append(char)
+                    continue
+
+            if char == '"':
+                self._in_string = True
+                self._token = []
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._done = True
+                elif self._depth == 1:
+                    # End of a nested value of a top-level field
+                    self._expect = "comma"
+            elif self._depth == 1:
+                if char == ":" and self._expect == "colon":
+                    self._expect = "value"
+                elif char == ",":
+                    self._expect = "key"
+                elif self._expect == "value" and not char.isspace():
+                    self._scalar.append(char)
+        return completed
+
+    def _scan_string(self, char: str, completed: dict) -> None:
+        if self._escape:
+            self._escape = False
+        elif char == "\\":
+            self._escape = True
+        elif char == '"':
+            self._in_string = False
+            if self._depth == 1:
+                self._finish_string(completed)
+            return
+        if self._depth == 1:
+            self._token.append(char)
+
+    def _finish_string(self, completed: dict) -> None:
+        try:
+            value = json.loads('"' + "".join(self._token) + '"')
+        except ValueError:
+            value = None
+        if self._expect == "key":
+            self._key = value
+            self._expect = "colon"
+        elif self._expect == "value":
+            self._report(value, completed)
+
+    def _finish_scalar(self, completed: dict) -> None:
+        try:
+            value = json.loads("".join(self._scalar))
+        except ValueError:
+            value = None
+        self._scalar = []
+        self._report(value, completed)
+
+    def _report(self, value, completed: dict) -> None:
+        if self._key is not None:
+            self.fields[self._key] = value
+            completed[self._key] = value
+        self._key = None
+        self._expect = "comma"
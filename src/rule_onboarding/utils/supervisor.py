@@ -0,0 +1,186 @@
+import asyncio
+import os
+import signal
+import time
+from typing import Optional
+import httpx
+from src.rule_onboarding.utils.logger import setup_logger
+
+#--- LOGGER SETUP ---
+logger = setup_logger("DQ_SERVICE_SUPERVISOR")
+
+# --- Supervisor Settings ---
+# Longest a service may take to pass its readiness probe
+SERVICE_READY_TIMEOUT_SECONDS = float(os.getenv("SERVICE_READY_TIMEOUT_SECONDS", "60"))
+# Probe interval starts small and doubles up to the max while a service boots
+SERVICE_PROBE_INTERVAL_SECONDS = float(os.getenv("SERVICE_PROBE_INTERVAL_SECONDS", "0.05"))
+SERVICE_PROBE_MAX_INTERVAL_SECONDS = float(os.getenv("SERVICE_PROBE_MAX_INTERVAL_SECONDS", "0.5"))
+# Restart backoff for crashed services: doubles per consecutive crash up to the max
+SERVICE_RESTART_BACKOFF_SECONDS = float(os.getenv("SERVICE_RESTART_BACKOFF_SECONDS", "1"))
+SERVICE_RESTART_BACKOFF_MAX_SECONDS = float(os.getenv("SERVICE_RESTART_BACKOFF_MAX_SECONDS", "30"))
+# A service that stayed up this long is considered healthy again (backoff resets)
+SERVICE_STABLE_SECONDS = float(os.getenv("SERVICE_STABLE_SECONDS", "60"))
+# Grace period between SIGTERM and SIGKILL on shutdown
+SERVICE_STOP_TIMEOUT_SECONDS = float(os.getenv("SERVICE_STOP_TIMEOUT_SECONDS", "10"))
+
+class ServiceStartupError(RuntimeError):
+    """A service exited or missed its readiness deadline during startup."""
+
+class ServiceSpec:
+    """
+    One supervised child process.
+
+    'depends_on' names services that must pass their readiness probe before
+    this one is started; services without dependencies start in parallel.
+    """
+
+    def __init__(self, name: str, cmd: list[str], ready_url: Optional[str] = None, depends_on: tuple = (), ready_timeout_seconds: float = SERVICE_READY_TIMEOUT_SECONDS):
+        self.name = name
+        self.cmd = list(cmd)
+        self.ready_url = ready_url
+        self.depends_on = tuple(depends_on)
+        self.ready_timeout_seconds = ready_timeout_seconds
+
+async def wait_until_ready(url: str, timeout_seconds: float, process: Optional[asyncio.subprocess.Process] = None, client: Optional[httpx.AsyncClient] = None) -> bool:
+    """
+    Poll 'url' until it answers 2xx. Returns False on timeout or if
+    'process' exits first.
+    """
+    own_client = client is None
+    client = client or httpx.AsyncClient(timeout=1.0)
+    deadline = time.monotonic() + timeout_seconds
+    interval = SERVICE_PROBE_INTERVAL_SECONDS
+    try:
+        while time.monotonic() < deadline:
+            if process is not None and process.returncode is not None:
+                return False
+            try:
+                response = await client.get(url)
+                if response.is_success:
+                    return True
+            except httpx.HTTPError:
+                # Not listening yet
+                pass
+            await asyncio.sleep(min(interval, max(0.0, deadline - time.monotonic())))
+            interval = min(interval * 2, SERVICE_PROBE_MAX_INTERVAL_SECONDS)
+        return False
+    finally:
+        if own_client:
+            await client.aclose()
+
+def restart_delay(consecutive_crashes: int) -> float:
+    """Exponential backoff before restart number 'consecutive_crashes' (1-based)."""
+    return min(SERVICE_RESTART_BACKOFF_SECONDS * 2 ** max(0, consecutive_crashes - 1), SERVICE_RESTART_BACKOFF_MAX_SECONDS)
+
+class ServiceSupervisor:
+    """
+    Starts services as soon as their dependencies are ready, waits for each
+    readiness probe (with a deadline) and restarts crashed children with
+    exponential backoff. A failure during startup stops everything.
+    """
+
+    def __init__(self, specs: list[ServiceSpec]):
+        names = {spec.name for spec in specs}
+        for spec in specs:
+            missing = [d for d in spec.depends_on if d not in names]
+            if missing:
+                raise ValueError(f"Service '{spec.name}' depends on unknown services: {missing}")
+        self._specs = {spec.name: spec for spec in specs}
+        self._ready = {spec.name: asyncio.Event() for spec in specs}
+        self._processes: dict[str, asyncio.subprocess.Process] = {}
+        self._stopping = asyncio.Event()
+        self.restarts = {spec.name: 0 for spec in specs}
+
+    def is_ready(self, name: str) -> bool:
+        return self._ready[name].is_set()
+
+    async def wait_ready(self) -> None:
+        """Block until every service has passed its readiness probe once."""
+        await asyncio.gather(*(event.wait() for event in self._ready.values()))
+
+    async def run(self) -> None:
+        """Supervise until 'stop()' is called; raises ServiceStartupError if startup fails."""
+        tasks = [asyncio.create_task(self._supervise(spec), name=f"supervise-{spec.name}") for spec in self._specs.values()]
+        stopping = asyncio.create_task(self._stopping.wait())
+        try:
+            done, _ = await asyncio.wait(tasks + [stopping], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is not stopping and task.exception():
+                    raise task.exception()
+        finally:
+            self._stopping.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            stopping.cancel()
+            await self._stop_all()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def _supervise(self, spec: ServiceSpec) -> None:
+        for dependency in spec.depends_on:
+            await self._ready[dependency].wait()
+
+        started_once = False
+        consecutive_crashes = 0
+        while not self._stopping.is_set():
+            started_at = time.monotonic()
+            process = await self._spawn(spec)
+            if spec.ready_url:
+                ready = await wait_until_ready(spec.ready_url, spec.ready_timeout_seconds, process)
+            else:
+                ready = process.returncode is None
+            if ready:
+                self._ready[spec.name].set()
+                logger.info(f"[{spec.name}] Ready in {time.monotonic() - started_at:.2f}s (pid {process.pid})")
+                started_once = True
+            elif not started_once:
+                await self._terminate(spec.name, process)
+                raise ServiceStartupError(f"Service '{spec.name}' was not ready within {spec.ready_timeout_seconds}s (exit code {process.returncode})")
+            else:
+                logger.error(f"[{spec.name}] Not ready within {spec.ready_timeout_seconds}s after restart")
+                await self._terminate(spec.name, process)
+
+            returncode = await process.wait()
+            self._ready[spec.name].clear()
+            if self._stopping.is_set():
+                return
+
+            # Crashed (or exited) while supervised: restart with backoff
+            if time.monotonic() - started_at >= SERVICE_STABLE_SECONDS:
+                consecutive_crashes = 0
+            consecutive_crashes += 1
+            delay = restart_delay(consecutive_crashes)
+            self.restarts[spec.name] += 1
+            logger.error(f"[{spec.name}] Exited with code {returncode}; restarting in {delay:.1f}s")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), delay)
+                return
+            except asyncio.TimeoutError:
+                pass
+
+    async def _spawn(self, spec: ServiceSpec) -> asyncio.subprocess.Process:
+        logger.info(f"[{spec.name}] Starting: {' '.join(spec.cmd)}")
+        process = await asyncio.create_subprocess_exec(*spec.cmd)
+        self._processes[spec.name] = process
+        return process
+
+    async def _terminate(self, name: str, process: asyncio.subprocess.Process) -> None:
+        if process.returncode is not None:
+            return
+        process.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), SERVICE_STOP_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(f"[{name}] Did not stop within {SERVICE_STOP_TIMEOUT_SECONDS}s; killing")
+            process.kill()
+            await process.wait()
+
+    async def _stop_all(self) -> None:
+        # Dependents first: reverse of declaration order
+        for name in reversed(list(self._specs)):
+            process = self._processes.get(name)
+            if process is not None:
+                await self._terminate(name, process)
+        logger.info("All services stopped.")
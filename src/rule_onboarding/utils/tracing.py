@@ -0,0 +1,226 @@
+import contextvars
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, Sequence
+import httpx
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace import Status, StatusCode
+from src.rule_onboarding.utils.metrics import observe_span
+
+# --- Tracing Settings ---
+# Set to "false" to stop exporting spans (latency metrics derived from spans stay on)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+# Most recent finished spans kept in memory per process
+TRACE_RING_BUFFER_SIZE = int(os.getenv("TRACE_RING_BUFFER_SIZE", "5000"))
+# Optional JSON-lines export file (one OTLP-shaped span per line); empty disables it
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "")
+
+# Span attribute / MCP '_meta' key carrying the onboarding request ID
+REQUEST_ID_ATTRIBUTE = "dq.request_id"
+
+TRACER_NAME = "dq_rule_onboarding"
+
+# Request ID of the onboarding request currently being served
+current_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("dq_request_id", default=None)
+
+def span_to_dict(span: ReadableSpan) -> dict:
+    """Render a finished span in the OTLP/JSON field layout."""
+    context = span.get_span_context()
+    return {
+        "traceId": format(context.trace_id, "032x"),
+        "spanId": format(context.span_id, "016x"),
+        "parentSpanId": format(span.parent.span_id, "016x") if span.parent else "",
+        "name": span.name,
+        "kind": span.kind.name,
+        "startTimeUnixNano": span.start_time,
+        "endTimeUnixNano": span.end_time,
+        "attributes": dict(span.attributes or {}),
+        "status": {"code": span.status.status_code.name, "message": span.status.description or ""},
+        "resource": dict(span.resource.attributes) if span.resource else {},
+    }
+
+class RingBufferSpanExporter(SpanExporter):
+    """Keeps the last 'max_spans' finished spans in memory for the trace endpoints."""
+
+    def __init__(self, max_spans: int = TRACE_RING_BUFFER_SIZE):
+        self._spans: deque = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        rendered = [span_to_dict(span) for span in spans]
+        with self._lock:
+            self._spans.extend(rendered)
+        return SpanExportResult.SUCCESS
+
+    def spans(self, request_id: Optional[str] = None) -> list[dict]:
+        with self._lock:
+            spans = list(self._spans)
+        if request_id is None:
+            return spans
+        return [s for s in spans if s["attributes"].get(REQUEST_ID_ATTRIBUTE) == request_id]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+    def shutdown(self) -> None:
+        pass
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends OTLP-shaped spans to a local JSON-lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(json.dumps(span_to_dict(span), default=str) + "\n" for span in spans)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError:
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+class RequestIdSpanProcessor(SpanProcessor):
+    """Stamps every span started while serving a request with its request ID."""
+
+    def on_start(self, span, parent_context=None) -> None:
+        request_id = current_request_id.get()
+        if request_id:
+            span.set_attribute(REQUEST_ID_ATTRIBUTE, request_id)
+
+    def on_end(self, span) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+class MetricsSpanProcessor(SpanProcessor):
+    """Turns finished stage, LLM, MCP and config API spans into latency metrics."""
+
+    def on_start(self, span, parent_context=None) -> None:
+        pass
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if span.end_time and span.start_time:
+            is_error = span.status.status_code == StatusCode.ERROR
+            observe_span(span.name, (span.end_time - span.start_time) / 1e9, span.attributes or {}, is_error)
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+# Shared in-memory exporter (one per process)
+span_buffer = RingBufferSpanExporter()
+_tracing_initialized = False
+
+def init_tracing(service_name: str) -> None:
+    """
+    Install the SDK tracer provider once per process. ADK's own spans
+    ('invocation', 'agent_run [...]', 'call_llm') flow through it as well,
+    and every finished span also feeds the latency metrics.
+    """
+    global _tracing_initialized
+    if _tracing_initialized:
+        return
+    _tracing_initialized = True
+
+    provider = trace.get_tracer_provider()
+    if not isinstance(provider, TracerProvider):
+        provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        trace.set_tracer_provider(provider)
+    provider.add_span_processor(MetricsSpanProcessor())
+    if not TRACING_ENABLED:
+        return
+    provider.add_span_processor(RequestIdSpanProcessor())
+    provider.add_span_processor(SimpleSpanProcessor(span_buffer))
+    if TRACE_EXPORT_FILE:
+        # Batched so file writes happen on the exporter thread
+        provider.add_span_processor(BatchSpanProcessor(JsonLinesSpanExporter(TRACE_EXPORT_FILE)))
+
+def get_tracer():
+    return trace.get_tracer(TRACER_NAME)
+
+@contextmanager
+def request_context(request_id: str):
+    """Bind 'request_id' to everything traced inside the block."""
+    token = current_request_id.set(request_id)
+    try:
+        yield
+    finally:
+        try:
+            current_request_id.reset(token)
+        except ValueError:
+            # Streaming generator finalized from another context
+            pass
+
+# --- Propagation (W3C traceparent) ---
+def inject_trace_context(carrier: Optional[dict] = None) -> dict:
+    """Add the current trace context (and request ID) to 'carrier'."""
+    carrier = {} if carrier is None else carrier
+    propagate.inject(carrier)
+    request_id = current_request_id.get()
+    if request_id:
+        carrier[REQUEST_ID_ATTRIBUTE] = request_id
+    return carrier
+
+@contextmanager
+def remote_span(name: str, carrier: Optional[dict], **attributes):
+    """Start a span continuing the trace described by an incoming carrier."""
+    carrier = carrier or {}
+    parent = propagate.extract(carrier)
+    request_id = carrier.get(REQUEST_ID_ATTRIBUTE) or current_request_id.get()
+    token = current_request_id.set(request_id)
+    try:
+        with get_tracer().start_as_current_span(name, context=parent, attributes=attributes) as span:
+            yield span
+    finally:
+        current_request_id.reset(token)
+
+# --- Outbound HTTP ---
+class TracingTransport(httpx.AsyncBaseTransport):
+    """httpx transport wrapper: one client span per request, with traceparent injected."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attributes = {"http.request.method": request.method, "url.full": str(request.url)}
+        with get_tracer().start_as_current_span(f"HTTP {request.method}", kind=trace.SpanKind.CLIENT, attributes=attributes) as span:
+            propagate.inject(request.headers)
+            request_id = current_request_id.get()
+            if request_id:
+                request.headers["X-Request-ID"] = request_id
+            response = await self._transport.handle_async_request(request)
+            span.set_attribute("http.response.status_code", response.status_code)
+            if response.status_code >= 500:
+                span.set_status(Status(StatusCode.ERROR))
+            return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+# --- Analysis ---
+def stage_breakdown(spans: list[dict]) -> dict:
+    """Total milliseconds spent per span name (e.g. per agent stage, per MCP tool)."""
+    breakdown: dict = {}
+    for span in spans:
+        if span.get("endTimeUnixNano") and span.get("startTimeUnixNano"):
+            duration_ms = (span["endTimeUnixNano"] - span["startTimeUnixNano"]) / 1e6
+            breakdown[span["name"]] = round(breakdown.get(span["name"], 0.0) + duration_ms, 3)
+    return breakdown
@@ -1,7 +1,12 @@
+import os
+import tempfile
 import pytest
 from unittest.mock import AsyncMock, MagicMock
 from google.adk.tools.mcp_tool import McpToolset
 
+# Keep the backend's session store out of the project's sessions.db during tests
+os.environ.setdefault("SESSION_DB_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'sessions.db')}")
+
 @pytest.fixture
 def mock_mcp_toolset(monkeypatch):
     """
@@ -37,8 +42,10 @@ def mock_mcp_toolset(monkeypatch):
     # 3. Mock get_tools to return our mock tool
     mock_toolset.get_tools = AsyncMock(return_value=[mock_tool])
     
-    # 4. Patch the toolset inside your agent module
-    # Adjust the path to where your agent is defined
-    monkeypatch.setattr("src.rule_onboarding.agents.custom_validation.McpToolset", lambda **k: mock_toolset)
+    # 4. Patch the shared toolset manager used by the agents
+    async def get_tool(tool_name):
+        return next(t for t in await mock_toolset.get_tools() if t.name == tool_name)
+
+    monkeypatch.setattr("src.rule_onboarding.services.mcp_toolset_manager.mcp_toolset_manager.get_tool", get_tool)
     
     return mock_toolset
\ No newline at end of file
@@ -0,0 +1,73 @@
+import asyncio
+import json
+from types import SimpleNamespace
+import pytest
+from src.rule_onboarding.api import backend
+
+@pytest.fixture
+def fake_streamer(monkeypatch):
+    """
+    Replaces the per-item pipeline streamer with a stub that tracks concurrency.
+    """
+    stats = {"running": 0, "peak": 0, "calls": []}
+
+    async def streamer(user_message, session_id, agent=None, initial_state=None, request_id=None):
+        stats["calls"].append((user_message, session_id, initial_state))
+        stats["running"] += 1
+        stats["peak"] = max(stats["peak"], stats["running"])
+        await asyncio.sleep(0.01)
+        stats["running"] -= 1
+        if "bad" in user_message:
+            yield "❌ Repository 'bad' was not found as part of existing configuration."
+        else:
+            yield "✅ Success! Rule has been onboarded."
+
+    monkeypatch.setattr(backend, "dq_rule_onboarding_agent_streamer", streamer)
+    return stats
+
+@pytest.mark.asyncio
+async def test_batch_streams_every_item_with_bounded_concurrency(fake_streamer):
+    request = backend.BatchOnboardRequest(
+        messages=[f"Onboard rule {i}" for i in range(5)] + ["Onboard bad rule"],
+        rules=[{"rule_name": "STRUCTURED_RULE", "repository_name": "AWSRepo", "attributes": []}],
+        batch_id="batch",
+        max_concurrency=2
+    )
+
+    lines = [json.loads(line) async for line in backend.dq_rule_onboarding_batch_streamer(request)]
+    results, summary = lines[:-1], lines[-1]["summary"]
+
+    assert sorted(r["index"] for r in results) == list(range(7))
+    assert fake_streamer["peak"] <= 2
+    assert summary == {"batch_id": "batch", "total": 7, "success": 6, "failed": 1, "error": 0}
+
+    # Structured specs are seeded straight into 'raw_rule_details'
+    structured = [c for c in fake_streamer["calls"] if c[2]]
+    assert structured[0][2]["raw_rule_details"]["rule_name"] == "STRUCTURED_RULE"
+
+@pytest.mark.asyncio
+async def test_reused_batch_id_runs_the_new_structured_rule(monkeypatch):
+    deployed = []
+
+    async def get_tool(tool_name):
+        async def run_async(args, tool_context):
+            if tool_name == "onboard_rule":
+                deployed.append(args["rule_name"])
+            return SimpleNamespace(isError=False, structuredContent={"connectivity_id": "1"})
+        return SimpleNamespace(name=tool_name, run_async=run_async)
+    monkeypatch.setattr("src.rule_onboarding.services.mcp_toolset_manager.mcp_toolset_manager.get_tool", get_tool)
+
+    def rule(name):
+        return {
+            "rule_name": name, "db_name": "db", "dataset_name": "ds", "repository_name": "AWSRepo",
+            "attributes": [{"column_name": "C", "rule_type": "STALE_COUNT", "baseline_source": "PREVIOUS", "rule_details": {"baseline_value": 1.0, "threshold_value": 5}}]
+        }
+
+    # Same batch_id, so both submissions land on session 'reused-batch-0'
+    for name in ("FIRST_RULE", "SECOND_RULE"):
+        request = backend.BatchOnboardRequest(rules=[rule(name)], batch_id="reused-batch")
+        lines = [json.loads(line) async for line in backend.dq_rule_onboarding_batch_streamer(request)]
+        assert lines[0]["session_id"] == "reused-batch-0"
+        assert lines[0]["status"] == "success", lines[0]["output"]
+
+    assert deployed == ["FIRST_RULE", "SECOND_RULE"]
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from src.rule_onboarding.services import mcp_server
+
+def _rule(name, connectivity_id="1"):
+    return {
+        "rule_name": name,
+        "db_name": "customer",
+        "dataset_name": "sales",
+        "connectivity_id": connectivity_id,
+        "attributes": [{
+            "column_name": "RECORD_COUNT",
+            "rule_type": "RECORD_COUNT",
+            "baseline_source": "CONFIG",
+            "rule_details": {"baseline_value": 10, "threshold_value": 100}
+        }]
+    }
+
+@pytest.fixture
+def mock_rules_api(monkeypatch):
+    """
+    Shared config API client whose POST fails for connectivity_id 'broken'.
+    """
+    stats = {"running": 0, "peak": 0}
+
+    async def fake_post(url, json, **kwargs):
+        stats["running"] += 1
+        stats["peak"] = max(stats["peak"], stats["running"])
+        await asyncio.sleep(0.01)
+        stats["running"] -= 1
+        if json["connectivity_id"] == "broken":
+            raise RuntimeError("500 Internal Server Error")
+        response = MagicMock()
+        response.json.return_value = {"message": f"Rule {json['rule_name']} onboarded"}
+        return response
+
+    client = MagicMock()
+    client.post = AsyncMock(side_effect=fake_post)
+    client.is_closed = False
+    monkeypatch.setattr(mcp_server, "_http_client", client)
+    monkeypatch.setattr(mcp_server, "ONBOARD_RULES_CHUNK_SIZE", 3)
+    monkeypatch.setattr(mcp_server, "ONBOARD_RULES_MAX_PARALLEL", 2)
+    return stats
+
+@pytest.mark.asyncio
+async def test_bulk_onboarding_reports_per_rule_outcome(mock_rules_api):
+    rules = [_rule(f"RULE_{i}") for i in range(5)]
+    rules.append(_rule("RULE_UPSTREAM_FAIL", connectivity_id="broken"))
+    rules.append({"rule_name": "RULE_INVALID", "db_name": "customer"})
+
+    response = await mcp_server.onboard_rules.fn(rules)
+
+    assert (response.total, response.succeeded, response.failed) == (7, 5, 2)
+    assert [r.index for r in response.results] == list(range(7))
+    assert response.results[5].status == "error"
+    assert response.results[6].status == "error"
+    assert "dataset_name" in response.results[6].message
+    assert mock_rules_api["peak"] <= 2
@@ -0,0 +1,144 @@
+import asyncio
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import HTTPException
+from src.rule_onboarding.services import mcp_server
+from src.rule_onboarding.utils.cache import MISSING, TTLCache
+
+def test_ttl_cache_lru_eviction_and_expiry(monkeypatch):
+    """
+    Verifies LRU eviction order and that expired entries are treated as misses.
+    """
+    clock = [100.0]
+    monkeypatch.setattr("src.rule_onboarding.utils.cache.time.monotonic", lambda: clock[0])
+
+    cache = TTLCache(max_size=2, ttl_seconds=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" becomes most recently used
+    cache.set("c", 3)           # evicts "b"
+
+    assert cache.get("b") is MISSING
+    assert cache.get("c") == 3
+
+    clock[0] += 11
+    assert cache.get("a") is MISSING
+    assert cache.stats()["evictions"] == 1
+
+@pytest.fixture
+def mock_config_api(monkeypatch):
+    """
+    Replaces the shared config API client in the MCP server with a mock
+    that answers 200 for AWSRepo and 404 for anything else.
+    """
+    mcp_server.connectivity_cache.clear()
+
+    async def fake_get(url, **kwargs):
+        response = MagicMock()
+        if "/AWSRepo/" in url:
+            response.status_code = 200
+            response.json.return_value = {"connectivity_id": "1"}
+        else:
+            response.status_code = 404
+            response.json.return_value = {"detail": "Repository not found"}
+        return response
+
+    client = MagicMock()
+    client.get = AsyncMock(side_effect=fake_get)
+    client.is_closed = False
+    monkeypatch.setattr(mcp_server, "_http_client", client)
+    yield client
+    mcp_server.connectivity_cache.clear()
+
+@pytest.mark.asyncio
+async def test_connectivity_lookup_is_cached(mock_config_api):
+    lookup = mcp_server.get_connectivity_id_by_repository_name.fn
+
+    first = await lookup("AWSRepo")
+    second = await lookup("AWSRepo")
+
+    assert first.connectivity_id == second.connectivity_id == "1"
+    assert mock_config_api.get.await_count == 1
+
+@pytest.mark.asyncio
+async def test_connectivity_404_is_negatively_cached(mock_config_api):
+    lookup = mcp_server.get_connectivity_id_by_repository_name.fn
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc:
+            await lookup("NonExistentRepo")
+        assert exc.value.status_code == 404
+
+    assert mock_config_api.get.await_count == 1
+
+    # Invalidation forces the next lookup upstream again
+    await mcp_server.invalidate_connectivity_cache.fn("NonExistentRepo")
+    with pytest.raises(HTTPException):
+        await lookup("NonExistentRepo")
+    assert mock_config_api.get.await_count == 2
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_upstream_call(mock_config_api):
+    lookup = mcp_server.get_connectivity_id_by_repository_name.fn
+    release = asyncio.Event()
+
+    async def slow_get(url, **kwargs):
+        await release.wait()
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {"connectivity_id": "1"}
+        return response
+
+    mock_config_api.get.side_effect = slow_get
+    waiters = [asyncio.ensure_future(lookup("AWSRepo")) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert {r.connectivity_id for r in results} == {"1"}
+    assert mock_config_api.get.await_count == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_lookup_errors_reach_all_waiters_and_are_not_cached(mock_config_api):
+    lookup = mcp_server.get_connectivity_id_by_repository_name.fn
+
+    async def failing_get(url, **kwargs):
+        await asyncio.sleep(0)
+        raise httpx.ConnectError("config API unavailable")
+
+    mock_config_api.get.side_effect = failing_get
+    results = await asyncio.gather(*(lookup("AWSRepo") for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, httpx.ConnectError) for r in results)
+    assert mock_config_api.get.await_count == 1
+    assert mcp_server.connectivity_cache.stats()["size"] == 0
+    assert not mcp_server._inflight_lookups
+
+@pytest.mark.asyncio
+async def test_http_client_lifecycle_follows_server_lifespan():
+    async with mcp_server.lifespan(mcp_server.mcp):
+        client = mcp_server.get_http_client()
+        assert mcp_server.get_http_client() is client
+        assert not client.is_closed
+    assert client.is_closed
+    assert mcp_server._http_client is None
+
+@pytest.mark.asyncio
+async def test_backend_admin_endpoints_reach_the_in_process_cache(monkeypatch):
+    from src.rule_onboarding.api import backend
+    from src.rule_onboarding.services.mcp_toolset_manager import McpToolsetManager
+    manager = McpToolsetManager(connection_params=MagicMock(), transport="inprocess")
+    monkeypatch.setattr(backend, "mcp_toolset_manager", manager)
+    mcp_server.connectivity_cache.clear()
+    mcp_server.connectivity_cache.set("AWSRepo", "1")
+    mcp_server.connectivity_cache.set("GCPRepo", "2")
+
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=backend.app), base_url="http://test") as client:
+            assert (await client.get("/connectivity-cache/stats")).json()["size"] == 2
+            assert (await client.delete("/connectivity-cache/AWSRepo")).json() == {"repository_name": "AWSRepo", "invalidated": True}
+            assert (await client.delete("/connectivity-cache")).json() == {"flushed_entries": 1}
+    finally:
+        await manager.close()
+    assert mcp_server.connectivity_cache.stats()["size"] == 0
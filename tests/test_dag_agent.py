@@ -0,0 +1,158 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import AsyncGenerator
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.events import Event, EventActions
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+from src.rule_onboarding.core.dag_agent import DagAgent, topological_order
+from src.rule_onboarding.core.dq_rule_onboarding_orchestrator import build_onboarding_pipeline
+
+class SleepyAgent(BaseAgent):
+    """Test stage: waits, records when it ran, optionally fails by escalating."""
+
+    def __init__(self, name: str, delay: float = 0.0, fail: bool = False):
+        super().__init__(name=name)
+        self._delay = delay
+        self._fail = fail
+
+    async def _run_async_impl(self, ctx) -> AsyncGenerator[Event, None]:
+        ctx.session.state.setdefault("started", []).append(self.name)
+        await asyncio.sleep(self._delay)
+        ctx.session.state.setdefault("finished", []).append(self.name)
+        yield Event(
+            author=self.name,
+            content=types.Content(role="assistant", parts=[types.Part(text=f"{self.name} {'FAILED' if self._fail else 'done'}")]),
+            actions=EventActions(escalate=self._fail)
+        )
+
+async def _run(agent, state=None):
+    service = InMemorySessionService()
+    session = await service.create_session(app_name="app", user_id="user", session_id="s1", state=state or {})
+    runner = Runner(agent=agent, app_name="app", session_service=service)
+    events = []
+    async for event in runner.run_async(user_id="user", session_id=session.id, new_message=types.Content(role="user", parts=[types.Part(text="go")])):
+        events.append(event)
+    return events, session
+
+def test_topological_order_rejects_cycles_and_unknown_stages():
+    assert topological_order({"c": ("a", "b"), "a": (), "b": ("a",)}) == ["a", "b", "c"]
+    with pytest.raises(ValueError, match="cycle"):
+        topological_order({"a": ("b",), "b": ("a",)})
+    with pytest.raises(ValueError, match="unknown"):
+        topological_order({"a": ("missing",)})
+
+@pytest.mark.asyncio
+async def test_independent_stages_run_concurrently_and_join():
+    root = SleepyAgent("root")
+    dag = DagAgent(name="dag", stages=[
+        (root, ()),
+        (SleepyAgent("lookup", delay=0.2), ("root",)),
+        (SleepyAgent("checks", delay=0.2), ("root",)),
+        (SleepyAgent("join"), ("lookup", "checks")),
+    ])
+
+    started = time.perf_counter()
+    events, _ = await _run(dag)
+    elapsed = time.perf_counter() - started
+
+    authors = [e.author for e in events]
+    assert authors[0] == "root" and authors[-1] == "join"
+    assert sorted(authors[1:3]) == ["checks", "lookup"]
+    # Critical path is root -> slowest branch -> join, not the sum of both branches
+    assert elapsed < 0.35
+
+@pytest.mark.asyncio
+async def test_failed_branch_cancels_siblings_and_skips_dependents():
+    slow = SleepyAgent("slow", delay=5)
+    dag = DagAgent(name="dag", stages=[
+        (SleepyAgent("failing", fail=True), ()),
+        (slow, ()),
+        (SleepyAgent("after"), ("failing", "slow")),
+    ])
+
+    started = time.perf_counter()
+    events, _ = await _run(dag)
+
+    assert [e.author for e in events] == ["failing"]
+    assert time.perf_counter() - started < 1
+
+@pytest.mark.asyncio
+async def test_onboarding_pipeline_joins_lookup_and_attribute_checks(monkeypatch):
+    lookup = AsyncMock()
+    # A MagicMock's repr carries its id(), which can contain "404" and trip the not-found check
+    lookup.run_async.return_value = SimpleNamespace(isError=False, structuredContent={"connectivity_id": "42"})
+    deploy = AsyncMock()
+    deploy.run_async.return_value = MagicMock(isError=False)
+    tools = {"get_connectivity_id_by_repository_name": lookup, "onboard_rule": deploy}
+
+    async def get_tool(tool_name):
+        return tools[tool_name]
+    monkeypatch.setattr("src.rule_onboarding.services.mcp_toolset_manager.mcp_toolset_manager.get_tool", get_tool)
+
+    raw = {
+        "rule_name": "R", "db_name": "db", "dataset_name": "ds", "repository_name": "AWSRepo",
+        "attributes": [{"column_name": "C", "rule_type": "STALE_COUNT", "baseline_source": "PREVIOUS", "rule_details": {"baseline_value": 1.0, "threshold_value": 5}}]
+    }
+    pipeline = build_onboarding_pipeline("test_pipeline")
+    events, _ = await _run(pipeline, state={"raw_rule_details": raw})
+
+    assert events[-1].author == "rule_deployment_agent"
+    assert events[-1].content.parts[0].text.startswith("✅")
+    payload = deploy.run_async.call_args.kwargs["args"]
+    assert payload["connectivity_id"] == "42"
+    assert "repository_name" not in payload
+
+@pytest.mark.asyncio
+async def test_onboarding_pipeline_stops_on_attribute_violation(monkeypatch):
+    deploy = AsyncMock()
+
+    async def get_tool(tool_name):
+        if tool_name == "onboard_rule":
+            return deploy
+        await asyncio.sleep(5)  # lookup still in flight when the checks fail
+    monkeypatch.setattr("src.rule_onboarding.services.mcp_toolset_manager.mcp_toolset_manager.get_tool", get_tool)
+
+    raw = {
+        "rule_name": "R", "repository_name": "AWSRepo",
+        "attributes": [{"rule_type": "STALE_COUNT", "baseline_source": "PREVIOUS", "rule_details": {"baseline_value": 3}}]
+    }
+    events, _ = await _run(build_onboarding_pipeline("test_pipeline"), state={"raw_rule_details": raw})
+
+    assert [e.author for e in events] == ["attribute_validation_agent"]
+    assert "VALIDATION_ERROR" in events[0].content.parts[0].text
+    deploy.run_async.assert_not_called()
+
+class BranchRecordingAgent(SleepyAgent):
+    """Test stage that records the branch it ran on; 'llm' gives it an LLM sub-agent."""
+
+    def __init__(self, name: str, branches: dict, llm: bool = False):
+        super().__init__(name)
+        self._branches = branches
+        if llm:
+            self.sub_agents = [LlmAgent(name=f"{name}_llm", model="gemini-2.5-flash")]
+
+    async def _run_async_impl(self, ctx) -> AsyncGenerator[Event, None]:
+        self._branches[self.name] = ctx.branch
+        async for event in super()._run_async_impl(ctx):
+            yield event
+
+@pytest.mark.asyncio
+async def test_only_concurrent_llm_stages_are_branched():
+    branches = {}
+    dag = DagAgent(name="dag", stages=[
+        (BranchRecordingAgent("extract", branches, llm=True), ()),
+        (BranchRecordingAgent("lookup", branches), ("extract",)),
+        (BranchRecordingAgent("summarize", branches, llm=True), ("extract",)),
+        (BranchRecordingAgent("deploy", branches), ("lookup", "summarize")),
+    ])
+
+    await _run(dag)
+
+    # The LLM stage running alone sees the whole history, as under SequentialAgent
+    assert branches == {"extract": None, "lookup": None, "summarize": "dag.summarize", "deploy": None}
+    assert build_onboarding_pipeline("pipeline", BranchRecordingAgent("rule_extraction_agent", {}, llm=True))._branched == set()
@@ -0,0 +1,33 @@
+from unittest.mock import MagicMock
+import google.genai.types as types
+from src.rule_onboarding.agents.rule_extraction import DQ_EXAMPLE_LIBRARY, build_extraction_instruction, example_selector
+
+def test_library_contains_every_example():
+    assert len(DQ_EXAMPLE_LIBRARY) == 8
+    assert all(e["text"].startswith("User:") and "Assistant:" in e["text"] for e in DQ_EXAMPLE_LIBRARY)
+
+def test_selects_most_relevant_examples():
+    selected = example_selector.select("Median variance on column salary for dataset s3://bucket/employee.json", k=2)
+    assert len(selected) == 2
+    assert any("Median Variance" in e["user"] for e in selected)
+
+def test_instruction_only_contains_selected_examples():
+    context = MagicMock()
+    context.user_content = types.Content(role="user", parts=[types.Part(text="NULL COUNT rule on order column of sales table")])
+
+    instruction = build_extraction_instruction(context)
+
+    assert "### Extraction Rules:" in instruction
+    assert instruction.count("Assistant:") == 3
+    assert "CSTMR_SALES_NULL_COUNT" in instruction
+
+def test_instruction_includes_the_compacted_conversation_summary():
+    context = MagicMock()
+    context.user_content = types.Content(role="user", parts=[types.Part(text="Same rule but threshold 20")])
+    context.state = {"conversation_summary": "user: stale count rule on sales\nrule_deployment_agent: deployed DQ_SALES_STALE_COUNT_RULE"}
+
+    instruction = build_extraction_instruction(context)
+
+    assert instruction.endswith("### Earlier conversation (summarized, oldest first):\nuser: stale count rule on sales\nrule_deployment_agent: deployed DQ_SALES_STALE_COUNT_RULE")
+    context.state = {}
+    assert "Earlier conversation" not in build_extraction_instruction(context)
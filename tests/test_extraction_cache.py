@@ -0,0 +1,86 @@
+import json
+import pytest
+from typing import AsyncGenerator
+from unittest.mock import MagicMock
+import google.genai.types as types
+from google.adk.agents import BaseAgent
+from google.adk.events import Event
+from src.rule_onboarding.agents import rule_fast_path_extraction
+from src.rule_onboarding.agents.rule_fast_path_extraction import DQRuleFastPathExtractionAgent
+from src.rule_onboarding.services.session_store import SUMMARY_STATE_KEY
+from src.rule_onboarding.utils.extraction_cache import ExtractionCache, normalize_prompt
+
+LLM_RULE = {"rule_name": "DQ_CUSTOMER_SALES_MEAN_RULE", "db_name": "customer", "dataset_name": "sales", "repository_name": None, "attributes": []}
+
+def test_normalize_prompt_collapses_case_whitespace_and_numbers():
+    assert normalize_prompt("Ensure  the AVERAGE price\tis between 10.0 and 1,000") == \
+        normalize_prompt("ensure the average price is between 10 and 1000")
+
+def test_cache_expires_and_caps_size(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("src.rule_onboarding.utils.extraction_cache.time.time", lambda: clock[0])
+    cache = ExtractionCache(str(tmp_path / "cache.db"), ttl_seconds=60, max_entries=2)
+
+    cache.set("prompt a", {"rule_name": "A"})
+    clock[0] += 1
+    cache.set("prompt b", {"rule_name": "B"})
+    clock[0] += 1
+    assert cache.get("PROMPT  A") == {"rule_name": "A"}  # "a" is now most recently used
+    clock[0] += 1
+    cache.set("prompt c", {"rule_name": "C"})           # evicts "b"
+
+    assert cache.get("prompt b") is None
+    clock[0] += 120
+    assert cache.get("prompt a") is None
+    assert cache.stats()["hits"] == 1
+
+class StubLlmExtractionAgent(BaseAgent):
+    """Stands in for the Gemini extraction agent, writing a fenced JSON answer."""
+    calls: int = 0
+
+    async def run_async(self, ctx) -> AsyncGenerator[Event, None]:
+        self.calls += 1
+        ctx.session.state["raw_rule_details"] = f"```json{json.dumps(LLM_RULE)}```"
+        yield Event(author=self.name, content=types.Content(role="assistant", parts=[types.Part(text="done")]))
+
+def _ctx(user_message, prior_user_turns=0):
+    ctx = MagicMock()
+    ctx.session.state = {}
+    ctx.session.events = [MagicMock(author="user") for _ in range(prior_user_turns + 1)]
+    ctx.user_content = types.Content(role="user", parts=[types.Part(text=user_message)])
+    return ctx
+
+@pytest.mark.asyncio
+async def test_repeated_prompt_is_served_from_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(rule_fast_path_extraction, "_extraction_cache", ExtractionCache(str(tmp_path / "cache.db")))
+    llm_agent = StubLlmExtractionAgent(name="rule_extraction_agent")
+    agent = DQRuleFastPathExtractionAgent(llm_agent)
+
+    first = _ctx("Ensure the average price in sales table of customer schema is between 10 and 100")
+    [e async for e in agent._run_async_impl(first)]
+    second = _ctx("ensure the average price in sales table of customer schema is between 10.0 and 100")
+    [e async for e in agent._run_async_impl(second)]
+
+    assert llm_agent.calls == 1
+    assert second.session.state["raw_rule_details"] == LLM_RULE
+
+    # Follow-up turns depend on history and always go to the LLM
+    follow_up = _ctx("Ensure the average price in sales table of customer schema is between 10 and 100", prior_user_turns=1)
+    [e async for e in agent._run_async_impl(follow_up)]
+    assert llm_agent.calls == 2
+
+@pytest.mark.asyncio
+async def test_compacted_follow_up_turn_bypasses_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(rule_fast_path_extraction, "_extraction_cache", ExtractionCache(str(tmp_path / "cache.db")))
+    llm_agent = StubLlmExtractionAgent(name="rule_extraction_agent")
+    agent = DQRuleFastPathExtractionAgent(llm_agent)
+    prompt = "Ensure the average price in sales table of customer schema is between 10 and 100"
+    [e async for e in agent._run_async_impl(_ctx(prompt))]
+
+    # Compaction removed the earlier user events; only the summary remains
+    compacted = _ctx(prompt)
+    compacted.session.state[SUMMARY_STATE_KEY] = "user: onboard a mean rule on sales"
+    [e async for e in agent._run_async_impl(compacted)]
+
+    assert llm_agent.calls == 2
+    assert rule_fast_path_extraction.get_extraction_cache().stats()["size"] == 1
@@ -0,0 +1,99 @@
+import os
+import logging
+import queue
+from src.rule_onboarding.utils.logger import LazyPayload, NonBlockingQueueHandler, setup_logger
+
+class _CountingPayload:
+    renders = 0
+
+    def __str__(self):
+        _CountingPayload.renders += 1
+        return "payload"
+
+def _record(payload):
+    return logging.LogRecord("DQ_TEST", logging.INFO, __file__, 1, "Payload: %s", (LazyPayload(payload),), None)
+
+def test_lazy_payload_caps_rendered_length():
+    rendered = str(LazyPayload({"attributes": ["x" * 50]}, max_chars=20))
+
+    assert rendered.startswith('{"attributes": ["xxx')
+    assert rendered.endswith("chars truncated]")
+    assert str(LazyPayload({"a": 1})) == '{"a": 1}'
+
+def test_queue_handler_defers_formatting_to_the_listener():
+    log_queue = queue.Queue()
+    handler = NonBlockingQueueHandler(log_queue)
+    _CountingPayload.renders = 0
+
+    handler.handle(_record(_CountingPayload()))
+
+    assert _CountingPayload.renders == 0
+    assert log_queue.get_nowait().getMessage() == "Payload: payload"
+
+def test_queue_handler_drops_instead_of_blocking_when_full():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    dropped = NonBlockingQueueHandler.dropped
+
+    handler.handle(_record("first"))
+    handler.handle(_record("second"))
+
+    assert NonBlockingQueueHandler.dropped == dropped + 1
+
+def test_setup_logger_only_attaches_the_queue_handler():
+    logger = setup_logger("DQ_TEST_QUEUE_LOGGER")
+
+    assert [type(h) for h in logger.handlers] == [NonBlockingQueueHandler]
+    assert setup_logger("DQ_TEST_QUEUE_LOGGER").handlers == logger.handlers
+
+def test_payload_mutated_after_logging_is_written_as_logged():
+    log_queue = queue.Queue()
+    handler = NonBlockingQueueHandler(log_queue)
+    payload = {"rule_name": "R1", "repository_name": "AWSRepo"}
+
+    handler.handle(_record(payload))
+    # What the validation agent does right after logging its payload
+    payload.pop("repository_name")
+    payload["connectivity_id"] = "1"
+
+    assert log_queue.get_nowait().getMessage() == 'Payload: {"rule_name": "R1", "repository_name": "AWSRepo"}'
+
+def test_forked_child_writes_through_its_own_listener(tmp_path, monkeypatch):
+    from src.rule_onboarding.utils import logger as logger_module
+    log_path = tmp_path / "audit.log"
+    logger = setup_logger("DQ_TEST_FORK_LOGGER")
+    # Read by the child when it rebuilds its listener
+    monkeypatch.setattr(logger_module, "LOG_FILE_PATH", str(log_path))
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            logger.info("logged by the forked child")
+            logger_module.stop_logging()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert "logged by the forked child" in log_path.read_text()
+
+def test_audit_file_is_reopened_after_external_rotation(tmp_path, monkeypatch):
+    from src.rule_onboarding.utils import logger as logger_module
+    log_path = tmp_path / "audit.log"
+    monkeypatch.setattr(logger_module, "LOG_FILE_PATH", str(log_path))
+    logger_module.stop_logging()
+    logger = setup_logger("DQ_TEST_ROTATION_LOGGER")
+    logger_module._start_listener()
+
+    try:
+        logger.info("before rotation")
+        logger_module._listener.stop()
+        log_path.rename(tmp_path / "audit.log.1")
+        logger_module._listener.start()
+        logger.info("after rotation")
+    finally:
+        logger_module.stop_logging()
+        # Back to the real audit file for the rest of the session
+        monkeypatch.undo()
+        logger_module._start_listener()
+
+    assert "before rotation" in (tmp_path / "audit.log.1").read_text()
+    assert "after rotation" in log_path.read_text()
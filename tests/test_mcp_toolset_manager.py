@@ -0,0 +1,124 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastmcp import Client, Context, FastMCP
+from mcp.types import ListToolsResult, Tool
+from src.rule_onboarding.services.mcp_toolset_manager import McpToolsetManager, TracedMcpTool, resolve_mcp_transport
+
+def _list_tools_result(*names):
+    return ListToolsResult(tools=[Tool(name=n, inputSchema={"type": "object"}) for n in names])
+
+@pytest.fixture
+def manager():
+    """
+    Toolset manager whose session manager hands back a mocked MCP session.
+    """
+    manager = McpToolsetManager(connection_params=MagicMock())
+    session = MagicMock()
+    session.list_tools = AsyncMock(return_value=_list_tools_result("onboard_rule", "get_connectivity_id_by_repository_name"))
+    manager._session_manager = MagicMock()
+    manager._session_manager.create_session = AsyncMock(return_value=session)
+    return manager
+
+@pytest.mark.asyncio
+async def test_tools_are_listed_once_across_requests(manager):
+    session = await manager._session_manager.create_session()
+
+    first = await manager.get_tool("onboard_rule")
+    second = await manager.get_tool("onboard_rule")
+    lookup = await manager.get_tool("get_connectivity_id_by_repository_name")
+
+    assert first is second
+    assert lookup.name == "get_connectivity_id_by_repository_name"
+    assert session.list_tools.await_count == 1
+
+@pytest.mark.asyncio
+async def test_tools_refresh_on_reconnect(manager):
+    await manager.get_tool("onboard_rule")
+
+    # Session manager hands back a new session after a reconnect
+    new_session = MagicMock()
+    new_session.list_tools = AsyncMock(return_value=_list_tools_result("onboard_rule"))
+    manager._session_manager.create_session.return_value = new_session
+
+    await manager.get_tool("onboard_rule")
+    assert new_session.list_tools.await_count == 1
+
+@pytest.mark.asyncio
+async def test_missing_tool_refreshes_then_raises(manager):
+    session = await manager._session_manager.create_session()
+    await manager.get_tool("onboard_rule")
+
+    with pytest.raises(RuntimeError, match="not found"):
+        await manager.get_tool("unknown_tool")
+    assert session.list_tools.await_count == 2
+
+def test_transport_resolution():
+    assert resolve_mcp_transport("auto", "http://127.0.0.1:8082/mcp") == "inprocess"
+    assert resolve_mcp_transport("auto", "https://mcp.example.com/mcp") == "http"
+    assert resolve_mcp_transport("http", "http://localhost:8082/mcp") == "http"
+    with pytest.raises(ValueError, match="MCP_TRANSPORT"):
+        resolve_mcp_transport("grpc", "http://127.0.0.1:8082/mcp")
+
+@pytest.mark.asyncio
+async def test_in_process_transport_calls_tools_without_http():
+    manager = McpToolsetManager(connection_params=MagicMock(), transport="inprocess")
+    try:
+        tool = await manager.get_tool("get_connectivity_cache_stats")
+        result = await tool._run_async_impl(args={}, tool_context=None, credential=None)
+
+        assert not result.isError
+        assert "hit_ratio" in result.structuredContent
+        # One long-lived session shared by every lookup
+        assert await manager.session() is await manager.session()
+    finally:
+        await manager.close()
+    assert manager._owner is None
+
+@pytest.mark.asyncio
+async def test_cancelled_call_cancels_the_server_handler():
+    server = FastMCP("cancel_test")
+    handler = {"started": asyncio.Event(), "cancelled": asyncio.Event()}
+
+    @server.tool
+    async def slow_lookup(repository_name: str) -> str:
+        handler["started"].set()
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            handler["cancelled"].set()
+            raise
+        return "1"
+
+    async with Client(server) as client:
+        async def session_provider():
+            return client.session
+        tool = TracedMcpTool(mcp_tool=Tool(name="slow_lookup", inputSchema={"type": "object"}), mcp_session_manager=MagicMock(), session_provider=session_provider)
+        call = asyncio.create_task(tool._run_async_impl(args={"repository_name": "AWSRepo"}, tool_context=None, credential=None))
+        await asyncio.wait_for(handler["started"].wait(), 1)
+        call.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        await asyncio.wait_for(handler["cancelled"].wait(), 1)
+        # The session is still usable afterwards
+        assert (await client.list_tools())[0].name == "slow_lookup"
+
+@pytest.mark.asyncio
+async def test_client_session_request_id_is_the_next_call_id():
+    """
+    TracedMcpTool reads the private ClientSession._request_id to address its
+    'notifications/cancelled'. Fails if an mcp upgrade renames it or stops
+    using it as the id of the next request.
+    """
+    server = FastMCP("request_id_test")
+
+    @server.tool
+    async def echo_request_id(ctx: Context) -> str:
+        return str(ctx.request_id)
+
+    async with Client(server) as client:
+        for _ in range(2):
+            expected = client.session._request_id
+            result = await client.call_tool("echo_request_id", {})
+            assert result.data == str(expected)
@@ -0,0 +1,59 @@
+import httpx
+import pytest
+from src.rule_onboarding.api import backend
+from src.rule_onboarding.services import mcp_server
+from src.rule_onboarding.utils.metrics import MetricsRegistry, cache_collector, observe_span, registry
+
+def test_registry_renders_prometheus_text():
+    metrics = MetricsRegistry()
+    requests = metrics.counter("demo_requests_total", "Requests.", ("route",))
+    latency = metrics.histogram("demo_seconds", "Latency.", buckets=(0.1, 1.0))
+    requests.inc(route="/a")
+    requests.inc(2, route="/a")
+    latency.observe(0.05)
+    latency.observe(0.5)
+    metrics.add_collector(cache_collector("one", lambda: {"hits": 3, "misses": 1, "hit_ratio": 0.75}))
+    metrics.add_collector(cache_collector("two", lambda: {"hits": 0, "misses": 0, "hit_ratio": 0.0}))
+
+    text = metrics.render()
+
+    assert 'demo_requests_total{route="/a"} 3' in text
+    assert 'demo_seconds_bucket{le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 2' in text
+    assert "demo_seconds_count 2" in text
+    assert 'dq_cache_hit_ratio{cache="one"} 0.75' in text
+    # Families contributed by several collectors are declared once
+    assert text.count("# TYPE dq_cache_hits_total counter") == 1
+
+def test_spans_feed_stage_mcp_and_config_api_metrics():
+    stage = registry.histogram("dq_agent_stage_seconds", "")
+    config_api = registry.counter("dq_config_api_requests_total", "")
+    before_stage = stage.count(agent="metrics_test_agent")
+    before_errors = config_api.value(method="PATCH", status="5xx")
+
+    observe_span("agent_run [metrics_test_agent]", 0.2, {}, False)
+    observe_span("HTTP PATCH", 0.01, {"http.response.status_code": 503}, True)
+
+    assert stage.count(agent="metrics_test_agent") == before_stage + 1
+    assert config_api.value(method="PATCH", status="5xx") == before_errors + 1
+
+@pytest.mark.asyncio
+async def test_backend_metrics_endpoint_counts_requests():
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.get("/metrics")
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'dq_http_requests_total{method="GET",route="/metrics",status="200"}' in response.text
+    assert "dq_inflight_streams 0" in response.text
+
+@pytest.mark.asyncio
+async def test_mcp_server_metrics_route():
+    transport = httpx.ASGITransport(app=mcp_server.mcp.http_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert 'dq_cache_hit_ratio{cache="connectivity"}' in response.text
@@ -0,0 +1,63 @@
+import httpx
+import pytest
+from src.rule_onboarding.benchmark.onboarding_benchmark import compare_reports, percentile, stage_latencies, summarize
+from src.rule_onboarding.services.config_api_stub import create_config_api_stub
+
+def _client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stub")
+
+@pytest.mark.asyncio
+async def test_stub_resolves_known_repositories_and_onboards_rules():
+    stub = create_config_api_stub()
+    async with _client(stub) as client:
+        found = await client.get("/api/dq/config/v1/repositories/GCPRepo/connectivity")
+        missing = await client.get("/api/dq/config/v1/repositories/NoSuchRepo/connectivity")
+        onboarded = await client.post("/api/dq/config/v1/rules", json={"rule_name": "stale_count"})
+
+    assert found.json() == {"connectivity_id": "2"}
+    assert missing.status_code == 404
+    assert "stale_count" in onboarded.json()["message"]
+    assert stub.state.stats == {"requests": 3, "injected_errors": 0, "rules_onboarded": 1}
+
+@pytest.mark.asyncio
+async def test_stub_injects_errors():
+    stub = create_config_api_stub(error_rate=1.0, seed=7)
+    async with _client(stub) as client:
+        response = await client.post("/api/dq/config/v1/rules", json={"rule_name": "stale_count"})
+
+    assert response.status_code == 503
+    assert stub.state.stats["injected_errors"] == 1
+    assert stub.state.stats["rules_onboarded"] == 0
+
+def test_percentiles_and_summary():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 50) is None
+    assert summarize(values)["p95"] == 95.0
+    assert summarize([]) == {"count": 0}
+
+def test_stage_latencies_sum_spans_per_request():
+    def span(name, request_id, start_ms, end_ms):
+        return {"name": name, "attributes": {"dq.request_id": request_id},
+                "startTimeUnixNano": int(start_ms * 1e6), "endTimeUnixNano": int(end_ms * 1e6)}
+
+    spans = [
+        span("mcp.call onboard_rule", "r1", 0, 10),
+        span("mcp.call onboard_rule", "r1", 20, 25),  # retried call, same request
+        span("mcp.call onboard_rule", "r2", 0, 4),
+        span("mcp.call onboard_rule", "warmup", 0, 100),
+    ]
+    stages = stage_latencies(spans, {"r1", "r2"})
+    assert sorted(stages["mcp.call onboard_rule"]) == [4.0, 15.0]
+
+def test_compare_reports():
+    baseline = {"throughput_rps": 10.0, "latency_ms": {"p50": 100.0, "p95": 200.0, "p99": 400.0}, "stages_ms": {"invocation": {"p95": 50.0}}}
+    current = {"throughput_rps": 12.0, "latency_ms": {"p50": 80.0, "p95": 200.0, "p99": 300.0}, "stages_ms": {"invocation": {"p95": 25.0}, "new_stage": {"p95": 1.0}}}
+
+    diff = compare_reports(baseline, current)
+
+    assert diff["throughput_rps_pct"] == 20.0
+    assert diff["latency_p50_pct"] == -20.0
+    assert diff["latency_p95_pct"] == 0.0
+    assert diff["stages_p95_pct"] == {"invocation": -50.0}
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+import httpx
+import pytest
+from src.rule_onboarding.api import backend
+
+@pytest.fixture
+def mock_tools(monkeypatch):
+    """MCP lookup and deployment tools that always succeed."""
+    async def run_async(args, tool_context):
+        if "repository_name" in args:
+            return SimpleNamespace(isError=False, structuredContent={"connectivity_id": "1"})
+        return SimpleNamespace(isError=False)
+
+    async def get_tool(tool_name):
+        return SimpleNamespace(name=tool_name, run_async=run_async)
+    monkeypatch.setattr("src.rule_onboarding.services.mcp_toolset_manager.mcp_toolset_manager.get_tool", get_tool)
+
+@pytest.mark.asyncio
+async def test_event_stream_reports_progress_in_order(mock_tools):
+    events = [
+        event async for event in backend.dq_rule_onboarding_event_streamer(
+            "Onboard the sales rule", "stream-session-1", agent=backend.dq_mock_rule_onboarding_orchestrator, request_id="req-1"
+        )
+    ]
+    types = [event["type"] for event in events]
+
+    assert events[0] == {"type": "accepted", "elapsed_ms": events[0]["elapsed_ms"], "request_id": "req-1", "session_id": "stream-session-1"}
+    assert types[-1] == "result"
+    assert events[-1]["status"] == "success"
+    assert events[-1]["message"].startswith("✅")
+
+    started = [e["stage"] for e in events if e["type"] == "stage_started"]
+    finished = [e["stage"] for e in events if e["type"] == "stage_finished"]
+    assert started[:2] == ["dq_mock_rule_onboarding_orchestrator", "rule_extraction_agent"]
+    assert set(finished) == set(started)
+    assert set(events[-1]["stage_timings_ms"]) == set(started)
+
+    # The extracted rule is previewed as soon as extraction has finished, before deployment
+    preview = types.index("rule_preview")
+    assert events[preview]["rule"]["rule_name"] == "CUSTOMER_SALES_STALE_COUNT_RULE"
+    deployment = next(i for i, e in enumerate(events) if e["type"] == "stage_started" and e["stage"] == "rule_deployment_agent")
+    assert types.index("stage_finished") < preview < deployment
+    elapsed = [event["elapsed_ms"] for event in events]
+    assert elapsed == sorted(elapsed)
+
+@pytest.mark.asyncio
+async def test_validation_error_ends_stream_with_failed_result(monkeypatch):
+    async def get_tool(tool_name):
+        async def run_async(args, tool_context):
+            return SimpleNamespace(isError=True)
+        return SimpleNamespace(name=tool_name, run_async=run_async)
+    monkeypatch.setattr("src.rule_onboarding.services.mcp_toolset_manager.mcp_toolset_manager.get_tool", get_tool)
+
+    events = [
+        event async for event in backend.dq_rule_onboarding_event_streamer(
+            "Onboard the sales rule", "stream-session-2", agent=backend.dq_mock_rule_onboarding_orchestrator
+        )
+    ]
+
+    assert events[-2]["type"] == "message" and events[-2]["text"].startswith("❌ Repository 'AWSRepo'")
+    assert events[-1]["type"] == "result" and events[-1]["status"] == "failed"
+    assert "rule_deployment_agent" not in [e.get("stage") for e in events]
+
+@pytest.mark.parametrize("stream,accept,expected", [
+    (None, None, "text"),
+    (None, "text/event-stream", "sse"),
+    (None, "application/x-ndjson", "ndjson"),
+    ("ndjson", "text/event-stream", "ndjson"),
+])
+def test_stream_format_negotiation(stream, accept, expected):
+    assert backend.negotiate_stream_format(stream, accept) == expected
+
+@pytest.mark.asyncio
+async def test_onboard_rule_streams_server_sent_events(mock_tools, monkeypatch):
+    events_streamer = backend.dq_rule_onboarding_event_streamer
+
+    def mock_pipeline(user_message, session_id, agent=None, initial_state=None, request_id=None, is_disconnected=None):
+        return events_streamer(user_message, session_id, backend.dq_mock_rule_onboarding_orchestrator, initial_state, request_id, is_disconnected)
+    monkeypatch.setattr(backend, "dq_rule_onboarding_event_streamer", mock_pipeline)
+
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(
+            "/onboard-rule", json={"message": "Onboard the sales rule", "session_id": "stream-session-3"},
+            headers={"Accept": "text/event-stream", "X-Request-ID": "req-sse"}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = [frame for frame in response.text.split("\n\n") if frame]
+    first_name, first_data = frames[0].split("\n")
+    assert first_name == "event: accepted"
+    assert json.loads(first_data.removeprefix("data: "))["request_id"] == "req-sse"
+    assert frames[-1].startswith("event: result\n")
+    assert json.loads(frames[-1].split("data: ", 1)[1])["status"] == "success"
+
+def _tools(monkeypatch, lookup_delay: float = 0.0, deploy_delay: float = 0.0):
+    """Slow MCP tools recording which calls started, finished or were cancelled."""
+    calls = {"started": [], "finished": [], "cancelled": []}
+
+    async def run_async(args, tool_context):
+        name = "lookup" if "repository_name" in args else "deploy"
+        calls["started"].append(name)
+        try:
+            await asyncio.sleep(lookup_delay if name == "lookup" else deploy_delay)
+        except asyncio.CancelledError:
+            calls["cancelled"].append(name)
+            raise
+        calls["finished"].append(name)
+        return SimpleNamespace(isError=False, structuredContent={"connectivity_id": "1"})
+
+    async def get_tool(tool_name):
+        return SimpleNamespace(name=tool_name, run_async=run_async)
+    monkeypatch.setattr("src.rule_onboarding.services.mcp_toolset_manager.mcp_toolset_manager.get_tool", get_tool)
+    monkeypatch.setattr(backend, "CLIENT_DISCONNECT_POLL_SECONDS", 0.01)
+    return calls
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_running_stages(monkeypatch):
+    calls = _tools(monkeypatch, lookup_delay=5)
+    abandoned = backend.ABANDONED_REQUESTS_TOTAL.value()
+
+    async def is_disconnected():
+        return "lookup" in calls["started"]
+
+    started = time.perf_counter()
+    events = [
+        event async for event in backend.dq_rule_onboarding_event_streamer(
+            "Onboard the sales rule", "stream-session-4", agent=backend.dq_mock_rule_onboarding_orchestrator, is_disconnected=is_disconnected
+        )
+    ]
+
+    assert time.perf_counter() - started < 1
+    assert events[-1]["type"] == "result" and events[-1]["status"] == "cancelled"
+    assert calls["cancelled"] == ["lookup"]
+    assert "deploy" not in calls["started"]
+    assert backend.ABANDONED_REQUESTS_TOTAL.value() == abandoned + 1
+
+@pytest.mark.asyncio
+async def test_deployment_in_flight_finishes_after_disconnect(monkeypatch):
+    calls = _tools(monkeypatch, deploy_delay=0.2)
+
+    async def is_disconnected():
+        return "deploy" in calls["started"]
+
+    events = [
+        event async for event in backend.dq_rule_onboarding_event_streamer(
+            "Onboard the sales rule", "stream-session-5", agent=backend.dq_mock_rule_onboarding_orchestrator, is_disconnected=is_disconnected
+        )
+    ]
+
+    assert events[-1]["status"] == "cancelled"
+    assert calls["finished"] == ["lookup"]
+    # The upstream POST was already sent: it completes in the background
+    await asyncio.sleep(0.3)
+    assert calls["finished"] == ["lookup", "deploy"]
+    assert calls["cancelled"] == []
+
+@pytest.mark.asyncio
+async def test_concurrent_turns_on_one_session_run_one_after_another(monkeypatch):
+    calls = _tools(monkeypatch, lookup_delay=0.05)
+    timeline = []
+
+    async def turn(name):
+        async for event in backend.dq_rule_onboarding_event_streamer(
+            "Onboard the sales rule", "stream-session-6", agent=backend.dq_mock_rule_onboarding_orchestrator, request_id=name
+        ):
+            if event["type"] in ("stage_started", "result"):
+                timeline.append((name, event["type"]))
+        return event
+
+    first, second = await asyncio.gather(turn("a"), turn("b"))
+
+    assert first["status"] == second["status"] == "success"
+    assert calls["finished"] == ["lookup", "deploy", "lookup", "deploy"]
+    # The second turn's stages only start once the first turn has finished
+    names = [name for name, _ in timeline]
+    assert names == sorted(names)
+    session = await backend.session_service.get_session(app_name=backend.APP_NAME, user_id=backend.USER_ID, session_id="stream-session-6")
+    assert [e.content.parts[0].text for e in session.events if e.author == "user"] == ["Onboard the sales rule"] * 2
@@ -0,0 +1,79 @@
+import time
+import pytest
+from src.rule_onboarding.agents.rule_constraints import RULE_CONSTRAINTS, RuleAttributeValidator, rule_attribute_validator
+from src.rule_onboarding.agents.rule_validation import RuleValidationError, check_attributes
+
+def _attr(rule_type="MEAN", column_name="price", baseline_source="CONFIG", baseline=1, threshold=10):
+    return {
+        "column_name": column_name,
+        "rule_type": rule_type,
+        "baseline_source": baseline_source,
+        "rule_details": {"baseline_value": baseline, "threshold_value": threshold}
+    }
+
+def test_valid_attributes_of_every_rule_type_pass():
+    attributes = [_attr(rule_type=rule_type, baseline=1.0, threshold=5) for rule_type in RULE_CONSTRAINTS]
+    attributes.append(_attr(rule_type="stale_count", column_name="STALE", baseline_source="previous", baseline="1.0", threshold=100))
+    assert rule_attribute_validator.validate(attributes) == []
+
+def test_reports_every_violation_in_one_pass():
+    violations = rule_attribute_validator.validate([
+        _attr(),
+        _attr(rule_type="STALE_COUNT", baseline_source="PREVIOUS", baseline=3, threshold=15),
+        _attr(column_name=" ", baseline=50, threshold=10),
+        _attr(rule_type="NULL_COUNT", baseline_source="YESTERDAY", baseline=-1, threshold="high"),
+        _attr(rule_type="P99_LATENCY"),
+        "not an attribute",
+    ])
+
+    assert [(v.index, v.message) for v in violations] == [
+        (1, "Rule STALE_COUNT with PREVIOUS baseline must have value 1.0."),
+        (2, "column_name is required for column level rules."),
+        (2, "rule_details.threshold_value must be >= baseline_value."),
+        (3, "baseline_source 'YESTERDAY' is not one of CONFIG, PREVIOUS."),
+        (3, "rule_details.threshold_value must be a number or null."),
+        (3, "rule_details.baseline_value must be >= 0."),
+        (4, f"Unsupported rule_type; expected one of {', '.join(sorted(RULE_CONSTRAINTS))}."),
+        (5, "attribute must be an object."),
+    ]
+    assert str(violations[0]) == "attributes[1] (STALE_COUNT): Rule STALE_COUNT with PREVIOUS baseline must have value 1.0."
+
+def test_constraint_table_is_pluggable():
+    validator = RuleAttributeValidator({"ROW_RATIO": {"level": "table", "baseline_sources": ("CONFIG",), "min_value": 0, "previous_baseline_value": None, "threshold_gte_baseline": False}})
+
+    assert validator.rule_types == ("ROW_RATIO",)
+    assert validator.validate([_attr(rule_type="ROW_RATIO", column_name=None, baseline=2, threshold=1)]) == []
+
+def test_check_attributes_keeps_single_violation_message_and_lists_many():
+    with pytest.raises(RuleValidationError) as single:
+        check_attributes([_attr(rule_type="RECORD_COUNT", baseline_source="PREVIOUS", baseline=2, threshold=5)])
+    assert str(single.value) == "VALIDATION_ERROR: Rule RECORD_COUNT with PREVIOUS baseline must have value 1.0."
+
+    with pytest.raises(RuleValidationError) as many:
+        check_attributes([_attr(baseline=5, threshold=1), _attr(column_name=None)])
+    assert str(many.value).splitlines() == [
+        "VALIDATION_ERROR: Found 2 rule attribute violations:",
+        "- attributes[0] (MEAN): rule_details.threshold_value must be >= baseline_value.",
+        "- attributes[1] (MEAN): column_name is required for column level rules.",
+    ]
+
+def test_validates_thousands_of_attributes_in_milliseconds():
+    rule_types = list(RULE_CONSTRAINTS)
+    attributes = [_attr(rule_type=rule_types[i % len(rule_types)], baseline=1, threshold=i % 7) for i in range(10000)]
+
+    started = time.perf_counter()
+    violations = rule_attribute_validator.validate(attributes)
+    elapsed = time.perf_counter() - started
+
+    # threshold 0 is below the baseline of 1 for every seventh attribute
+    assert len(violations) == len(range(0, 10000, 7))
+    assert elapsed < 0.5
+
+def test_null_threshold_is_accepted_as_the_prompt_instructs():
+    # Extraction prompt Example 5: a record count check without a threshold
+    record_count = _attr(rule_type="RECORD_COUNT", column_name="RECORD_COUNT", baseline=500, threshold=None)
+    mean = _attr(baseline=1, threshold=None)
+    mean["rule_details"].pop("threshold_value")
+
+    assert rule_attribute_validator.validate([record_count, mean]) == []
+    check_attributes([record_count, mean])
@@ -136,7 +136,26 @@ async def test_validation_mcp_timeout(mock_mcp_toolset):
     # 4. Assertion: Verify the agent reported the timeout as a validation error
     error_event = events[0]
     assert "VALIDATION_ERROR" in error_event.content.parts[0].text
-    assert "timeout" in error_event.content.parts[0].text.lower()
+    assert "timed out" in error_event.content.parts[0].text.lower()
     
     # Verify the session state was updated so the UI knows it failed
-    assert "timeout" in ctx.session.state["validated_rule_details"].lower()
\ No newline at end of file
+    assert "timed out" in ctx.session.state["validated_rule_details"].lower()
+def test_streamed_response_tokens_are_counted_once():
+    from google.adk.models import LlmResponse
+    from google.genai import types
+    from src.rule_onboarding.agents.rule_extraction import record_prompt_token_count
+    from src.rule_onboarding.utils.metrics import LLM_TOKENS_TOTAL
+
+    context = MagicMock()
+    context.agent_name = "token_count_test_agent"
+    context.state = {}
+    usage = types.GenerateContentResponseUsageMetadata(prompt_token_count=100, candidates_token_count=20)
+    for _ in range(3):
+        record_prompt_token_count(context, LlmResponse(partial=True, usage_metadata=usage))
+    assert context.state == {}
+
+    record_prompt_token_count(context, LlmResponse(usage_metadata=usage))
+
+    assert LLM_TOKENS_TOTAL.value(agent="token_count_test_agent", kind="prompt") == 100
+    assert LLM_TOKENS_TOTAL.value(agent="token_count_test_agent", kind="completion") == 20
+    assert context.state["extraction_prompt_token_count"] == 100
@@ -0,0 +1,88 @@
+import pytest
+from typing import AsyncGenerator
+from unittest.mock import MagicMock
+import google.genai.types as types
+from google.adk.agents import BaseAgent
+from google.adk.events import Event
+from src.rule_onboarding.agents.rule_fast_path_extraction import DQRuleFastPathExtractionAgent, parse_rule_request
+
+def test_parses_numbered_multi_rule_request():
+    parsed = parse_rule_request(
+        "Onboard Rules for sales table of customer schema with repository name AWSRepo "
+        "1) Record count with baseline_source CONFIG baseline_value 10 threshold_value 100 "
+        "2) Mean on order column with baseline_source CONFIG baseline_value 1 threshold_value 40."
+    )
+    assert parsed == {
+        "rule_name": "DQ_CUSTOMER_SALES_RULE",
+        "db_name": "customer",
+        "dataset_name": "sales",
+        "repository_name": "AWSRepo",
+        "attributes": [
+            {
+                "column_name": "RECORD_COUNT",
+                "rule_type": "RECORD_COUNT",
+                "baseline_source": "CONFIG",
+                "rule_details": {"baseline_value": 10, "threshold_value": 100}
+            },
+            {
+                "column_name": "order",
+                "rule_type": "MEAN",
+                "baseline_source": "CONFIG",
+                "rule_details": {"baseline_value": 1, "threshold_value": 40}
+            }
+        ]
+    }
+
+def test_parses_file_dataset_with_explicit_column():
+    parsed = parse_rule_request(
+        "Create rule for Median Variance on column salary for dataset "
+        "s3://bucket-name/key-name/employee.json  baseline_value 3000 threshold_value 1000000 with repository AWSRepo"
+    )
+    assert parsed["rule_name"] == "DQ_AWS_S3_EMPLOYEE_MEDIAN_VARIANCE_RULE"
+    assert parsed["db_name"] == "JSON"
+    assert parsed["attributes"][0]["column_name"] == "salary"
+    assert parsed["attributes"][0]["rule_type"] == "MEDIAN_VARIANCE"
+
+@pytest.mark.parametrize("user_input", [
+    # Free-form phrasing without baseline/threshold keywords
+    "Ensure the average price in sales table of customer schema is between 10 and 100",
+    # Missing repository
+    "Onboard a Record count check on dataset s3://bucket-name/key-name/invoices.parquet baseline_value 1 threshold_value 100",
+    # Column-level rule without a column
+    "Onboard Mean check for sales table of customer schema baseline_value 1 threshold_value 5 with repository AWSRepo",
+    # Ambiguous values
+    "Onboard Record count for sales table of customer schema baseline_value 1 baseline_value 2 threshold_value 5 with repository AWSRepo",
+    # Follow-up correction in a conversation
+    "Actually, please use 1.0 as the baseline value for that rule.",
+])
+def test_falls_through_when_not_confident(user_input):
+    assert parse_rule_request(user_input) is None
+
+class StubLlmExtractionAgent(BaseAgent):
+    """Stands in for the Gemini extraction agent and records whether it ran."""
+    calls: int = 0
+
+    async def _run_async_impl(self, ctx) -> AsyncGenerator[Event, None]:
+        self.calls += 1
+        yield Event(author=self.name, content=types.Content(role="assistant", parts=[types.Part(text="{}")]))
+
+def _ctx(user_message):
+    ctx = MagicMock()
+    ctx.session.state = {}
+    ctx.user_content = types.Content(role="user", parts=[types.Part(text=user_message)])
+    return ctx
+
+@pytest.mark.asyncio
+async def test_agent_skips_llm_on_fast_path():
+    llm_agent = StubLlmExtractionAgent(name="rule_extraction_agent")
+    agent = DQRuleFastPathExtractionAgent(llm_agent)
+    ctx = _ctx(
+        "Configure STALE count check on dataset s3://bucket-name/key-name/sales.csv "
+        "baseline_source PREVIOUS baseline_value 3 threshold_value 15. Use repository AWSRepo"
+    )
+
+    events = [event async for event in agent._run_async_impl(ctx)]
+
+    assert llm_agent.calls == 0
+    assert ctx.session.state["raw_rule_details"]["rule_name"] == "DQ_AWS_S3_SALES_STALE_COUNT_RULE"
+    assert "DQ_AWS_S3_SALES_STALE_COUNT_RULE" in events[0].content.parts[0].text
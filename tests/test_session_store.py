@@ -0,0 +1,220 @@
+import pytest
+import google.genai.types as types
+from google.adk.events import Event, EventActions
+from src.rule_onboarding.services.session_store import SUMMARY_STATE_KEY, HotSessionCache, SqliteSessionService
+
+@pytest.fixture
+def session_service(tmp_path):
+    service = SqliteSessionService(f"sqlite:///{tmp_path / 'sessions.db'}", pool_size=2, max_overflow=2)
+    yield service
+    service.close()
+
+@pytest.mark.asyncio
+async def test_session_round_trip_off_the_event_loop(session_service):
+    session = await session_service.create_session(app_name="app", user_id="user", session_id="s1", state={"stage": "extraction"})
+    await session_service.append_event(session, Event(author="user", actions=EventActions(state_delta={"stage": "validation"})))
+
+    loaded = await session_service.get_session(app_name="app", user_id="user", session_id="s1")
+
+    assert loaded.state == {"stage": "validation"}
+    assert len(loaded.events) == 1
+    assert await session_service.get_session(app_name="app", user_id="user", session_id="missing") is None
+
+def test_pooled_connections_use_wal(session_service):
+    with session_service.db_engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+
+def _text_event(author, text, state_delta=None):
+    return Event(
+        author=author,
+        content=types.Content(role="user" if author == "user" else "model", parts=[types.Part(text=text)]),
+        actions=EventActions(state_delta=state_delta or {})
+    )
+
+@pytest.mark.asyncio
+async def test_compaction_keeps_recent_window_and_summarizes_the_rest(session_service):
+    session = await session_service.create_session(app_name="app", user_id="user", session_id="s1")
+    for turn in range(5):
+        await session_service.append_event(session, _text_event("user", f"onboard rule {turn}"))
+        await session_service.append_event(session, _text_event("rule_deployment_agent", f"deployed rule {turn}", {"raw_rule_details": {"turn": turn}}))
+
+    removed = await session_service.compact_session(
+        app_name="app", user_id="user", session_id="s1", keep_events=4, trim_state_keys=("raw_rule_details",)
+    )
+    loaded = await session_service.get_session(app_name="app", user_id="user", session_id="s1")
+
+    assert removed == 6
+    assert [e.content.parts[0].text for e in loaded.events][0] == "onboard rule 3"
+    assert "raw_rule_details" not in loaded.state
+    assert loaded.state[SUMMARY_STATE_KEY].splitlines()[0] == "user: onboard rule 0"
+
+@pytest.mark.asyncio
+async def test_history_window_bounds_loaded_events(tmp_path):
+    service = SqliteSessionService(f"sqlite:///{tmp_path / 'window.db'}", history_window_events=3)
+    session = await service.create_session(app_name="app", user_id="user", session_id="s1")
+    for turn in range(6):
+        await service.append_event(session, _text_event("user", f"message {turn}"))
+
+    loaded = await service.get_session(app_name="app", user_id="user", session_id="s1")
+    assert [e.content.parts[0].text for e in loaded.events] == ["message 3", "message 4", "message 5"]
+    service.close()
+
+@pytest.mark.asyncio
+async def test_expire_sessions_deletes_idle_sessions_in_batches(session_service):
+    await session_service.enable_incremental_vacuum()
+    for session_id in ("idle", "active"):
+        session = await session_service.create_session(app_name="app", user_id="user", session_id=session_id)
+        for turn in range(5):
+            await session_service.append_event(session, _text_event("user", f"message {turn} " + "x" * 2000))
+    with session_service.db_engine.begin() as connection:
+        connection.exec_driver_sql("UPDATE sessions SET update_time = '2000-01-01 00:00:00.000000' WHERE id = 'idle'")
+
+    report = await session_service.expire_sessions(max_age_seconds=3600, batch_size=2)
+
+    assert report["sessions_deleted"] == 1
+    assert report["events_deleted"] == 5
+    assert report["bytes_reclaimed"] > 0
+    assert await session_service.get_session(app_name="app", user_id="user", session_id="idle") is None
+    assert await session_service.get_session(app_name="app", user_id="user", session_id="active") is not None
+
+@pytest.mark.asyncio
+async def test_retention_schema_is_in_place(session_service):
+    with session_service.db_engine.connect() as connection:
+        indexes = {row[1] for row in connection.exec_driver_sql("PRAGMA index_list('sessions')")}
+        assert "idx_sessions_update_time" in indexes
+        # Startup never rewrites the file; the janitor lease holder migrates it once
+        assert connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2
+
+    assert await session_service.enable_incremental_vacuum() is True
+    assert await session_service.enable_incremental_vacuum() is False
+    with session_service.db_engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+
+@pytest.mark.asyncio
+async def test_hot_cache_serves_reads_from_memory_and_writes_behind(tmp_path):
+    store = SqliteSessionService(f"sqlite:///{tmp_path / 'sessions.db'}")
+    cache = HotSessionCache(store, flush_interval_seconds=60, flush_batch_size=1000)
+    session = await cache.create_session(app_name="app", user_id="user", session_id="s1")
+    await cache.append_event(session, _text_event("user", "onboard rule", {"stage": "validation", "app:region": "eu", "temp:scratch": 1}))
+
+    # Served from memory, not yet persisted
+    assert await cache.get_session(app_name="app", user_id="user", session_id="s1") is session
+    assert len((await store.get_session(app_name="app", user_id="user", session_id="s1")).events) == 0
+    assert cache.stats()["pending_events"] == 1
+
+    assert await cache.flush_session(app_name="app", user_id="user", session_id="s1") == 1
+    stored = await store.get_session(app_name="app", user_id="user", session_id="s1")
+    assert len(stored.events) == 1
+    assert stored.state == {"stage": "validation", "app:region": "eu"}
+
+    # The stored copy stays appendable by the plain store after a write-behind flush
+    await store.append_event(stored, _text_event("user", "follow-up"))
+    await cache.aclose()
+
+@pytest.mark.asyncio
+async def test_hot_cache_flushes_pending_events_before_a_cold_read(tmp_path):
+    store = SqliteSessionService(f"sqlite:///{tmp_path / 'sessions.db'}")
+    cache = HotSessionCache(store, max_sessions=1, flush_interval_seconds=60)
+    first = await cache.create_session(app_name="app", user_id="user", session_id="s1")
+    await cache.append_event(first, _text_event("user", "first"))
+    # Creating a second session evicts the first from the LRU
+    await cache.create_session(app_name="app", user_id="user", session_id="s2")
+
+    reloaded = await cache.get_session(app_name="app", user_id="user", session_id="s1")
+
+    assert reloaded is not first
+    assert [e.content.parts[0].text for e in reloaded.events] == ["first"]
+    assert cache.stats()["misses"] == 1
+    await cache.aclose()
+
+@pytest.mark.asyncio
+async def test_shared_store_caches_reload_sessions_advanced_by_another_worker(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'sessions.db'}"
+    # Two backend workers, each with its own store and cache over one database
+    worker_a = HotSessionCache(SqliteSessionService(db_url), flush_interval_seconds=60, shared_store=True)
+    worker_b = HotSessionCache(SqliteSessionService(db_url), flush_interval_seconds=60, shared_store=True)
+
+    session = await worker_a.create_session(app_name="app", user_id="user", session_id="s1")
+    await worker_a.append_event(session, _text_event("user", "turn 1", {"stage": "extraction"}))
+    await worker_a.flush_session(app_name="app", user_id="user", session_id="s1")
+    assert len((await worker_b.get_session(app_name="app", user_id="user", session_id="s1")).events) == 1
+
+    # Unchanged since worker B cached it: served from memory
+    await worker_b.get_session(app_name="app", user_id="user", session_id="s1")
+    assert worker_b.stats()["hits"] == 1
+
+    # Worker A handles the next turn; worker B must not serve its stale copy
+    await worker_a.append_event(session, _text_event("user", "turn 2", {"stage": "deployment"}))
+    await worker_a.flush_session(app_name="app", user_id="user", session_id="s1")
+    fresh = await worker_b.get_session(app_name="app", user_id="user", session_id="s1")
+
+    assert [e.content.parts[0].text for e in fresh.events] == ["turn 1", "turn 2"]
+    assert fresh.state["stage"] == "deployment"
+    assert worker_b.stats()["stale_reads"] == 1
+    await worker_a.aclose()
+    await worker_b.aclose()
+
+@pytest.mark.asyncio
+async def test_shared_store_detects_other_workers_while_own_writes_are_pending(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'sessions.db'}"
+    worker_a = HotSessionCache(SqliteSessionService(db_url), flush_interval_seconds=60, shared_store=True)
+    worker_b = HotSessionCache(SqliteSessionService(db_url), flush_interval_seconds=60, shared_store=True)
+    await worker_a.create_session(app_name="app", user_id="user", session_id="s1")
+    session_a = await worker_a.get_session(app_name="app", user_id="user", session_id="s1")
+    session_b = await worker_b.get_session(app_name="app", user_id="user", session_id="s1")
+
+    # Worker B has an unflushed event when worker A persists another turn
+    await worker_b.append_event(session_b, _text_event("user", "turn b", {"b": 1}))
+    await worker_a.append_event(session_a, _text_event("user", "turn a", {"a": 1}))
+    await worker_a.flush_session(app_name="app", user_id="user", session_id="s1")
+    fresh = await worker_b.get_session(app_name="app", user_id="user", session_id="s1")
+
+    assert sorted(e.content.parts[0].text for e in fresh.events) == ["turn a", "turn b"]
+    assert fresh.state == {"a": 1, "b": 1}
+    assert worker_b.stats()["stale_reads"] == 1
+
+    # Worker A flushed before B's write landed; its next flush notices B's event
+    await worker_a.append_event(session_a, _text_event("user", "turn a2"))
+    await worker_a.flush_session(app_name="app", user_id="user", session_id="s1")
+    assert worker_a.stats()["stale_reads"] == 1
+    assert len((await worker_a.get_session(app_name="app", user_id="user", session_id="s1")).events) == 3
+    await worker_a.aclose()
+    await worker_b.aclose()
+
+def test_only_one_worker_holds_the_janitor_lease(tmp_path):
+    from src.rule_onboarding.api.backend import acquire_janitor_lease
+    path = str(tmp_path / "janitor.lock")
+
+    first = acquire_janitor_lease(path)
+    assert first is not None
+    assert acquire_janitor_lease(path) is None
+    first.close()
+    # Released when the holder goes away
+    second = acquire_janitor_lease(path)
+    assert second is not None
+    second.close()
+
+def test_table_creation_race_disposes_the_failed_engine(tmp_path, monkeypatch):
+    from google.adk.sessions.database_session_service import Base
+    from sqlalchemy.engine import Engine
+    from sqlalchemy.exc import OperationalError
+    create_all = Base.metadata.create_all
+    engines = []
+
+    def racing_create_all(engine, **kwargs):
+        engines.append(engine)
+        if len(engines) == 1:
+            # Another worker created the tables first
+            raise OperationalError("CREATE TABLE sessions", {}, Exception("table sessions already exists"))
+        return create_all(engine, **kwargs)
+    monkeypatch.setattr(Base.metadata, "create_all", racing_create_all)
+    disposed = []
+    dispose = Engine.dispose
+    monkeypatch.setattr(Engine, "dispose", lambda self, *args, **kwargs: (disposed.append(self), dispose(self, *args, **kwargs))[1])
+
+    service = SqliteSessionService(f"sqlite:///{tmp_path / 'sessions.db'}")
+
+    assert len(engines) == 2 and service.db_engine is engines[1]
+    assert engines[0] in disposed
+    service.close()
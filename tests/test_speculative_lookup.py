@@ -0,0 +1,110 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import AsyncGenerator
+from unittest.mock import ANY, AsyncMock, MagicMock, call
+import pytest
+import google.genai.types as types
+from google.adk.agents import BaseAgent
+from google.adk.events import Event
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from src.rule_onboarding.agents import rule_validation
+from src.rule_onboarding.agents.rule_fast_path_extraction import DQRuleFastPathExtractionAgent
+from src.rule_onboarding.agents.rule_validation import resolve_connectivity_id
+from src.rule_onboarding.core.dq_rule_onboarding_orchestrator import build_onboarding_pipeline
+from src.rule_onboarding.utils.partial_json import PartialJsonScanner
+
+RULE = {
+    "rule_name": "DQ_SALES_RULE",
+    "repository_name": "AWSRepo",
+    "attributes": [{"column_name": "C", "rule_type": "MEAN", "baseline_source": "CONFIG", "rule_details": {"baseline_value": 1, "threshold_value": 5}}],
+    "db_name": "customer"
+}
+
+def _chunks(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_scanner_reports_fields_regardless_of_chunking(size):
+    text = "```json\n" + json.dumps({"note": "a \"quoted\" } brace", **RULE, "count": 3, "ok": True}) + "\n```"
+    scanner = PartialJsonScanner()
+    for chunk in _chunks(text, size):
+        scanner.feed(chunk)
+
+    assert scanner.done
+    assert scanner.fields == {"note": "a \"quoted\" } brace", "rule_name": "DQ_SALES_RULE", "repository_name": "AWSRepo", "db_name": "customer", "count": 3, "ok": True}
+
+def test_scanner_reports_repository_before_the_object_closes():
+    text = json.dumps(RULE)
+    scanner = PartialJsonScanner()
+    completed = scanner.feed(text[:text.index('"attributes"')])
+
+    assert completed["repository_name"] == "AWSRepo"
+    assert not scanner.done
+
+class StreamingLlmStub(BaseAgent):
+    """Streams 'output' as partial events, then the aggregated final event."""
+    output: str = ""
+    seen_lookup_before_final: bool = False
+
+    async def _run_async_impl(self, ctx) -> AsyncGenerator[Event, None]:
+        for chunk in _chunks(self.output, 8):
+            yield Event(author=self.name, partial=True, content=types.Content(role="model", parts=[types.Part(text=chunk)]))
+            await asyncio.sleep(0)
+        self.seen_lookup_before_final = ctx.invocation_id in rule_validation._speculative_lookups
+        ctx.session.state["raw_rule_details"] = self.output
+        yield Event(author=self.name, content=types.Content(role="model", parts=[types.Part(text=self.output)]))
+
+def _ctx(invocation_id: str):
+    ctx = MagicMock()
+    ctx.invocation_id = invocation_id
+    return ctx
+
+def _lookup_tool(monkeypatch, connectivity_ids: dict):
+    tool = AsyncMock()
+
+    async def run_async(args, tool_context):
+        if "repository_name" not in args:
+            return SimpleNamespace(isError=False)  # onboard_rule
+        return SimpleNamespace(isError=False, structuredContent={"connectivity_id": connectivity_ids[args["repository_name"]]})
+    tool.run_async.side_effect = run_async
+
+    async def get_tool(tool_name):
+        return tool
+    monkeypatch.setattr("src.rule_onboarding.services.mcp_toolset_manager.mcp_toolset_manager.get_tool", get_tool)
+    monkeypatch.setattr("src.rule_onboarding.agents.rule_fast_path_extraction.EXTRACTION_CACHE_ENABLED", False)
+    return tool
+
+@pytest.mark.asyncio
+async def test_validation_reuses_lookup_started_from_partial_output(monkeypatch):
+    tool = _lookup_tool(monkeypatch, {"AWSRepo": "1"})
+    llm = StreamingLlmStub(name="rule_extraction_agent", output=json.dumps(RULE))
+    pipeline = build_onboarding_pipeline("speculative_pipeline", DQRuleFastPathExtractionAgent(llm))
+
+    service = InMemorySessionService()
+    session = await service.create_session(app_name="app", user_id="user", session_id="s1")
+    runner = Runner(agent=pipeline, app_name="app", session_service=service)
+    message = types.Content(role="user", parts=[types.Part(text="make sure sales looks sane")])
+    authors = [event.author async for event in runner.run_async(user_id="user", session_id=session.id, new_message=message) if not event.partial]
+
+    assert llm.seen_lookup_before_final
+    assert authors[-1] == "rule_deployment_agent"
+    # One MCP lookup (the speculative one) and one deployment call
+    lookups = [c for c in tool.run_async.await_args_list if "repository_name" in c.kwargs["args"]]
+    assert lookups == [call(args={"repository_name": "AWSRepo"}, tool_context=ANY)]
+    assert tool.run_async.await_args.kwargs["args"]["connectivity_id"] == "1"
+    assert not rule_validation._speculative_lookups
+
+@pytest.mark.asyncio
+async def test_speculative_result_is_discarded_when_final_json_disagrees(monkeypatch):
+    tool = _lookup_tool(monkeypatch, {"AWSRepo": "1", "GCPRepo": "2"})
+    logger = MagicMock()
+    ctx = _ctx("inv-mismatch")
+
+    rule_validation.start_speculative_lookup(rule_validation.mcp_toolset_manager, "AWSRepo", ctx, logger)
+    conn_id = await resolve_connectivity_id(rule_validation.mcp_toolset_manager, "GCPRepo", ctx, logger)
+
+    assert conn_id == "2"
+    assert tool.run_async.await_args.kwargs["args"] == {"repository_name": "GCPRepo"}
+    assert "inv-mismatch" not in rule_validation._speculative_lookups
@@ -0,0 +1,76 @@
+import asyncio
+import socket
+import sys
+import httpx
+import pytest
+from src.rule_onboarding.api import backend
+from src.rule_onboarding.utils import supervisor as supervisor_module
+from src.rule_onboarding.utils.supervisor import ServiceSpec, ServiceStartupError, ServiceSupervisor, restart_delay
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _http_service(name: str, port: int, **kwargs) -> ServiceSpec:
+    cmd = [sys.executable, "-m", "http.server", str(port), "--bind", "127.0.0.1"]
+    return ServiceSpec(name, cmd, ready_url=f"http://127.0.0.1:{port}/", **kwargs)
+
+async def _wait_for(condition, timeout: float = 10.0):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.02)
+    await asyncio.wait_for(poll(), timeout)
+
+def test_restart_delay_backs_off_exponentially(monkeypatch):
+    monkeypatch.setattr(supervisor_module, "SERVICE_RESTART_BACKOFF_SECONDS", 1.0)
+    monkeypatch.setattr(supervisor_module, "SERVICE_RESTART_BACKOFF_MAX_SECONDS", 5.0)
+    assert [restart_delay(n) for n in (1, 2, 3, 4)] == [1.0, 2.0, 4.0, 5.0]
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError, match="unknown"):
+        ServiceSupervisor([ServiceSpec("UI", ["true"], depends_on=("API",))])
+
+@pytest.mark.asyncio
+async def test_dependents_start_after_readiness_and_crashes_are_restarted(monkeypatch):
+    monkeypatch.setattr(supervisor_module, "SERVICE_RESTART_BACKOFF_SECONDS", 0.05)
+    supervisor = ServiceSupervisor([
+        _http_service("A", _free_port()),
+        _http_service("B", _free_port(), depends_on=("A",)),
+    ])
+    runner = asyncio.create_task(supervisor.run())
+    try:
+        await asyncio.wait_for(supervisor.wait_ready(), 10)
+        assert supervisor._processes["A"].returncode is None
+
+        # Kill A: the supervisor restarts it and it becomes ready again
+        supervisor._processes["A"].kill()
+        await _wait_for(lambda: supervisor.restarts["A"] == 1 and supervisor.is_ready("A"))
+        assert supervisor.restarts["B"] == 0
+    finally:
+        supervisor.stop()
+        await asyncio.wait_for(runner, 15)
+    assert all(p.returncode is not None for p in supervisor._processes.values())
+
+@pytest.mark.asyncio
+async def test_startup_fails_fast_when_a_service_exits():
+    supervisor = ServiceSupervisor([
+        ServiceSpec("broken", [sys.executable, "-c", "raise SystemExit(3)"], ready_url=f"http://127.0.0.1:{_free_port()}/", ready_timeout_seconds=10)
+    ])
+    with pytest.raises(ServiceStartupError, match="broken"):
+        await asyncio.wait_for(supervisor.run(), 5)
+
+@pytest.mark.asyncio
+async def test_backend_health_probes(monkeypatch):
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend") as client:
+        assert (await client.get("/healthz")).json() == {"status": "ok"}
+
+        monkeypatch.setattr(backend.app.state, "ready", False, raising=False)
+        not_ready = await client.get("/readyz")
+        monkeypatch.setattr(backend.app.state, "ready", True)
+        ready = await client.get("/readyz")
+
+    assert not_ready.status_code == 503
+    assert ready.status_code == 200
+    assert ready.json()["checks"] == {"startup": True, "session_store": True}
@@ -0,0 +1,43 @@
+import httpx
+import pytest
+from fastmcp import Client
+from src.rule_onboarding.services import mcp_server
+from src.rule_onboarding.utils.tracing import (
+    REQUEST_ID_ATTRIBUTE, TracingTransport, get_tracer, inject_trace_context, request_context, span_buffer, stage_breakdown
+)
+
+@pytest.mark.asyncio
+async def test_outbound_requests_carry_trace_context_and_request_id():
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.update(request.headers)
+        return httpx.Response(200, json={"connectivity_id": "1"})
+
+    span_buffer.clear()
+    async with httpx.AsyncClient(transport=TracingTransport(httpx.MockTransport(handler))) as client:
+        with request_context("req-http"), get_tracer().start_as_current_span("stage"):
+            await client.get("http://config-api/repositories/AWSRepo/connectivity")
+
+    spans = span_buffer.spans("req-http")
+    http_span = next(s for s in spans if s["name"] == "HTTP GET")
+    assert seen["x-request-id"] == "req-http"
+    assert seen["traceparent"].split("-")[2] == http_span["spanId"]
+    assert http_span["attributes"]["http.response.status_code"] == 200
+    assert set(stage_breakdown(spans)) == {"HTTP GET", "stage"}
+
+@pytest.mark.asyncio
+async def test_mcp_tool_calls_continue_the_callers_trace():
+    mcp_server.connectivity_cache.clear()
+    mcp_server.connectivity_cache.set("AWSRepo", mcp_server.ConnectivityResponse(connectivity_id="1"))
+    span_buffer.clear()
+
+    with request_context("req-mcp"), get_tracer().start_as_current_span("rule_validation_agent") as parent:
+        meta = inject_trace_context()
+        async with Client(mcp_server.mcp) as client:
+            await client.call_tool("get_connectivity_id_by_repository_name", {"repository_name": "AWSRepo"}, meta=meta)
+
+    tool_span = next(s for s in span_buffer.spans("req-mcp") if s["name"] == "mcp.tool get_connectivity_id_by_repository_name")
+    assert tool_span["attributes"][REQUEST_ID_ATTRIBUTE] == "req-mcp"
+    assert tool_span["traceId"] == format(parent.get_span_context().trace_id, "032x")
+    mcp_server.connectivity_cache.clear()